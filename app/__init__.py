@@ -1,3 +1,4 @@
+import multiprocessing
 import os
 from flask import Flask, redirect, url_for
 from flask_sqlalchemy import SQLAlchemy
@@ -26,6 +27,9 @@ def create_app(config_class=Config):
     mail.init_app(app)
     csrf.init_app(app)
 
+    from app.audit import activity_log_sink
+    activity_log_sink.init_app(app)
+
     login_manager.login_view = 'auth.login'
     login_manager.login_message = 'Vui long dang nhap de tiep tuc.'
     login_manager.login_message_category = 'warning'
@@ -59,6 +63,9 @@ def create_app(config_class=Config):
     from app.logs import bp as logs_bp
     app.register_blueprint(logs_bp, url_prefix='/logs')
 
+    from app.notifications import bp as notifications_bp
+    app.register_blueprint(notifications_bp, url_prefix='/notifications')
+
     # Root route
     @app.route('/')
     def index():
@@ -69,7 +76,9 @@ def create_app(config_class=Config):
     os.makedirs(app.config.get('EXPORT_FOLDER', 'exports'), exist_ok=True)
 
     # Start background scheduler (only in production or main process)
-    if not app.debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+    # Process con cua multiprocessing (spawn import lai run.py) khong chay scheduler
+    if multiprocessing.parent_process() is None and not app.testing and \
+            (not app.debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true'):
         try:
             from app.scheduler.jobs import start_scheduler
             start_scheduler(app)
@@ -0,0 +1,116 @@
+"""
+Module duyet ban ghi cham cong (trang /attendance/view)
+
+Phan trang kieu keyset (seek) tren (date, id) thay vi OFFSET:
+- Moi trang chi doc toi da per_page + 1 dong, khong phu thuoc do dai lich su
+- Thong ke (tong so, di muon, di som) tinh bang 1 cau aggregate rieng
+"""
+
+from datetime import datetime
+from sqlalchemy import func, case, or_, and_
+from app.models import AttendanceRecord, User, db
+
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(record):
+    """Tao cursor tu ban ghi cuoi cung cua trang: 'YYYY-MM-DD_id'"""
+    return f"{record.date.strftime('%Y-%m-%d')}_{record.id}"
+
+
+def decode_cursor(cursor):
+    """Doc cursor, tra ve (date, id) hoac None neu khong hop le"""
+    if not cursor:
+        return None
+    try:
+        date_str, id_str = cursor.split('_', 1)
+        return datetime.strptime(date_str, '%Y-%m-%d').date(), int(id_str)
+    except (ValueError, AttributeError):
+        return None
+
+
+def _filters(from_date, to_date, user_id=None):
+    conditions = [
+        AttendanceRecord.date >= from_date,
+        AttendanceRecord.date <= to_date
+    ]
+    if user_id:
+        conditions.append(AttendanceRecord.user_id == user_id)
+    return conditions
+
+
+def get_attendance_stats(from_date, to_date, user_id=None):
+    """Dem tong so, so lan di muon, di som trong khoang ngay (1 query)"""
+    total, late, early_bird = db.session.query(
+        func.count(AttendanceRecord.id),
+        func.sum(case((AttendanceRecord.is_late == True, 1), else_=0)),
+        func.sum(case((AttendanceRecord.is_early_bird == True, 1), else_=0))
+    ).filter(*_filters(from_date, to_date, user_id)).one()
+
+    return {
+        'total_records': total or 0,
+        'late_count': late or 0,
+        'early_bird_count': early_bird or 0
+    }
+
+
+def get_attendance_page(from_date, to_date, user_id=None, cursor=None, per_page=DEFAULT_PAGE_SIZE):
+    """
+    Lay 1 trang ban ghi cham cong, sap xep moi nhat truoc (date DESC, id DESC)
+
+    Args:
+        from_date, to_date: Khoang ngay
+        user_id: Loc theo NV (optional)
+        cursor: Cursor cua trang truoc (None = trang dau)
+        per_page: So dong moi trang
+
+    Returns:
+        dict: {'records': List (AttendanceRecord, User), 'next_cursor': str hoac None}
+    """
+    per_page = min(max(per_page or DEFAULT_PAGE_SIZE, 1), MAX_PAGE_SIZE)
+
+    query = db.session.query(
+        AttendanceRecord, User
+    ).join(User).filter(*_filters(from_date, to_date, user_id))
+
+    position = decode_cursor(cursor)
+    if position:
+        last_date, last_id = position
+        query = query.filter(or_(
+            AttendanceRecord.date < last_date,
+            and_(AttendanceRecord.date == last_date, AttendanceRecord.id < last_id)
+        ))
+
+    rows = query.order_by(
+        AttendanceRecord.date.desc(),
+        AttendanceRecord.id.desc()
+    ).limit(per_page + 1).all()
+
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+
+    return {
+        'records': rows,
+        'next_cursor': encode_cursor(rows[-1][0]) if has_more and rows else None
+    }
+
+
+def serialize_record(record, user):
+    """Chuyen ban ghi thanh dict cho JSON API"""
+    return {
+        'id': record.id,
+        'date': record.date.isoformat(),
+        'user_id': user.id,
+        'full_name': user.full_name,
+        'shift_type': record.shift_type.value,
+        'scheduled_start': record.scheduled_start.strftime('%H:%M') if record.scheduled_start else None,
+        'scheduled_end': record.scheduled_end.strftime('%H:%M') if record.scheduled_end else None,
+        'actual_checkin': record.actual_checkin.strftime('%H:%M') if record.actual_checkin else None,
+        'actual_checkout': record.actual_checkout.strftime('%H:%M') if record.actual_checkout else None,
+        'late_minutes': record.late_minutes,
+        'total_work_hours': record.total_work_hours,
+        'is_late': bool(record.is_late),
+        'is_early_bird': bool(record.is_early_bird)
+    }
@@ -17,6 +17,8 @@ from app.models import (
     AttendanceRecord, User, WorkSchedule, ScheduleShift,
     ShiftType, db
 )
+from app.dashboard.events import publish_attendance
+from app.attendance.late_checker import rewind_watermark
 
 
 def parse_time(value):
@@ -467,6 +469,7 @@ def import_pivot_format(ws, is_openpyxl, date_format='auto'):
                 errors.append(f'NV {employee_code} ngay {date}: Loi - {str(e)}')
 
     if records_created > 0:
+        rewind_watermark([record.date for record in records if record.is_late])
         db.session.commit()
 
     return {
@@ -591,6 +594,7 @@ def import_row_format_xlrd(ws, date_format='auto'):
             errors.append(f'Dong {row_num+1}: Loi - {str(e)}')
 
     if records_created > 0:
+        rewind_watermark([record.date for record in records if record.is_late])
         db.session.commit()
 
     return {
@@ -692,6 +696,7 @@ def import_row_format_openpyxl(ws, date_format='auto'):
             errors.append(f'Dong {row_num}: Loi - {str(e)}')
 
     if records_created > 0:
+        rewind_watermark([record.date for record in records if record.is_late])
         db.session.commit()
 
     return {
@@ -916,6 +921,8 @@ def save_attendance_from_preview(records):
     """
     success_count = 0
     errors = []
+    user_ids = set()
+    event_rows = []
 
     for idx, record in enumerate(records):
         try:
@@ -992,6 +999,7 @@ def save_attendance_from_preview(records):
 
             if existing:
                 # Cap nhat ban ghi cu
+                old_hours = existing.total_work_hours or 0
                 existing.actual_checkin = checkin_time
                 existing.actual_checkout = checkout_time
                 existing.late_minutes = calculate_late_minutes(scheduled_start, checkin_time)
@@ -1000,6 +1008,8 @@ def save_attendance_from_preview(records):
                 ), 2)
                 existing.is_late = existing.late_minutes > 0
                 existing.is_early_bird = checkin_time and checkin_time < time(6, 55)
+                saved = existing
+                hours_delta = (existing.total_work_hours or 0) - old_hours
             else:
                 # Tao ban ghi moi
                 late_minutes = calculate_late_minutes(scheduled_start, checkin_time)
@@ -1019,16 +1029,34 @@ def save_attendance_from_preview(records):
                     is_early_bird=checkin_time and checkin_time < time(6, 55)
                 )
                 db.session.add(attendance)
+                saved = attendance
+                hours_delta = attendance.total_work_hours
 
             success_count += 1
+            user_ids.add(user.id)
+            event_rows.append({
+                'user_id': user.id,
+                'full_name': user.full_name,
+                'date': parsed_date,
+                'shift_type': shift_type.value,
+                'checkin': checkin_time.strftime('%H:%M') if checkin_time else None,
+                'is_late': bool(saved.is_late),
+                'late_minutes': saved.late_minutes,
+                'total_work_hours': saved.total_work_hours,
+                'hours_delta': hours_delta
+            })
 
         except Exception as e:
             errors.append(f'Dong {idx+1}: Loi - {str(e)}')
 
     if success_count > 0:
+        # Ngay cu da xu ly di muon -> lui moc de job xu ly lai
+        rewind_watermark([row['date'] for row in event_rows if row['is_late']])
         db.session.commit()
+        publish_attendance(event_rows)
 
     return {
         'success': success_count,
-        'errors': errors
+        'errors': errors,
+        'user_ids': sorted(user_ids)
     }
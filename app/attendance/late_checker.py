@@ -5,11 +5,28 @@ Quy tac phat moi thang:
 - Lan 1: Muon < 5 phut -> Khong phat (Nhac nho)
 - Lan 2: Phat 50,000d
 - Lan 3+: Phat 100,000d/lan
+
+Job hang ngay xu ly bu tu moc 'attendance_processed_through' (SystemConfig) den
+hom nay trong 1 luot; import / sua cham cong cho ngay cu thi lui moc. Ban ghi
+xu ly loi duoc luu rieng ('attendance_failed_records') va thu lai o lan chay sau,
+moc van tien (1 ban ghi loi khong giu moc lai mai).
 """
 
-from datetime import datetime
-from app.models import Violation, AttendanceRecord, User, ViolationType, Notification, db
+import bisect
+from datetime import datetime, timedelta
+from sqlalchemy import or_
+from app.models import Violation, AttendanceRecord, User, ViolationType, SystemConfig, db
 from flask import current_app
+from app.dashboard.events import publish_violations
+from app.notifications.inbox import notify_many
+from app.notifications.email_sender import queue_late_emails
+from app.notifications.sms_sender import queue_late_sms
+from app.notifications.templates import render
+
+
+WATERMARK_KEY = 'attendance_processed_through'
+FAILED_RECORDS_KEY = 'attendance_failed_records'
+CATCHUP_DAYS = 7
 
 
 def get_late_count_in_month(user_id, date):
@@ -56,30 +73,24 @@ def calculate_penalty(late_count, late_minutes):
         return third_penalty
 
 
+def late_notification(user, late_count, late_minutes, penalty):
+    """Noi dung thong bao di muon cho NV (dict cho notify_many)"""
+    content = render('app', 'late', late_count=late_count, late_minutes=late_minutes, penalty=penalty)
+    return {'user_id': user.id, 'title': content['subject'], 'message': content['body'], 'type': 'late'}
+
+
 def create_late_notification(user, late_count, late_minutes, penalty):
     """Tao thong bao di muon cho NV"""
-    if late_count == 1:
-        title = "Nhac nho di muon"
-        message = f"Ban di muon {late_minutes} phut. Day la lan dau trong thang, chua bi phat. Hay co gang di dung gio!"
-    else:
-        title = f"Canh bao di muon lan {late_count}"
-        message = f"Ban di muon {late_minutes} phut. Day la lan {late_count} trong thang. Tien phat: {penalty:,.0f}d. De nghi tuan thu di lam dung gio."
-
-    notification = Notification(
-        user_id=user.id,
-        title=title,
-        message=message,
-        type='late'
-    )
-    db.session.add(notification)
+    notify_many([late_notification(user, late_count, late_minutes, penalty)])
 
 
-def process_late_record(attendance_record):
+def process_late_record(attendance_record, notifications=None):
     """
     Xu ly 1 ban ghi di muon
 
     Args:
         attendance_record: AttendanceRecord object
+        notifications: List gom thong bao de ghi 1 lan (None = ghi ngay)
 
     Returns:
         Violation object or None
@@ -109,61 +120,208 @@ def process_late_record(attendance_record):
     db.session.add(violation)
 
     # Tao thong bao
-    create_late_notification(user, late_count, attendance_record.late_minutes, penalty)
+    if notifications is None:
+        create_late_notification(user, late_count, attendance_record.late_minutes, penalty)
+    else:
+        notifications.append(late_notification(user, late_count, attendance_record.late_minutes, penalty))
 
     return violation
 
 
-def process_daily_attendance(date=None):
+def get_watermark():
+    """Ngay cuoi cung da xu ly di muon xong (None = chua chay lan nao)"""
+    value = SystemConfig.get_value(WATERMARK_KEY)
+    return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+
+
+def set_watermark(value):
+    """Ghi moc da xu ly (khong commit)"""
+    SystemConfig.set_value(WATERMARK_KEY, value.isoformat(),
+                           'Ngay cuoi da xu ly di muon (late_checker.process_pending_attendance)')
+
+
+def rewind_watermark(dates):
     """
-    Xu ly tat ca ban ghi di muon trong ngay
+    Lui moc khi co cham cong moi / sua cho ngay da xu ly (import tre, sua tay)
+    de lan chay sau xu ly lai cac ngay do (khong commit)
+    """
+    dates = [d for d in dates if d]
+    watermark = get_watermark()
+    if dates and watermark and min(dates) <= watermark:
+        set_watermark(min(dates) - timedelta(days=1))
+
+
+def get_failed_records():
+    """Id cac ban ghi cham cong xu ly loi o lan chay truoc (cho thu lai)"""
+    value = SystemConfig.get_value(FAILED_RECORDS_KEY)
+    return [int(record_id) for record_id in value.split(',')] if value else []
+
+
+def set_failed_records(record_ids):
+    """Ghi danh sach ban ghi xu ly loi (khong commit)"""
+    SystemConfig.set_value(FAILED_RECORDS_KEY, ','.join(str(record_id) for record_id in sorted(record_ids)),
+                           'Ban ghi cham cong xu ly di muon bi loi, thu lai o lan chay sau')
+
+
+def process_attendance_range(start, end, retry_ids=None):
+    """
+    Xu ly tat ca ban ghi di muon tu start den end (1 luot, so query co dinh)
+
+    Nap truoc NV, vi pham da co va so lan muon tu dau thang; lan muon thu may
+    tinh theo thu tu ngay trong bo nho.
 
     Args:
-        date: Ngay can xu ly (mac dinh la hom nay)
+        retry_ids: Id ban ghi loi o lan truoc, xu ly lai cung luot (co the nam
+            truoc start)
 
     Returns:
-        dict: Ket qua xu ly
+        dict: {'start', 'end', 'processed', 'errors', 'failed_ids', 'user_ids', 'dates'}
     """
-    if date is None:
-        date = datetime.now().date()
-
-    # Lay cac ban ghi di muon chua xu ly
+    in_range = (AttendanceRecord.date >= start) & (AttendanceRecord.date <= end)
     late_records = AttendanceRecord.query.filter(
-        AttendanceRecord.date == date,
+        or_(in_range, AttendanceRecord.id.in_(retry_ids)) if retry_ids else in_range,
         AttendanceRecord.is_late == True
-    ).all()
+    ).order_by(AttendanceRecord.date, AttendanceRecord.id).all()
 
-    processed = 0
-    errors = []
+    result = {'start': start, 'end': end, 'processed': 0, 'errors': [], 'failed_ids': [],
+              'user_ids': [], 'dates': []}
+    if not late_records:
+        return result
 
+    user_ids = {record.user_id for record in late_records}
+    users = {user.id: user for user in User.query.filter(User.id.in_(user_ids))}
+
+    # Vi pham di muon da co tu dau thang cua start: {(user_id, nam, thang): [ngay da sap xep]}
+    late_dates = {}
+    for user_id, violation_date in db.session.query(Violation.user_id, Violation.date).filter(
+        Violation.user_id.in_(user_ids),
+        Violation.type == ViolationType.LATE,
+        Violation.date >= min(start, late_records[0].date).replace(day=1),
+        Violation.date <= end
+    ).order_by(Violation.date):
+        late_dates.setdefault((user_id, violation_date.year, violation_date.month), []).append(violation_date)
+
+    now = datetime.utcnow()
+    violations = []
+    notifications = []
+    late_entries = {}
+    event_rows = []
     for record in late_records:
+        user = users.get(record.user_id)
+        if not user:
+            continue
+        month_dates = late_dates.setdefault((user.id, record.date.year, record.date.month), [])
         # Kiem tra da xu ly chua
-        existing_violation = Violation.query.filter_by(
-            user_id=record.user_id,
-            date=record.date,
-            type=ViolationType.LATE
-        ).first()
-
-        if existing_violation:
+        if record.date in month_dates:
             continue
 
         try:
-            violation = process_late_record(record)
-            if violation:
-                processed += 1
+            # Lan muon thu may trong thang (tinh ca lan nay)
+            late_count = bisect.bisect_right(month_dates, record.date) + 1
+            penalty = calculate_penalty(late_count, record.late_minutes)
+            violations.append({
+                'user_id': user.id,
+                'date': record.date,
+                'type': ViolationType.LATE,
+                'description': f"Di muon {record.late_minutes} phut (lan {late_count} trong thang)",
+                'penalty_amount': penalty,
+                'late_count_in_month': late_count,
+                'created_at': now
+            })
+            bisect.insort(month_dates, record.date)
         except Exception as e:
-            errors.append(f"Loi xu ly user {record.user_id}: {str(e)}")
+            result['errors'].append(f"Loi xu ly user {record.user_id}: {str(e)}")
+            result['failed_ids'].append(record.id)
+            continue
 
-    if processed > 0:
+        notifications.append(late_notification(user, late_count, record.late_minutes, penalty))
+        late_entries.setdefault(record.date, []).append({
+            'user': user, 'late_count': late_count, 'late_minutes': record.late_minutes, 'penalty': penalty
+        })
+        event_rows.append({
+            'user_id': user.id,
+            'full_name': user.full_name,
+            'date': record.date,
+            'type': ViolationType.LATE.value,
+            'late_minutes': record.late_minutes,
+            'penalty_amount': penalty
+        })
+
+    if violations:
+        db.session.execute(Violation.__table__.insert(), violations)
+        notify_many(notifications)
+        # Email / SMS canh bao: giu lai va gop thanh digest hang ngay (NOTIFY_DIGEST_KINDS)
+        for late_date, entries in late_entries.items():
+            queue_late_emails(entries, late_date)
+            queue_late_sms(entries, late_date)
         db.session.commit()
+        publish_violations(event_rows)
+
+    result['processed'] = len(violations)
+    result['user_ids'] = sorted({violation['user_id'] for violation in violations})
+    result['dates'] = sorted(late_entries)
+    return result
 
+
+def process_daily_attendance(date=None):
+    """
+    Xu ly tat ca ban ghi di muon trong ngay
+
+    Args:
+        date: Ngay can xu ly (mac dinh la hom nay)
+
+    Returns:
+        dict: Ket qua xu ly
+    """
+    if date is None:
+        date = datetime.now().date()
+
+    result = process_attendance_range(date, date)
     return {
         'date': date,
-        'processed': processed,
-        'errors': errors
+        'processed': result['processed'],
+        'errors': result['errors'],
+        'user_ids': result['user_ids']
     }
 
 
+def process_pending_attendance(until=None):
+    """
+    Xu ly bu tat ca cac ngay tu sau moc den until (mac dinh hom nay) trong 1 luot
+
+    Server tat / import tre khong lam sot ngay nao. Moc chi tien toi hom qua
+    (ngay da ket thuc): hom nay luon duoc xu ly lai o lan chay sau, ban ghi da
+    co vi pham tu bo qua. Ban ghi loi khong chan moc: luu id rieng va xu ly lai
+    cung luot sau.
+
+    Returns:
+        dict: Ket qua process_attendance_range + 'watermark' moi
+    """
+    today = datetime.now().date()
+    until = until or today
+    watermark = get_watermark()
+    if watermark is None:
+        catchup_days = current_app.config.get('ATTENDANCE_CATCHUP_DAYS', CATCHUP_DAYS)
+        watermark = until - timedelta(days=catchup_days)
+
+    start = watermark + timedelta(days=1)
+    failed_ids = get_failed_records()
+    if start > until and not failed_ids:
+        return {'start': start, 'end': until, 'processed': 0, 'errors': [], 'failed_ids': [],
+                'user_ids': [], 'dates': [], 'watermark': watermark}
+
+    result = process_attendance_range(start, until, retry_ids=failed_ids)
+    if set(result['failed_ids']) != set(failed_ids):
+        set_failed_records(result['failed_ids'])
+    new_watermark = min(until, today - timedelta(days=1))
+    if new_watermark > watermark:
+        set_watermark(new_watermark)
+        watermark = new_watermark
+    db.session.commit()
+    result['watermark'] = watermark
+    return result
+
+
 def get_monthly_late_summary(user_id, month, year):
     """
     Thong ke di muon trong thang cua user
@@ -0,0 +1,176 @@
+"""
+Module bao cao cham cong thang
+
+Toan bo bao cao duoc tinh bang 1 cau SQL duy nhat:
+- Gom nhom cham cong theo NV (tong gio, so ca, phut muon)
+- Gom nhom vi pham di muon theo NV (so lan, tien phat)
+- Sap xep, phan trang va tinh tong cong ngay trong database (window function)
+- Trang vuot qua so trang: lui ve trang cuoi (them 1 cau dem)
+"""
+
+import math
+from datetime import date as date_type
+from sqlalchemy import func, case, select
+from app.models import AttendanceRecord, Violation, User, Store, UserRole, ViolationType, db
+
+
+# Cac cot cho phep sap xep (tranh truyen thang ten cot tu request vao SQL)
+SORTABLE_COLUMNS = ('full_name', 'total_hours', 'total_shifts', 'late_count', 'late_minutes', 'total_penalty')
+DEFAULT_PER_PAGE = 50
+MAX_PER_PAGE = 500
+
+
+def _month_range(month, year):
+    month_start = date_type(year, month, 1)
+    if month == 12:
+        month_end = date_type(year + 1, 1, 1)
+    else:
+        month_end = date_type(year, month + 1, 1)
+    return month_start, month_end
+
+
+def get_monthly_attendance_report(month, year, role=UserRole.STAFF, store_id=None,
+                                  sort='total_hours', order='desc', page=1, per_page=DEFAULT_PER_PAGE):
+    """
+    Bao cao cham cong thang cho tat ca NV active
+
+    Args:
+        month, year: Thang can bao cao
+        role: Loc theo vai tro (UserRole hoac None = tat ca)
+        store_id: Loc theo cua hang (None = tat ca)
+        sort: Cot sap xep (xem SORTABLE_COLUMNS)
+        order: 'asc' hoac 'desc'
+        page, per_page: Phan trang
+
+    Returns:
+        dict: {
+            'items': List dict theo tung NV,
+            'totals': Tong cong cua toan bo ket qua (khong chi trang hien tai),
+            'page', 'per_page', 'total', 'pages', 'sort', 'order'
+        }
+    """
+    month_start, month_end = _month_range(month, year)
+
+    if sort not in SORTABLE_COLUMNS:
+        sort = 'total_hours'
+    order = 'asc' if order == 'asc' else 'desc'
+    page = max(page or 1, 1)
+    per_page = min(max(per_page or DEFAULT_PER_PAGE, 1), MAX_PER_PAGE)
+
+    # Tong hop cham cong theo NV
+    attendance = select(
+        AttendanceRecord.user_id.label('user_id'),
+        func.sum(AttendanceRecord.total_work_hours).label('total_hours'),
+        func.count(AttendanceRecord.id).label('total_shifts'),
+        func.sum(case((AttendanceRecord.is_late == True, AttendanceRecord.late_minutes), else_=0)).label('late_minutes')
+    ).where(
+        AttendanceRecord.date >= month_start,
+        AttendanceRecord.date < month_end
+    ).group_by(AttendanceRecord.user_id).subquery('att')
+
+    # Tong hop vi pham di muon theo NV
+    violations = select(
+        Violation.user_id.label('user_id'),
+        func.count(Violation.id).label('late_count'),
+        func.sum(Violation.penalty_amount).label('total_penalty')
+    ).where(
+        Violation.type == ViolationType.LATE,
+        Violation.date >= month_start,
+        Violation.date < month_end
+    ).group_by(Violation.user_id).subquery('vio')
+
+    total_hours = func.coalesce(attendance.c.total_hours, 0)
+    total_shifts = func.coalesce(attendance.c.total_shifts, 0)
+    late_minutes = func.coalesce(attendance.c.late_minutes, 0)
+    late_count = func.coalesce(violations.c.late_count, 0)
+    total_penalty = func.coalesce(violations.c.total_penalty, 0)
+
+    columns = {
+        'full_name': User.full_name,
+        'total_hours': total_hours,
+        'total_shifts': total_shifts,
+        'late_count': late_count,
+        'late_minutes': late_minutes,
+        'total_penalty': total_penalty,
+    }
+
+    query = select(
+        User.id,
+        User.full_name,
+        User.username,
+        User.role,
+        Store.name.label('store_name'),
+        total_hours.label('total_hours'),
+        total_shifts.label('total_shifts'),
+        late_count.label('late_count'),
+        late_minutes.label('late_minutes'),
+        total_penalty.label('total_penalty'),
+        # Tong cong tren toan bo ket qua loc - tinh truoc LIMIT/OFFSET
+        func.count().over().label('total_rows'),
+        func.sum(total_hours).over().label('sum_hours'),
+        func.sum(total_shifts).over().label('sum_shifts'),
+        func.sum(late_count).over().label('sum_late_count'),
+        func.sum(late_minutes).over().label('sum_late_minutes'),
+        func.sum(total_penalty).over().label('sum_penalty')
+    ).select_from(User)\
+     .outerjoin(Store, User.store_id == Store.id)\
+     .outerjoin(attendance, attendance.c.user_id == User.id)\
+     .outerjoin(violations, violations.c.user_id == User.id)\
+     .where(User.status == 'active')
+
+    if role is not None:
+        query = query.where(User.role == role)
+    if store_id:
+        query = query.where(User.store_id == store_id)
+
+    sort_column = columns[sort]
+    query = query.order_by(
+        sort_column.asc() if order == 'asc' else sort_column.desc(),
+        User.id
+    )
+
+    rows = db.session.execute(query.limit(per_page).offset((page - 1) * per_page)).all()
+    if not rows and page > 1:
+        # Trang vuot qua so trang (window function chi tinh tren dong tra ve):
+        # dem lai va lay trang cuoi
+        count = db.session.execute(
+            select(func.count()).select_from(query.order_by(None).subquery())
+        ).scalar()
+        page = max(math.ceil(count / per_page), 1)
+        rows = db.session.execute(query.limit(per_page).offset((page - 1) * per_page)).all()
+
+    items = [{
+        'user_id': row.id,
+        'full_name': row.full_name,
+        'username': row.username,
+        'role': row.role.value if hasattr(row.role, 'value') else row.role,
+        'store_name': row.store_name,
+        'total_hours': round(row.total_hours or 0, 1),
+        'total_shifts': row.total_shifts,
+        'late_count': row.late_count,
+        'late_minutes': row.late_minutes,
+        'total_penalty': row.total_penalty or 0
+    } for row in rows]
+
+    first = rows[0] if rows else None
+    total = first.total_rows if first else 0
+    totals = {
+        'total_hours': round(first.sum_hours or 0, 1) if first else 0,
+        'total_shifts': first.sum_shifts if first else 0,
+        'late_count': first.sum_late_count if first else 0,
+        'late_minutes': first.sum_late_minutes if first else 0,
+        'total_penalty': (first.sum_penalty or 0) if first else 0
+    }
+
+    return {
+        'items': items,
+        'totals': totals,
+        'page': page,
+        'per_page': per_page,
+        'total': total,
+        'pages': math.ceil(total / per_page) if total else 0,
+        'sort': sort,
+        'order': order,
+        'month': month,
+        'year': year
+    }
@@ -1,13 +1,19 @@
 import os
 import json
-from flask import render_template, redirect, url_for, flash, request, current_app, session
+from flask import render_template, redirect, url_for, flash, request, current_app, session, jsonify
 from flask_login import login_required, current_user
 from werkzeug.utils import secure_filename
 from datetime import datetime, timedelta
 from app.attendance import bp
 from app.attendance.import_handler import import_attendance_excel, parse_attendance_preview, save_attendance_from_preview
-from app.attendance.late_checker import process_daily_attendance, get_monthly_late_summary
-from app.models import AttendanceRecord, User, UserRole, db
+from app.attendance.late_checker import (
+    process_daily_attendance, process_pending_attendance, get_monthly_late_summary, rewind_watermark
+)
+from app.attendance.monthly_report import get_monthly_attendance_report, DEFAULT_PER_PAGE
+from app.attendance.browser import get_attendance_page, get_attendance_stats, serialize_record, DEFAULT_PAGE_SIZE
+from app.dashboard.snapshot import invalidate_admin_snapshot
+from app.dashboard.staff_snapshot import refresh_staff_snapshots
+from app.models import AttendanceRecord, User, UserRole, Store, db
 from app.auth.routes import manager_required
 
 
@@ -132,11 +138,15 @@ def confirm_import():
         if result['success'] > 0:
             flash(f"Da import thanh cong {result['success']} ban ghi.", 'success')
 
-            # Xu ly di muon
-            process_result = process_daily_attendance()
+            # Xu ly di muon (ca cac ngay cu vua import)
+            process_result = process_pending_attendance()
             if process_result['processed'] > 0:
                 flash(f"Da xu ly {process_result['processed']} truong hop di muon.", 'info')
 
+            # Du lieu thay doi -> xoa cache dashboard, tinh lai dashboard NV
+            invalidate_admin_snapshot()
+            refresh_staff_snapshots(result['user_ids'])
+
         if result['errors']:
             for error in result['errors'][:5]:
                 flash(error, 'warning')
@@ -173,17 +183,12 @@ def cancel_import():
     return redirect(url_for('attendance.import_page'))
 
 
-@bp.route('/view')
-@login_required
-@manager_required
-def view():
-    """Xem cham cong cua tat ca NV - Ho tro loc theo khoang ngay"""
-    # Loc theo khoang ngay
+def _view_date_range():
+    """Doc khoang ngay va NV tu query string (mac dinh: 7 ngay gan nhat)"""
     from_date_str = request.args.get('from_date')
     to_date_str = request.args.get('to_date')
     user_id = request.args.get('user_id', type=int)
 
-    # Default: 7 ngay gan nhat
     if from_date_str:
         try:
             from_date = datetime.strptime(from_date_str, '%Y-%m-%d').date()
@@ -200,40 +205,62 @@ def view():
     else:
         to_date = datetime.now().date()
 
-    # Query du lieu cham cong
-    query = db.session.query(
-        AttendanceRecord, User
-    ).join(User).filter(
-        AttendanceRecord.date >= from_date,
-        AttendanceRecord.date <= to_date
-    )
+    return from_date, to_date, user_id
 
-    # Loc theo NV neu co
-    if user_id:
-        query = query.filter(AttendanceRecord.user_id == user_id)
 
-    records = query.order_by(
-        AttendanceRecord.date.desc(),
-        AttendanceRecord.actual_checkin
-    ).all()
+@bp.route('/view')
+@login_required
+@manager_required
+def view():
+    """Xem cham cong cua tat ca NV - Ho tro loc theo khoang ngay"""
+    from_date, to_date, user_id = _view_date_range()
+    cursor = request.args.get('cursor')
+    per_page = request.args.get('per_page', DEFAULT_PAGE_SIZE, type=int)
 
-    # Thong ke
-    total_records = len(records)
-    late_count = sum(1 for r, u in records if r.is_late)
-    early_bird_count = sum(1 for r, u in records if r.is_early_bird)
+    # Phan trang keyset - chi doc 1 trang
+    page = get_attendance_page(from_date, to_date, user_id, cursor=cursor, per_page=per_page)
+
+    # Thong ke tinh bang aggregate rieng, khong load ban ghi
+    stats = get_attendance_stats(from_date, to_date, user_id)
 
     # Danh sach NV de filter
     all_users = User.query.filter_by(status='active').order_by(User.full_name).all()
 
     return render_template('attendance/view.html',
-                           records=records,
+                           records=page['records'],
+                           next_cursor=page['next_cursor'],
+                           cursor=cursor,
+                           per_page=per_page,
                            from_date=from_date,
                            to_date=to_date,
                            selected_user_id=user_id,
                            all_users=all_users,
-                           total_records=total_records,
-                           late_count=late_count,
-                           early_bird_count=early_bird_count)
+                           total_records=stats['total_records'],
+                           late_count=stats['late_count'],
+                           early_bird_count=stats['early_bird_count'])
+
+
+@bp.route('/api/records')
+@login_required
+@manager_required
+def api_records():
+    """API JSON: ban ghi cham cong phan trang keyset (?cursor=...)"""
+    from_date, to_date, user_id = _view_date_range()
+    cursor = request.args.get('cursor')
+    per_page = request.args.get('per_page', DEFAULT_PAGE_SIZE, type=int)
+
+    page = get_attendance_page(from_date, to_date, user_id, cursor=cursor, per_page=per_page)
+
+    result = {
+        'records': [serialize_record(record, user) for record, user in page['records']],
+        'next_cursor': page['next_cursor']
+    }
+
+    # Thong ke chi tinh o trang dau (hoac khi yeu cau) de cac trang sau re hon
+    if not cursor or request.args.get('stats') == '1':
+        result['stats'] = get_attendance_stats(from_date, to_date, user_id)
+
+    return jsonify(result)
 
 
 @bp.route('/my-attendance')
@@ -272,54 +299,77 @@ def my_attendance():
                            late_summary=late_summary)
 
 
+def _report_params():
+    """Doc tham so loc/sap xep/phan trang cua bao cao tu query string"""
+    month = request.args.get('month', type=int, default=datetime.now().month)
+    year = request.args.get('year', type=int, default=datetime.now().year)
+
+    # Mac dinh chi lay NV (giong bao cao cu), 'all' = tat ca vai tro
+    role_str = request.args.get('role', UserRole.STAFF.value)
+    try:
+        role = None if role_str == 'all' else UserRole(role_str)
+    except ValueError:
+        role = UserRole.STAFF
+        role_str = UserRole.STAFF.value
+
+    return {
+        'month': month,
+        'year': year,
+        'role': role,
+        'role_str': role_str,
+        'store_id': request.args.get('store_id', type=int),
+        'sort': request.args.get('sort', 'total_hours'),
+        'order': request.args.get('order', 'desc'),
+        'page': request.args.get('page', 1, type=int),
+        'per_page': request.args.get('per_page', DEFAULT_PER_PAGE, type=int)
+    }
+
+
 @bp.route('/report')
 @login_required
 @manager_required
 def report():
     """Bao cao cham cong"""
-    # Loc theo thang
-    month = request.args.get('month', type=int, default=datetime.now().month)
-    year = request.args.get('year', type=int, default=datetime.now().year)
-
-    from datetime import date
-    month_start = date(year, month, 1)
-    if month == 12:
-        month_end = date(year + 1, 1, 1)
-    else:
-        month_end = date(year, month + 1, 1)
+    params = _report_params()
+    report = get_monthly_attendance_report(
+        params['month'], params['year'],
+        role=params['role'],
+        store_id=params['store_id'],
+        sort=params['sort'],
+        order=params['order'],
+        page=params['page'],
+        per_page=params['per_page']
+    )
 
-    # Lay tat ca NV active
-    users = User.query.filter_by(status='active', role=UserRole.STAFF).all()
-
-    report_data = []
-    for user in users:
-        # Lay cham cong
-        records = AttendanceRecord.query.filter(
-            AttendanceRecord.user_id == user.id,
-            AttendanceRecord.date >= month_start,
-            AttendanceRecord.date < month_end
-        ).all()
-
-        total_hours = sum(r.total_work_hours for r in records)
-        total_shifts = len(records)
-        late_summary = get_monthly_late_summary(user.id, month, year)
-
-        report_data.append({
-            'user': user,
-            'total_hours': round(total_hours, 1),
-            'total_shifts': total_shifts,
-            'late_count': late_summary['total_late'],
-            'late_minutes': late_summary['total_minutes'],
-            'total_penalty': late_summary['total_penalty']
-        })
-
-    # Sap xep theo gio lam (giam dan)
-    report_data.sort(key=lambda x: x['total_hours'], reverse=True)
+    stores = Store.query.filter_by(status='active').order_by(Store.name).all()
 
     return render_template('attendance/report.html',
-                           report_data=report_data,
-                           month=month,
-                           year=year)
+                           report=report,
+                           month=params['month'],
+                           year=params['year'],
+                           role_filter=params['role_str'],
+                           store_id=params['store_id'],
+                           stores=stores)
+
+
+@bp.route('/report/data')
+@login_required
+@manager_required
+def report_data():
+    """Bao cao cham cong dang JSON (cho frontend)"""
+    params = _report_params()
+    report = get_monthly_attendance_report(
+        params['month'], params['year'],
+        role=params['role'],
+        store_id=params['store_id'],
+        sort=params['sort'],
+        order=params['order'],
+        page=params['page'],
+        per_page=params['per_page']
+    )
+    report['role'] = params['role_str']
+    report['store_id'] = params['store_id']
+    return jsonify(report)
 
 
 @bp.route('/update/<int:record_id>', methods=['POST'])
@@ -377,7 +427,11 @@ def update_record(record_id):
             record.is_late = False
             record.is_early_bird = False
 
+        if record.is_late:
+            rewind_watermark([record.date])
         db.session.commit()
+        invalidate_admin_snapshot()
+        refresh_staff_snapshots([record.user_id])
         flash('Da cap nhat ban ghi cham cong.', 'success')
 
     except Exception as e:
@@ -397,10 +451,13 @@ def delete_record(record_id):
     """Xoa ban ghi cham cong"""
     record = AttendanceRecord.query.get_or_404(record_id)
     record_date = record.date
+    record_user_id = record.user_id
 
     try:
         db.session.delete(record)
         db.session.commit()
+        invalidate_admin_snapshot()
+        refresh_staff_snapshots([record_user_id])
         flash('Da xoa ban ghi cham cong.', 'success')
     except Exception as e:
         db.session.rollback()
@@ -432,6 +489,8 @@ def process_late():
     result = process_daily_attendance(process_date)
 
     if result['processed'] > 0:
+        invalidate_admin_snapshot()
+        refresh_staff_snapshots(result['user_ids'])
         flash(f"Da xu ly {result['processed']} truong hop di muon.", 'success')
     else:
         flash("Khong co truong hop di muon can xu ly.", 'info')
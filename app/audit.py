@@ -0,0 +1,190 @@
+"""
+Ghi ActivityLog kieu write-behind
+
+ActivityLog.log / log_many chi dua ban ghi vao hang doi trong bo nho (vai micro
+giay), khong commit session cua request. 1 thread nen gom lo va INSERT nhieu
+dong bang ket noi rieng:
+- Ghi khi du ACTIVITY_LOG_BATCH_SIZE dong hoac sau ACTIVITY_LOG_FLUSH_MS ms
+- Loi CSDL tam thoi (OperationalError: database is locked, mat ket noi): thu lai
+  ACTIVITY_LOG_RETRIES lan, cho tang gap doi; van loi thi thread nen dua lo ve
+  hang doi de ghi lai sau. Chi bo log (ghi log loi) khi hang doi cung day
+- Hang doi day (ACTIVITY_LOG_QUEUE_SIZE): ghi dong bo, khong bo log
+- Tat process: atexit ghi not phan con lai
+- ACTIVITY_LOG_ASYNC = False (mac dinh khi TESTING): ghi dong bo, van bang ket
+  noi rieng (khong commit giup nguoi goi)
+
+Ghi dong bo (che do dong bo / hang doi day) khi session cua nguoi goi dang mo
+transaction: doi transaction do ket thuc (commit / rollback) roi moi ghi. SQLite
+khoa ca file khi ghi: ket noi thu 2 ghi ngay se cho het busy timeout roi loi.
+
+Luu y: moi worker gunicorn co hang doi + thread rieng (tao lai sau fork).
+"""
+
+import atexit
+import os
+import queue
+import threading
+import time
+from sqlalchemy import event
+from sqlalchemy.exc import DBAPIError, OperationalError
+
+BATCH_SIZE = 200
+FLUSH_MS = 500
+QUEUE_SIZE = 10000
+RETRIES = 3
+RETRY_DELAY = 0.2  # Giay, tang gap doi moi lan thu lai
+
+
+class ActivityLogSink:
+    """Hang doi ActivityLog co gioi han + thread ghi theo lo"""
+
+    def __init__(self):
+        self.app = None
+        self.async_mode = False
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        self.async_mode = app.config.get('ACTIVITY_LOG_ASYNC', True) and not app.testing
+        self.batch_size = app.config.get('ACTIVITY_LOG_BATCH_SIZE', BATCH_SIZE)
+        self.flush_interval = app.config.get('ACTIVITY_LOG_FLUSH_MS', FLUSH_MS) / 1000
+        self.queue_size = app.config.get('ACTIVITY_LOG_QUEUE_SIZE', QUEUE_SIZE)
+        self.retries = app.config.get('ACTIVITY_LOG_RETRIES', RETRIES)
+        app.extensions['activity_log_sink'] = self
+
+    def _ensure_worker(self):
+        """Tao hang doi + thread lan dau dung trong process (sau fork thi tao lai)"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=self.queue_size)
+            self._thread = threading.Thread(target=self._run, name='activity-log-sink', daemon=True)
+            self._thread.start()
+            if self._pid is None:
+                atexit.register(self.flush)
+            self._pid = os.getpid()
+
+    def emit(self, row):
+        """Dua 1 dong log vao hang doi (hoac ghi dong bo neu che do dong bo / hang doi day)"""
+        if not self.async_mode:
+            self._write_sync([row])
+            return
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self._write_sync([row])
+
+    def emit_many(self, rows):
+        """Dua nhieu dong vao hang doi; che do dong bo thi ghi 1 cau INSERT"""
+        if not self.async_mode:
+            self._write_sync(rows)
+            return
+        for row in rows:
+            self.emit(row)
+
+    def _write_sync(self, rows):
+        """Ghi ngay, hoac sau khi transaction dang mo cua session nguoi goi ket thuc"""
+        from app.models import db
+
+        session = db.session() if self._has_app_context() else None
+        if session is None or not session.in_transaction():
+            self._write(rows)
+            return
+        if not session.info.get('activity_log_listener'):
+            event.listen(session, 'after_transaction_end', self._after_transaction_end)
+            session.info['activity_log_listener'] = True
+        session.info.setdefault('activity_log_rows', []).extend(rows)
+
+    def _after_transaction_end(self, session, transaction):
+        if transaction.parent is None:
+            self._write(session.info.pop('activity_log_rows', []))
+
+    @staticmethod
+    def _has_app_context():
+        from flask import has_app_context
+        return has_app_context()
+
+    def _drain(self):
+        rows = []
+        while len(rows) < self.batch_size:
+            try:
+                rows.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return rows
+
+    def _run(self):
+        while True:
+            try:
+                first = self._queue.get()
+            except Exception:
+                return
+            # Doi them toi flush_interval de gom lo (tru khi da du batch_size)
+            deadline = time.monotonic() + self.flush_interval
+            rows = [first]
+            while len(rows) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    rows.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._write(rows, requeue=True)
+
+    def _write(self, rows, requeue=False):
+        """INSERT 1 lo; loi tam thoi thi thu lai, requeue = dua ve hang doi neu van loi"""
+        from app.models import ActivityLog, db
+
+        if not rows:
+            return
+        for attempt in range(self.retries + 1):
+            try:
+                with self.app.app_context():
+                    with db.engine.begin() as conn:
+                        conn.execute(ActivityLog.__table__.insert(), rows)
+                return
+            except DBAPIError as e:
+                error = e
+                if not (isinstance(e, OperationalError) or e.connection_invalidated):
+                    break
+                if attempt < self.retries:
+                    time.sleep(RETRY_DELAY * 2 ** attempt)
+            except Exception as e:
+                error = e
+                break
+
+        if requeue:
+            rows = self._requeue(rows)
+            if not rows:
+                self.app.logger.warning(f'ActivityLog: ghi loi, dua lo ve hang doi: {str(error)}')
+                return
+        self.app.logger.error(f'ActivityLog: khong ghi duoc {len(rows)} dong: {str(error)}')
+
+    def _requeue(self, rows):
+        """Dua cac dong ve hang doi; tra ve cac dong khong con cho"""
+        for i, row in enumerate(rows):
+            try:
+                self._queue.put_nowait(row)
+            except queue.Full:
+                return rows[i:]
+        return []
+
+    def flush(self):
+        """Ghi ngay tat ca log dang cho (test / tat process)"""
+        if self._queue is None or self._pid != os.getpid():
+            return
+        while True:
+            rows = self._drain()
+            if not rows:
+                break
+            self._write(rows)
+
+
+activity_log_sink = ActivityLogSink()
@@ -100,6 +100,9 @@ class EditUserForm(FlaskForm):
         ('inactive', 'Da nghi viec')
     ])
 
+    # Danh sach cua hang duoc nap trong route (0 = chua gan cua hang)
+    store_id = SelectField('Cua hang', coerce=int, validators=[Optional()])
+
     # Doi mat khau (optional)
     new_password = PasswordField('Mat khau moi', validators=[Optional()])
     new_password2 = PasswordField('Xac nhan mat khau moi', validators=[Optional(), EqualTo('new_password', message='Mat khau xac nhan khong khop')])
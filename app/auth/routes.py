@@ -2,7 +2,7 @@ from flask import render_template, redirect, url_for, flash, request
 from flask_login import login_user, logout_user, current_user, login_required
 from app.auth import bp
 from app.auth.forms import LoginForm, RegisterForm, ChangePasswordForm, EditUserForm
-from app.models import User, UserRole, EmploymentType, ActivityLog, db
+from app.models import User, UserRole, EmploymentType, ActivityLog, Store, db
 from functools import wraps
 
 
@@ -129,6 +129,9 @@ def edit_user(user_id):
     """Chinh sua thong tin user"""
     user = User.query.get_or_404(user_id)
     form = EditUserForm(obj=user)
+    form.store_id.choices = [(0, '-- Chua gan --')] + [
+        (s.id, s.name) for s in Store.query.filter_by(status='active').order_by(Store.name).all()
+    ]
 
     if form.validate_on_submit():
         user.full_name = form.full_name.data
@@ -147,6 +150,7 @@ def edit_user(user_id):
         user.probation_start_date = form.probation_start_date.data
         user.probation_end_date = form.probation_end_date.data
         user.status = form.status.data
+        user.store_id = form.store_id.data or None
 
         # Doi mat khau neu co nhap
         if form.new_password.data:
@@ -172,6 +176,7 @@ def edit_user(user_id):
     form.role.data = user.role.value
     form.employment_type.data = user.employment_type.value
     form.status.data = user.status
+    form.store_id.data = user.store_id or 0
 
     return render_template('auth/edit_user.html', form=form, user=user)
 
@@ -0,0 +1,128 @@
+"""
+Pub/sub trong bo nho cho dashboard real-time (Server-Sent Events)
+
+Import cham cong, xu ly di muon va tinh luong publish cac thay doi (delta)
+vao broker; moi ket noi SSE dang mo co 1 hang doi rieng co gioi han.
+Client cap nhat KPI tu delta ma khong can tai lai trang / query lai DB.
+
+Luu y: giong app/cache.py, broker chi song trong 1 process. Voi nhieu
+worker gunicorn, client chi nhan su kien phat ra tu worker cua no.
+"""
+
+import itertools
+import json
+import queue
+import threading
+from datetime import datetime
+
+
+QUEUE_SIZE = 100
+MAX_ROWS = 200  # So dong toi da gui kem moi su kien
+
+
+class EventBroker:
+    """Phan phoi su kien cho cac subscriber, moi subscriber 1 Queue co gioi han"""
+
+    def __init__(self, queue_size=QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def subscribe(self):
+        """Dang ky nhan su kien, tra ve Queue cua subscriber"""
+        q = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def publish(self, event, data):
+        """
+        Gui su kien toi tat ca subscriber (khong bao gio block)
+
+        Subscriber doc cham -> bo su kien cu nhat de nhuong cho su kien moi.
+
+        Returns:
+            int: So subscriber da nhan
+        """
+        message = (next(self._ids), event, data)
+        with self._lock:
+            subscribers = list(self._subscribers)
+
+        for q in subscribers:
+            while True:
+                try:
+                    q.put_nowait(message)
+                    break
+                except queue.Full:
+                    try:
+                        q.get_nowait()
+                    except queue.Empty:
+                        pass
+        return len(subscribers)
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+
+broker = EventBroker()
+
+
+def format_sse(event_id, event, data):
+    """Dinh dang 1 message theo chuan text/event-stream"""
+    payload = json.dumps(data, ensure_ascii=False, default=str, separators=(',', ':'))
+    return f'id: {event_id}\nevent: {event}\ndata: {payload}\n\n'
+
+
+def _in_current_month(value, today):
+    return value.year == today.year and value.month == today.month
+
+
+def publish_attendance(rows):
+    """
+    Phat su kien ban ghi cham cong moi / cap nhat (sau khi da commit)
+
+    Args:
+        rows: List dict {'user_id', 'full_name', 'date', 'shift_type', 'checkin',
+              'is_late', 'late_minutes', 'total_work_hours', 'hours_delta'}
+    """
+    if not rows or not broker.subscriber_count:
+        return
+    today = datetime.now().date()
+    broker.publish('attendance', {
+        'count': len(rows),
+        'late_count': sum(1 for r in rows if r['is_late']),
+        'month_hours_delta': round(sum(
+            r['hours_delta'] for r in rows if _in_current_month(r['date'], today)
+        ), 2),
+        'rows': [{k: v for k, v in r.items() if k != 'hours_delta'} for r in rows[:MAX_ROWS]]
+    })
+
+
+def publish_violations(violations):
+    """Phat su kien vi pham moi (sau khi da commit)"""
+    if not violations or not broker.subscriber_count:
+        return
+    today = datetime.now().date()
+    broker.publish('violation', {
+        'count': len(violations),
+        'month_count': sum(1 for v in violations if _in_current_month(v['date'], today)),
+        'rows': violations[:MAX_ROWS]
+    })
+
+
+def publish_payroll_totals(month, year, count, total_net):
+    """Phat tong luong thang sau khi tinh luong"""
+    if not broker.subscriber_count:
+        return
+    broker.publish('payroll', {
+        'month': month,
+        'year': year,
+        'count': count,
+        'total_net': total_net
+    })
@@ -1,16 +1,14 @@
-from flask import render_template, redirect, url_for
+import queue
+import time
+from flask import render_template, redirect, url_for, current_app, Response
 from flask_login import login_required, current_user
 from app.dashboard import bp
-from app.dashboard.utils import (
-    get_admin_dashboard_stats,
-    get_staff_dashboard_stats,
-    get_weekly_hours_chart_data,
-    get_top_employees,
-    get_violation_stats,
-    get_current_week_schedule,
-    get_recent_notifications
-)
-from app.models import UserRole
+from app.dashboard.events import broker, format_sse
+from app.dashboard.utils import get_recent_notifications
+from app.dashboard.snapshot import get_admin_snapshot
+from app.dashboard.staff_snapshot import get_staff_snapshot
+from app.models import UserRole, db
+from app.auth.routes import manager_required
 
 
 @bp.route('/')
@@ -30,61 +28,74 @@ def admin():
     if current_user.role not in [UserRole.ADMIN, UserRole.MANAGER]:
         return redirect(url_for('dashboard.staff'))
 
-    stats = get_admin_dashboard_stats()
-    weekly_hours = get_weekly_hours_chart_data()
-    top_employees = get_top_employees()
-    violation_stats = get_violation_stats()
-    week_schedule = get_current_week_schedule()
+    # Tat ca widget lay tu snapshot (1 query, cache theo ngay + vai tro)
+    snapshot = get_admin_snapshot(current_user.role)
     notifications = get_recent_notifications(current_user.id)
 
     return render_template('dashboard/admin_dashboard.html',
-                           stats=stats,
-                           weekly_hours=weekly_hours,
-                           top_employees=top_employees,
-                           violation_stats=violation_stats,
-                           week_schedule=week_schedule,
+                           stats=snapshot['stats'],
+                           weekly_hours=snapshot['weekly_hours'],
+                           top_employees=snapshot['top_employees'],
+                           violation_stats=snapshot['violation_stats'],
                            notifications=notifications)
 
 
+@bp.route('/stream')
+@login_required
+@manager_required
+def stream():
+    """
+    Day cap nhat dashboard theo thoi gian thuc (Server-Sent Events)
+
+    Moi ket noi giu 1 thread cua worker: can worker gthread / gevent (xem Dockerfile).
+    Generator khong giu request context / ket noi DB; ket noi tu dong sau
+    DASHBOARD_SSE_MAX_SECONDS giay, trinh duyet tu ket noi lai.
+    """
+    heartbeat = current_app.config.get('DASHBOARD_SSE_HEARTBEAT', 15)
+    max_seconds = current_app.config.get('DASHBOARD_SSE_MAX_SECONDS', 300)
+
+    # Tra ket noi DB cua load_user ve pool truoc khi stream
+    db.session.remove()
+
+    def generate():
+        subscription = broker.subscribe()
+        deadline = time.monotonic() + max_seconds
+        try:
+            # Trinh duyet tu ket noi lai sau 5s neu mat ket noi
+            yield 'retry: 5000\n\n'
+            while time.monotonic() < deadline:
+                try:
+                    event_id, event, data = subscription.get(timeout=heartbeat)
+                except queue.Empty:
+                    # Giu ket noi song qua proxy
+                    yield ': ping\n\n'
+                    continue
+                yield format_sse(event_id, event, data)
+        finally:
+            broker.unsubscribe(subscription)
+
+    return Response(generate(),
+                    mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
 @bp.route('/staff')
 @login_required
 def staff():
     """Dashboard cho Nhan vien"""
-    stats = get_staff_dashboard_stats(current_user.id)
-    notifications = get_recent_notifications(current_user.id)
-
-    # Lich lam viec tuan nay cua NV
     from datetime import datetime, timedelta
-    from app.models import WorkSchedule, ScheduleShift
 
     today = datetime.now().date()
     week_start = today - timedelta(days=today.weekday())
     week_end = week_start + timedelta(days=6)
 
-    my_schedule = WorkSchedule.query.filter(
-        WorkSchedule.user_id == current_user.id,
-        WorkSchedule.week_start_date <= today,
-        WorkSchedule.week_end_date >= today
-    ).first()
-
-    my_shifts = []
-    if my_schedule:
-        my_shifts = ScheduleShift.query.filter(
-            ScheduleShift.schedule_id == my_schedule.id,
-            ScheduleShift.is_confirmed == True
-        ).order_by(ScheduleShift.date).all()
-
-    # Kiem tra trang thai dang ky lich tuan sau
-    next_week_start = week_end + timedelta(days=1)
-    next_schedule = WorkSchedule.query.filter_by(
-        user_id=current_user.id,
-        week_start_date=next_week_start
-    ).first()
+    # Toan bo du lieu lay tu snapshot da tinh truoc (1 lan doc theo khoa chinh)
+    snapshot = get_staff_snapshot(current_user.id)
 
     return render_template('dashboard/staff_dashboard.html',
-                           stats=stats,
-                           notifications=notifications,
-                           my_shifts=my_shifts,
-                           next_schedule=next_schedule,
+                           stats=snapshot['stats'],
+                           notifications=snapshot['notifications'],
+                           my_shifts=snapshot['my_shifts'],
+                           next_schedule=snapshot['next_schedule'],
                            week_start=week_start,
                            week_end=week_end)
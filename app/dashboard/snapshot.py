@@ -0,0 +1,147 @@
+"""
+Snapshot dashboard Admin/Manager
+
+Tat ca widget (KPI, bieu do gio lam 4 tuan, top guong mau, vi pham theo loai)
+duoc tinh bang 1 cau SQL (UNION ALL cac aggregate) va cache theo (ngay, vai tro)
+voi TTL ngan. Cache duoc xoa khi import cham cong / xu ly di muon.
+"""
+
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import func, case, cast, literal, null, select, union_all, String, Float
+from app.cache import TTLCache
+from app.models import User, AttendanceRecord, Violation, Payroll, ViolationType, db
+
+
+DEFAULT_TTL = 60  # giay
+
+_admin_cache = TTLCache(ttl=DEFAULT_TTL, maxsize=64)
+
+
+def _row(widget, key, label, value):
+    """Chuan hoa 4 cot chung cho UNION ALL"""
+    return (
+        literal(widget, String).label('widget'),
+        cast(key, String).label('key'),
+        cast(label, String).label('label'),
+        cast(value, Float).label('value')
+    )
+
+
+def _week_ranges(today):
+    """4 tuan gan nhat (cu nhat truoc) - giong get_weekly_hours_chart_data"""
+    ranges = []
+    for i in range(4):
+        week_end = today - timedelta(days=today.weekday()) - timedelta(weeks=i)
+        week_start = week_end - timedelta(days=6)
+        ranges.insert(0, (f'Tuan {4 - i}', week_start, week_end))
+    return ranges
+
+
+def build_admin_snapshot(today=None):
+    """
+    Tinh tat ca widget dashboard Admin bang 1 round-trip
+
+    Returns:
+        dict: {'stats', 'weekly_hours', 'top_employees', 'violation_stats', 'generated_at'}
+    """
+    if today is None:
+        today = datetime.now().date()
+    month_start = today.replace(day=1)
+    weeks = _week_ranges(today)
+
+    kpi_staff = select(*_row('kpi', literal('total_staff'), null(), func.count(User.id)))\
+        .where(User.status == 'active')
+
+    kpi_hours = select(*_row('kpi', literal('total_hours'), null(),
+                             func.coalesce(func.sum(AttendanceRecord.total_work_hours), 0)))\
+        .where(AttendanceRecord.date >= month_start, AttendanceRecord.date <= today)
+
+    kpi_violations = select(*_row('kpi', literal('total_violations'), null(), func.count(Violation.id)))\
+        .where(Violation.date >= month_start, Violation.date <= today)
+
+    kpi_payroll = select(*_row('kpi', literal('total_payroll'), null(),
+                               func.coalesce(func.sum(Payroll.net_salary), 0)))\
+        .where(Payroll.month == today.month, Payroll.year == today.year)
+
+    # Gio lam theo tuan: gom nhom theo "bucket" tuan (conditional aggregation)
+    bucket = case(
+        *[(AttendanceRecord.date >= week_start, literal(label))
+          for label, week_start, _ in reversed(weeks)],
+        else_=literal(weeks[0][0])
+    )
+    weekly_hours = select(*_row('week', bucket, null(), func.sum(AttendanceRecord.total_work_hours)))\
+        .where(AttendanceRecord.date >= weeks[0][1], AttendanceRecord.date <= weeks[-1][2])\
+        .group_by(bucket)
+
+    # Top 5 NV guong mau (di som) trong thang
+    early_birds = func.count(AttendanceRecord.id)
+    top = select(User.id.label('user_id'), User.full_name.label('full_name'), early_birds.label('cnt'))\
+        .join(AttendanceRecord, AttendanceRecord.user_id == User.id)\
+        .where(
+            AttendanceRecord.is_early_bird == True,
+            AttendanceRecord.date >= month_start,
+            AttendanceRecord.date <= today
+        ).group_by(User.id, User.full_name).order_by(early_birds.desc()).limit(5).subquery('top')
+    top_employees = select(*_row('top', top.c.user_id, top.c.full_name, top.c.cnt))
+
+    # Vi pham theo loai
+    violation_stats = select(*_row('violation', Violation.type, null(), func.count(Violation.id)))\
+        .where(Violation.date >= month_start, Violation.date <= today)\
+        .group_by(Violation.type)
+
+    rows = db.session.execute(union_all(
+        kpi_staff, kpi_hours, kpi_violations, kpi_payroll,
+        weekly_hours, top_employees, violation_stats
+    )).all()
+
+    stats = {'total_staff': 0, 'total_hours': 0, 'total_violations': 0, 'total_payroll': 0}
+    hours_by_week = {}
+    top_list = []
+    violation_labels = []
+    violation_data = []
+
+    for row in rows:
+        if row.widget == 'kpi':
+            stats[row.key] = row.value or 0
+        elif row.widget == 'week':
+            hours_by_week[row.key] = row.value or 0
+        elif row.widget == 'top':
+            top_list.append({'name': row.label, 'count': int(row.value)})
+        elif row.widget == 'violation':
+            # Enum luu ten (VD: 'LATE') -> hien thi gia tri ('late')
+            try:
+                violation_labels.append(ViolationType[row.key].value)
+            except KeyError:
+                violation_labels.append(row.key)
+            violation_data.append(int(row.value))
+
+    stats['total_staff'] = int(stats['total_staff'])
+    stats['total_violations'] = int(stats['total_violations'])
+    stats['total_hours'] = round(stats['total_hours'], 1)
+
+    top_list.sort(key=lambda e: e['count'], reverse=True)
+
+    return {
+        'stats': stats,
+        'weekly_hours': {
+            'labels': [label for label, _, _ in weeks],
+            'data': [round(hours_by_week.get(label, 0), 1) for label, _, _ in weeks]
+        },
+        'top_employees': top_list,
+        'violation_stats': {'labels': violation_labels, 'data': violation_data},
+        'generated_at': datetime.now()
+    }
+
+
+def get_admin_snapshot(role):
+    """Lay snapshot tu cache theo (ngay, vai tro), tinh lai khi het han"""
+    today = datetime.now().date()
+    role_key = role.value if hasattr(role, 'value') else str(role)
+    ttl = current_app.config.get('DASHBOARD_CACHE_TTL', DEFAULT_TTL)
+    return _admin_cache.get_or_set((today, role_key), lambda: build_admin_snapshot(today), ttl=ttl)
+
+
+def invalidate_admin_snapshot():
+    """Xoa cache dashboard (goi sau khi import cham cong / xu ly di muon)"""
+    _admin_cache.clear()
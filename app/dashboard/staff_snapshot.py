@@ -0,0 +1,223 @@
+"""
+Snapshot dashboard Nhan vien
+
+Moi NV co 1 dong trong bang staff_dashboard_snapshots (khoa chinh = user_id)
+chua JSON gon gom: thong ke thang, lich tuan nay, trang thai dang ky tuan sau
+va thong bao gan day. Snapshot duoc tinh lai (hang loat, theo nhom user) moi khi
+du lieu lien quan thay doi; trang dashboard chi can 1 lan doc theo khoa chinh.
+"""
+
+import json
+from datetime import datetime, date as date_type, time as time_type, timedelta
+from types import SimpleNamespace
+from flask import current_app
+from sqlalchemy import func, select
+from app.models import (
+    User, AttendanceRecord, Violation, Payroll, WorkSchedule, ScheduleShift,
+    Notification, StaffDashboardSnapshot, ViolationType, ShiftType, ScheduleStatus, db
+)
+
+
+NOTIFICATION_LIMIT = 5
+CHUNK_SIZE = 500
+
+
+def _chunks(items, size=CHUNK_SIZE):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _compute_payloads(user_ids, today):
+    """Tinh payload cho 1 nhom user bang cac query gom nhom (khong lap theo user)"""
+    month_start = today.replace(day=1)
+    week_start = today - timedelta(days=today.weekday())
+    week_end = week_start + timedelta(days=6)
+    next_week_start = week_end + timedelta(days=1)
+
+    payloads = {uid: {
+        'd': today.isoformat(),
+        'stats': {'total_hours': 0, 'total_shifts': 0, 'late_count': 0, 'estimated_salary': 0},
+        'shifts': [],
+        'next': None,
+        'notifications': []
+    } for uid in user_ids}
+
+    # Gio lam va so ca trong thang
+    for uid, hours, shifts in db.session.query(
+        AttendanceRecord.user_id,
+        func.sum(AttendanceRecord.total_work_hours),
+        func.count(AttendanceRecord.id)
+    ).filter(
+        AttendanceRecord.user_id.in_(user_ids),
+        AttendanceRecord.date >= month_start,
+        AttendanceRecord.date <= today
+    ).group_by(AttendanceRecord.user_id):
+        payloads[uid]['stats']['total_hours'] = round(hours or 0, 1)
+        payloads[uid]['stats']['total_shifts'] = shifts
+
+    # So lan di muon trong thang
+    for uid, late_count in db.session.query(
+        Violation.user_id, func.count(Violation.id)
+    ).filter(
+        Violation.user_id.in_(user_ids),
+        Violation.type == ViolationType.LATE,
+        Violation.date >= month_start,
+        Violation.date <= today
+    ).group_by(Violation.user_id):
+        payloads[uid]['stats']['late_count'] = late_count
+
+    # Luong du kien
+    for uid, net_salary in db.session.query(Payroll.user_id, Payroll.net_salary).filter(
+        Payroll.user_id.in_(user_ids),
+        Payroll.month == today.month,
+        Payroll.year == today.year
+    ):
+        payloads[uid]['stats']['estimated_salary'] = net_salary or 0
+
+    # Ca da xac nhan tuan nay
+    for uid, shift_date, shift_type, start, end in db.session.query(
+        WorkSchedule.user_id, ScheduleShift.date, ScheduleShift.shift_type,
+        ScheduleShift.shift_start_time, ScheduleShift.shift_end_time
+    ).join(ScheduleShift, ScheduleShift.schedule_id == WorkSchedule.id).filter(
+        WorkSchedule.user_id.in_(user_ids),
+        WorkSchedule.week_start_date <= today,
+        WorkSchedule.week_end_date >= today,
+        ScheduleShift.is_confirmed == True
+    ).order_by(ScheduleShift.date):
+        payloads[uid]['shifts'].append([
+            shift_date.isoformat(), shift_type.value,
+            start.strftime('%H:%M'), end.strftime('%H:%M')
+        ])
+
+    # Trang thai dang ky tuan sau
+    for uid, status, submitted_at, approved_at in db.session.query(
+        WorkSchedule.user_id, WorkSchedule.status, WorkSchedule.submitted_at, WorkSchedule.approved_at
+    ).filter(
+        WorkSchedule.user_id.in_(user_ids),
+        WorkSchedule.week_start_date == next_week_start
+    ):
+        payloads[uid]['next'] = [
+            status.value if status else None,
+            submitted_at.isoformat() if submitted_at else None,
+            approved_at.isoformat() if approved_at else None
+        ]
+
+    # 5 thong bao moi nhat moi NV (window function)
+    rank = func.row_number().over(
+        partition_by=Notification.user_id,
+        order_by=(Notification.created_at.desc(), Notification.id.desc())
+    ).label('rn')
+    ranked = select(
+        Notification.user_id, Notification.title, Notification.message,
+        Notification.type, Notification.created_at, rank
+    ).where(Notification.user_id.in_(user_ids)).subquery()
+    for row in db.session.execute(
+        select(ranked).where(ranked.c.rn <= NOTIFICATION_LIMIT)
+        .order_by(ranked.c.user_id, ranked.c.rn)
+    ):
+        payloads[row.user_id]['notifications'].append([
+            row.title, row.message, row.type,
+            row.created_at.isoformat() if row.created_at else None
+        ])
+
+    return payloads
+
+
+def _store_payloads(payloads, today):
+    """Ghi de snapshot cua cac user trong payloads (xoa cu + insert hang loat)"""
+    user_ids = list(payloads.keys())
+    StaffDashboardSnapshot.query.filter(
+        StaffDashboardSnapshot.user_id.in_(user_ids)
+    ).delete(synchronize_session=False)
+    now = datetime.utcnow()
+    db.session.execute(StaffDashboardSnapshot.__table__.insert(), [{
+        'user_id': uid,
+        'snapshot_date': today,
+        'payload': json.dumps(payload, separators=(',', ':'), ensure_ascii=False),
+        'computed_at': now
+    } for uid, payload in payloads.items()])
+
+
+def refresh_staff_snapshots(user_ids=None, today=None):
+    """
+    Tinh lai snapshot cho danh sach user (None = tat ca NV active)
+
+    Goi sau khi du lieu lien quan da commit. Khong lam hong thao tac chinh
+    neu loi: ghi log va rollback.
+
+    Returns:
+        int: So snapshot da tinh
+    """
+    if today is None:
+        today = datetime.now().date()
+
+    try:
+        if user_ids is None:
+            user_ids = [uid for (uid,) in db.session.query(User.id).filter(User.status == 'active')]
+        user_ids = sorted(set(uid for uid in user_ids if uid))
+
+        for chunk in _chunks(user_ids):
+            _store_payloads(_compute_payloads(chunk, today), today)
+
+        db.session.commit()
+        return len(user_ids)
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f'Error refreshing staff dashboard snapshots: {str(e)}')
+        return 0
+
+
+def _hydrate(payload):
+    """Chuyen JSON thanh doi tuong co kieu date/time/enum cho template"""
+    def parse_time(value):
+        hour, minute = value.split(':')
+        return time_type(int(hour), int(minute))
+
+    shifts = [SimpleNamespace(
+        date=date_type.fromisoformat(shift_date),
+        shift_type=ShiftType(shift_type),
+        shift_start_time=parse_time(start),
+        shift_end_time=parse_time(end)
+    ) for shift_date, shift_type, start, end in payload['shifts']]
+
+    next_schedule = None
+    if payload['next']:
+        status, submitted_at, approved_at = payload['next']
+        next_schedule = SimpleNamespace(
+            status=ScheduleStatus(status) if status else None,
+            submitted_at=datetime.fromisoformat(submitted_at) if submitted_at else None,
+            approved_at=datetime.fromisoformat(approved_at) if approved_at else None
+        )
+
+    notifications = [SimpleNamespace(
+        title=title, message=message, type=type_,
+        created_at=datetime.fromisoformat(created_at) if created_at else None
+    ) for title, message, type_, created_at in payload['notifications']]
+
+    return {
+        'stats': payload['stats'],
+        'my_shifts': shifts,
+        'next_schedule': next_schedule,
+        'notifications': notifications
+    }
+
+
+def get_staff_snapshot(user_id):
+    """Doc snapshot theo khoa chinh; tinh lai neu chua co hoac da sang ngay moi"""
+    today = datetime.now().date()
+    snapshot = db.session.get(StaffDashboardSnapshot, user_id)
+
+    if snapshot is not None and snapshot.snapshot_date == today:
+        return _hydrate(json.loads(snapshot.payload))
+
+    payloads = _compute_payloads([user_id], today)
+    try:
+        _store_payloads(payloads, today)
+        db.session.commit()
+    except Exception as e:
+        # Hai request cung tinh 1 snapshot -> bo qua, lan sau doc lai
+        db.session.rollback()
+        current_app.logger.warning(f'Could not store staff snapshot {user_id}: {str(e)}')
+
+    return _hydrate(payloads[user_id])
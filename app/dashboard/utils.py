@@ -162,8 +162,6 @@ def get_current_week_schedule():
 
 
 def get_recent_notifications(user_id, limit=5):
-    """Lay thong bao gan day cua user"""
-    from app.models import Notification
-    return Notification.query.filter_by(
-        user_id=user_id
-    ).order_by(Notification.created_at.desc()).limit(limit).all()
+    """Lay thong bao gan day cua user (index user_id, created_at)"""
+    from app.notifications.inbox import get_notifications
+    return get_notifications(user_id, limit=limit)
@@ -4,6 +4,8 @@ from flask_login import login_required, current_user
 from datetime import datetime, date, timedelta
 from app.export import bp
 from app.auth.routes import manager_required
+from app.schedule.roster import WeekRoster, CONFIRMED
+from app.schedule.auto_scheduler import SHIFT_ORDER
 from app.models import (
     User, UserRole, WorkSchedule, ScheduleShift, AttendanceRecord,
     Payroll, db
@@ -77,6 +79,11 @@ def export_schedule_matrix():
         ws.cell(row=3, column=col, value=header)
     style_header_row(ws, 3, len(headers))
 
+    # Lich da xac nhan cua ca tuan (1 query); moi o (NV, ngay, ca) chi tinh 1 lan
+    roster = WeekRoster.load(week_start, [user.id for user in users])
+    confirmed = roster.mask(CONFIRMED)
+    letters = [shift_type.value[0].upper() for shift_type in SHIFT_ORDER]
+
     # Data rows
     row = 4
     for idx, user in enumerate(users, 1):
@@ -84,30 +91,10 @@ def export_schedule_matrix():
         ws.cell(row=row, column=2, value=user.full_name)
         ws.cell(row=row, column=3, value=user.username)
 
-        # Lay lich lam viec cua user trong tuan
-        schedule = WorkSchedule.query.filter(
-            WorkSchedule.user_id == user.id,
-            WorkSchedule.week_start_date == week_start
-        ).first()
-
-        if schedule:
-            for day_idx in range(7):
-                current_date = week_start + timedelta(days=day_idx)
-                # Chi lay shifts da confirmed de tranh duplicate
-                # Uu tien system shifts (da duyet), neu khong co thi lay employee shifts
-                day_shifts = [s for s in schedule.shifts
-                             if s.date == current_date and s.is_confirmed]
-
-                # Loai bo duplicate: moi shift_type chi lay 1 lan
-                seen_types = set()
-                unique_shifts = []
-                for s in day_shifts:
-                    if s.shift_type not in seen_types:
-                        seen_types.add(s.shift_type)
-                        unique_shifts.append(s)
-
-                if unique_shifts:
-                    shift_str = ', '.join([s.shift_type.value[0].upper() for s in unique_shifts])
+        if user.id in roster.index:
+            for day_idx, day_shifts in enumerate(confirmed[roster.index[user.id]]):
+                if day_shifts.any():
+                    shift_str = ', '.join(letter for letter, on in zip(letters, day_shifts) if on)
                     ws.cell(row=row, column=4 + day_idx, value=shift_str)
 
         row += 1
@@ -1,9 +1,10 @@
-from flask import render_template, request
+from flask import render_template, request, jsonify
 from flask_login import login_required
 from datetime import datetime, timedelta
 from app.logs import bp
 from app.auth.routes import admin_required
 from app.models import ActivityLog, User, db
+from app.scheduler.runner import job_stats, recent_runs
 
 
 @bp.route('/')
@@ -91,3 +92,32 @@ def all_logs():
                            action_filter=action_filter,
                            user_filter=user_filter,
                            users=users)
+
+
+@bp.route('/jobs')
+@login_required
+@admin_required
+def jobs():
+    """Lich su va thong ke chay background job"""
+    days = min(request.args.get('days', 14, type=int), 90)
+    job_filter = request.args.get('job', '')
+    stats = job_stats(days)
+    runs = recent_runs(job_filter or None, limit=100)
+
+    return render_template('logs/jobs.html',
+                           stats=stats,
+                           runs=runs,
+                           days=days,
+                           job_filter=job_filter)
+
+
+@bp.route('/jobs/stats')
+@login_required
+@admin_required
+def jobs_stats():
+    """API: thong ke job theo ngay (xu huong thoi gian chay, so ban ghi, bo nho)"""
+    days = min(request.args.get('days', 14, type=int), 90)
+    stats = job_stats(days)
+    for job in stats['jobs']:
+        job['last_run'] = job['last_run'].isoformat() if job['last_run'] else None
+    return jsonify(stats)
@@ -60,6 +60,21 @@ class PayrollStatus(str, Enum):
 # MODELS
 # ============================================================
 
+class Store(db.Model):
+    """Cua hang trong chuoi"""
+    __tablename__ = 'stores'
+
+    id = db.Column(db.Integer, primary_key=True)
+    code = db.Column(db.String(20), unique=True, nullable=False)  # VD: "CH01"
+    name = db.Column(db.String(100), nullable=False)
+    address = db.Column(db.String(255))
+    status = db.Column(db.String(20), default='active')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<Store {self.code}>'
+
+
 class User(UserMixin, db.Model):
     """Model nguoi dung - Nhan vien, Quan ly, Admin"""
     __tablename__ = 'users'
@@ -88,11 +103,17 @@ class User(UserMixin, db.Model):
     probation_start_date = db.Column(db.Date)  # Ngay bat dau thu viec
     probation_end_date = db.Column(db.Date)  # Ngay ket thuc thu viec
 
+    # Cua hang lam viec chinh
+    store_id = db.Column(db.Integer, db.ForeignKey('stores.id'))
+
     status = db.Column(db.String(20), default='active')
+    # So thong bao chua doc (cap nhat cung luc voi Notification, doc khong can COUNT)
+    unread_notifications = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationships
+    store = db.relationship('Store', backref='users')
     schedules = db.relationship('WorkSchedule', backref='user', lazy=True, foreign_keys='WorkSchedule.user_id')
     attendance_records = db.relationship('AttendanceRecord', backref='user', lazy=True)
     violations = db.relationship('Violation', backref='user', lazy=True, foreign_keys='Violation.user_id')
@@ -156,6 +177,8 @@ class ScheduleShift(db.Model):
     # THEM 2 COT MOI de phan biet lich NV dang ky va lich he thong xep
     shift_source = db.Column(db.String(20), default='employee')  # 'employee' hoac 'system'
     draft_status = db.Column(db.String(20), default='final')     # 'draft' hoac 'final'
+    # Cua hang lam ca (None = cua hang cua NV); khac User.store_id khi dieu dong NV
+    store_id = db.Column(db.Integer, db.ForeignKey('stores.id'), index=True)
 
     def __repr__(self):
         return f'<ScheduleShift {self.date} - {self.shift_type.value}>'
@@ -185,6 +208,13 @@ class AttendanceRecord(db.Model):
 
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Index cho bao cao thang (loc theo ngay, gom nhom theo NV)
+    __table_args__ = (
+        db.Index('ix_attendance_records_date_user', 'date', 'user_id'),
+        # Index cho phan trang keyset (date, id) o trang xem cham cong
+        db.Index('ix_attendance_records_date_id', 'date', 'id'),
+    )
+
     def __repr__(self):
         return f'<AttendanceRecord {self.user_id} - {self.date}>'
 
@@ -207,6 +237,10 @@ class Violation(db.Model):
 
     approver = db.relationship('User', foreign_keys=[approved_by])
 
+    __table_args__ = (
+        db.Index('ix_violations_date_type', 'date', 'type'),
+    )
+
     def __repr__(self):
         return f'<Violation {self.user_id} - {self.type.value}>'
 
@@ -264,6 +298,50 @@ class Payroll(db.Model):
         return f'<Payroll {self.user_id} - {self.month}/{self.year}>'
 
 
+class PayrollRun(db.Model):
+    """Lan chay tinh luong cuoi thang theo lo (chay lai thi tiep tuc tu checkpoint)"""
+    __tablename__ = 'payroll_runs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.Integer, nullable=False)
+    year = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(20), default='running')  # 'running', 'done', 'partial' (con NV loi)
+    total_items = db.Column(db.Integer, default=0)
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+    items = db.relationship('PayrollRunItem', backref='run', lazy='dynamic')
+
+    __table_args__ = (
+        db.UniqueConstraint('month', 'year', name='uq_payroll_runs_month_year'),
+    )
+
+    def __repr__(self):
+        return f'<PayrollRun {self.month}/{self.year} - {self.status}>'
+
+
+class PayrollRunItem(db.Model):
+    """Tien do tung NV trong lan chay luong: pending -> computed -> rendered -> queued"""
+    __tablename__ = 'payroll_run_items'
+
+    id = db.Column(db.Integer, primary_key=True)
+    run_id = db.Column(db.Integer, db.ForeignKey('payroll_runs.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    stage = db.Column(db.String(20), default='pending')
+    payroll_id = db.Column(db.Integer, db.ForeignKey('payroll.id'))
+    pdf_path = db.Column(db.String(255))  # Phieu luong PDF luu tru (ban da gui cuoi thang)
+    error = db.Column(db.Text)  # Loi lan chay gan nhat (chay lai se thu tiep tu stage hien tai)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('run_id', 'user_id', name='uq_payroll_run_items_run_user'),
+        db.Index('ix_payroll_run_items_run_stage', 'run_id', 'stage'),
+    )
+
+    def __repr__(self):
+        return f'<PayrollRunItem {self.run_id} {self.user_id} - {self.stage}>'
+
+
 class SystemConfig(db.Model):
     """Cau hinh he thong (muc phat, luong, deadline...)"""
     __tablename__ = 'system_config'
@@ -279,6 +357,16 @@ class SystemConfig(db.Model):
         config = SystemConfig.query.filter_by(key=key).first()
         return config.value if config else default
 
+    @staticmethod
+    def set_value(key, value, description=None):
+        """Ghi gia tri cau hinh (tao moi neu chua co, khong commit)"""
+        config = SystemConfig.query.filter_by(key=key).first()
+        if not config:
+            config = SystemConfig(key=key, description=description)
+            db.session.add(config)
+        config.value = value
+        return config
+
     def __repr__(self):
         return f'<SystemConfig {self.key}>'
 
@@ -302,14 +390,35 @@ class CustomerTraffic(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
     date = db.Column(db.Date, nullable=False)
+    hour = db.Column(db.Integer)  # Gio bat dau (0-23), tach tu hour_segment
     hour_segment = db.Column(db.String(20), nullable=False)  # "9h-10h", "10h-11h"
     bill_count = db.Column(db.Integer, default=0)
     is_peak_hour = db.Column(db.Boolean, default=False)
 
+    # Moi (ngay, gio) 1 dong: khoa upsert khi import iPOS
+    __table_args__ = (
+        db.Index('ix_customer_traffic_date_hour', 'date', 'hour', unique=True),
+    )
+
     def __repr__(self):
         return f'<CustomerTraffic {self.date} - {self.hour_segment}>'
 
 
+class StaffingForecast(db.Model):
+    """Du bao so NV can moi ca cua 1 tuan (tinh truoc hang dem tu CustomerTraffic)"""
+    __tablename__ = 'staffing_forecasts'
+
+    id = db.Column(db.Integer, primary_key=True)
+    week_start_date = db.Column(db.Date, nullable=False, unique=True)
+    headcount = db.Column(db.Text, nullable=False)  # JSON 7x3: so NV can (ngay x ca)
+    expected_bills = db.Column(db.Text)  # JSON 7x3: so bill gio cao diem du bao
+    history_weeks = db.Column(db.Integer, default=0)  # So tuan lich su co du lieu
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<StaffingForecast {self.week_start_date}>'
+
+
 class Notification(db.Model):
     """Thong bao trong he thong"""
     __tablename__ = 'notifications'
@@ -324,10 +433,81 @@ class Notification(db.Model):
 
     user = db.relationship('User', backref='notifications')
 
+    __table_args__ = (
+        db.Index('ix_notifications_user_created', 'user_id', 'created_at'),
+    )
+
     def __repr__(self):
         return f'<Notification {self.user_id} - {self.title}>'
 
 
+class NotificationOutbox(db.Model):
+    """Hang doi tin gui ra ngoai (email / SMS / Zalo), worker gui theo lo va thu lai khi loi"""
+    __tablename__ = 'notification_outbox'
+
+    id = db.Column(db.Integer, primary_key=True)
+    channel = db.Column(db.String(20), nullable=False)  # 'email', 'sms', 'zalo'
+    recipient = db.Column(db.String(200), nullable=False)  # Email / so dien thoai / Zalo user ID
+    subject = db.Column(db.String(200))
+    body = db.Column(db.Text, nullable=False)
+    html = db.Column(db.Text)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
+    idempotency_key = db.Column(db.String(200), nullable=False, unique=True)  # Trung key -> khong xep hang lai
+    digest = db.Column(db.String(50))  # Loai tin gop duoc ('late', 'payslip'...), None = gui rieng
+    # 'held' (cho gop), 'merged' (da gop vao tin khac), 'pending', 'sending', 'sent', 'failed'
+    status = db.Column(db.String(20), default='pending')
+    attempts = db.Column(db.Integer, default=0)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow)  # Dang gui: het han giu tin; held: cuoi cua so gop
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('ix_notification_outbox_status_next', 'status', 'next_attempt_at'),
+    )
+
+    def __repr__(self):
+        return f'<NotificationOutbox {self.channel} {self.recipient} - {self.status}>'
+
+
+class JobRun(db.Model):
+    """Lich su chay background job (moi lan chay ung voi 1 moc lich, chi 1 process chay)"""
+    __tablename__ = 'job_runs'
+
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.String(100), nullable=False)
+    scheduled_for = db.Column(db.DateTime, nullable=False)  # Moc lich (lam tron phut)
+    status = db.Column(db.String(20), default='running')  # 'running', 'success', 'failed'
+    host = db.Column(db.String(100))  # hostname:pid cua process chay job
+    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+    duration_ms = db.Column(db.Integer)
+    rows_processed = db.Column(db.Integer)  # So ban ghi job bao da xu ly (gia tri tra ve cua job)
+    peak_memory_kb = db.Column(db.Integer)  # Bo nho Python cap phat dinh trong luc chay (tracemalloc)
+    error = db.Column(db.Text)  # Traceback khi loi
+
+    __table_args__ = (
+        db.UniqueConstraint('job_id', 'scheduled_for', name='uq_job_runs_job_slot'),
+        db.Index('ix_job_runs_started', 'started_at'),
+    )
+
+    def __repr__(self):
+        return f'<JobRun {self.job_id} {self.scheduled_for} - {self.status}>'
+
+
+class StaffDashboardSnapshot(db.Model):
+    """Snapshot dashboard cua NV (tinh truoc khi du lieu thay doi, doc bang 1 PK lookup)"""
+    __tablename__ = 'staff_dashboard_snapshots'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    snapshot_date = db.Column(db.Date, nullable=False)  # Ngay tinh snapshot (het han khi sang ngay moi)
+    payload = db.Column(db.Text, nullable=False)  # JSON gon: stats, lich tuan, thong bao
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<StaffDashboardSnapshot {self.user_id} - {self.snapshot_date}>'
+
+
 class ActivityLog(db.Model):
     """Log hoat dong cua user (dang nhap, them, sua, xoa)"""
     __tablename__ = 'activity_logs'
@@ -345,18 +525,53 @@ class ActivityLog(db.Model):
 
     @staticmethod
     def log(user_id, action, entity_type=None, entity_id=None, description=None, ip_address=None):
-        """Tao log moi"""
-        log = ActivityLog(
-            user_id=user_id,
-            action=action,
-            entity_type=entity_type,
-            entity_id=entity_id,
-            description=description,
-            ip_address=ip_address
-        )
-        db.session.add(log)
-        db.session.commit()
-        return log
+        """
+        Ghi log moi qua activity_log_sink (write-behind, khong commit session hien tai)
+
+        Returns:
+            dict: Du lieu dong log da dua vao hang doi
+        """
+        from app.audit import activity_log_sink
+
+        row = {
+            'user_id': user_id,
+            'action': action,
+            'entity_type': entity_type,
+            'entity_id': entity_id,
+            'description': description,
+            'ip_address': ip_address,
+            'created_at': datetime.utcnow()
+        }
+        activity_log_sink.emit(row)
+        return row
+
+    @staticmethod
+    def log_many(user_id, action, entity_type, entries, ip_address=None):
+        """
+        Ghi nhieu log cung luc qua activity_log_sink (nhu log: khong nam trong
+        transaction cua nguoi goi -> goi sau khi commit thay doi)
+
+        Args:
+            entries: List (entity_id, description)
+
+        Returns:
+            int: So dong log da dua vao hang doi
+        """
+        from app.audit import activity_log_sink
+
+        if not entries:
+            return 0
+        now = datetime.utcnow()
+        activity_log_sink.emit_many([{
+            'user_id': user_id,
+            'action': action,
+            'entity_type': entity_type,
+            'entity_id': entity_id,
+            'description': description,
+            'ip_address': ip_address,
+            'created_at': now
+        } for entity_id, description in entries])
+        return len(entries)
 
     def __repr__(self):
         return f'<ActivityLog {self.user_id} - {self.action}>'
@@ -1,3 +1,5 @@
 from flask import Blueprint
 
 bp = Blueprint('notifications', __name__)
+
+from app.notifications import routes
@@ -0,0 +1,119 @@
+"""
+Gop thong bao (digest) truoc khi gui ra ngoai
+
+- Tin co 'digest' thuoc NOTIFY_DIGEST_KINDS duoc xep vao hang doi voi trang thai
+  'held', next_attempt_at = cuoi cua so gop (NOTIFY_DIGEST_HOUR gio hang ngay)
+- flush_digests (worker goi truoc khi gui): lay tat ca tin 'held' da het cua so,
+  gop theo (kenh, nguoi nhan) thanh 1 tin 'pending' dung mau '<kenh>/digest';
+  tin goc chuyen 'merged'. Nhom chi co 1 tin thi gui nguyen ban.
+- Cuoi thang (phieu luong + canh bao di muon...) moi NV nhan 1 tin / kenh / ngay
+  thay vi moi su kien 1 tin
+"""
+
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import update
+from app.models import NotificationOutbox, db
+from app.notifications.templates import render_batch
+
+
+DIGEST_HOUR = 20
+
+
+def is_digest_kind(kind):
+    """Loai tin nay co duoc gop khong (theo NOTIFY_DIGEST_KINDS)"""
+    return bool(kind) and kind in current_app.config.get('NOTIFY_DIGEST_KINDS', [])
+
+
+def digest_release_at(now=None):
+    """
+    Thoi diem dong cua so gop hien tai (UTC, cung mui gio voi next_attempt_at)
+
+    Cua so dong luc NOTIFY_DIGEST_HOUR gio (gio dia phuong) gan nhat sau now.
+    """
+    hour = current_app.config.get('NOTIFY_DIGEST_HOUR', DIGEST_HOUR)
+    local_now = now or datetime.now()
+    release = local_now.replace(hour=hour, minute=0, second=0, microsecond=0)
+    if release <= local_now:
+        release += timedelta(days=1)
+    utc_offset = datetime.now() - datetime.utcnow()
+    return release - timedelta(seconds=round(utc_offset.total_seconds()))
+
+
+def _claim_due(now):
+    """Chuyen tin 'held' den han sang 'merged' va tra ve noi dung (1 cau UPDATE)"""
+    criteria = (NotificationOutbox.status == 'held', NotificationOutbox.next_attempt_at <= now)
+    columns = (NotificationOutbox.id, NotificationOutbox.channel, NotificationOutbox.recipient,
+               NotificationOutbox.subject, NotificationOutbox.body, NotificationOutbox.user_id,
+               NotificationOutbox.digest)
+    options = {'synchronize_session': False}
+
+    if db.engine.dialect.update_returning:
+        stmt = update(NotificationOutbox).where(*criteria).values(status='merged').returning(*columns)
+        return db.session.execute(stmt, execution_options=options).all()
+
+    rows = db.session.query(*columns).filter(*criteria).all()
+    if rows:
+        db.session.execute(
+            update(NotificationOutbox).where(NotificationOutbox.id.in_([row.id for row in rows]))
+            .values(status='merged'), execution_options=options
+        )
+    return rows
+
+
+def flush_digests(now=None):
+    """
+    Gop cac tin da het cua so thanh 1 tin / (kenh, nguoi nhan) va dua vao hang gui
+
+    Tat ca trong 1 transaction: 2 worker chay cung luc khong gop trung.
+
+    Args:
+        now: Moc thoi gian xet het cua so (None = hien tai)
+
+    Returns:
+        dict: {'held': so tin goc, 'digests': so tin gop moi, 'single': so tin gui nguyen ban}
+    """
+    released_at = datetime.utcnow()
+    rows = sorted(_claim_due(now or released_at), key=lambda row: row.id)
+    if not rows:
+        return {'held': 0, 'digests': 0, 'single': 0}
+
+    groups = {}
+    for row in rows:
+        groups.setdefault((row.channel, row.recipient), []).append(row)
+
+    singles = [{'id': items[0].id, 'status': 'pending', 'next_attempt_at': released_at}
+               for items in groups.values() if len(items) == 1]
+    if singles:
+        db.session.execute(update(NotificationOutbox), singles)
+
+    digests = []
+    by_channel = {}
+    for (channel, recipient), items in groups.items():
+        if len(items) > 1:
+            by_channel.setdefault(channel, []).append((recipient, items))
+    for channel, entries in by_channel.items():
+        messages = render_batch(channel, 'digest', [
+            {'count': len(items), 'items': items} for _, items in entries
+        ])
+        for (recipient, items), message in zip(entries, messages):
+            digests.append({
+                'channel': channel,
+                'recipient': recipient,
+                'subject': message['subject'],
+                'body': message['body'],
+                'html': None,
+                'user_id': items[0].user_id,
+                # Theo id tin dau tien: gop lai (sau rollback) khong tao tin trung
+                'idempotency_key': f'digest:{channel}:{items[0].id}',
+                'digest': None,
+                'status': 'pending',
+                'attempts': 0,
+                'next_attempt_at': released_at,
+                'created_at': released_at
+            })
+    if digests:
+        db.session.execute(NotificationOutbox.__table__.insert(), digests)
+    db.session.commit()
+
+    return {'held': len(rows), 'digests': len(digests), 'single': len(singles)}
@@ -1,10 +1,18 @@
 """
 Module gui email thong bao
+
+Email hang loat (mo dang ky, nhac nho, phieu luong) duoc xep vao
+NotificationOutbox; worker (app/notifications/outbox.py) gui theo lo.
+Noi dung lay tu mau bien dich san (app/notifications/templates.py).
 """
 
-from flask import current_app, render_template_string
+from datetime import datetime
+from flask import current_app
 from flask_mail import Message
 from app import mail
+from app.models import User, db
+from app.notifications.outbox import enqueue_many
+from app.notifications.templates import render, render_batch
 
 
 def send_email(to, subject, body, html=None):
@@ -31,65 +39,57 @@ def send_email(to, subject, body, html=None):
         return False
 
 
-def send_schedule_registration_email(users):
+def _queue_batch(kind, users, contexts, key, digest=None):
+    """Render 1 mau cho ca danh sach NV va xep vao hang doi (khong commit)"""
+    messages = render_batch('email', kind, contexts)
+    return enqueue_many([{
+        'channel': 'email',
+        'recipient': user.email,
+        'subject': message['subject'],
+        'body': message['body'],
+        'user_id': user.id,
+        'key': key(user),
+        'digest': digest
+    } for user, message in zip(users, messages)])
+
+
+def send_schedule_registration_email(users, week_start=None):
     """
-    Gui email nhac dang ky lich lam viec
+    Xep email nhac dang ky lich lam viec vao hang doi
 
     Args:
         users: List User objects
-    """
-    subject = "[HR] Mo dang ky lich lam viec tuan sau"
-
-    body = """
-Xin chao,
+        week_start: Tuan mo dang ky (khoa chong gui trung; None = hom nay)
 
-He thong da mo dang ky lich lam viec cho tuan sau.
-
-Vui long dang nhap va dang ky lich lam viec truoc 18h Thu Bay.
-
-Link dang ky: {url}
-
-Tran trong,
-HR Management System
+    Returns:
+        int: So email moi
     """
-
-    for user in users:
-        if user.email:
-            try:
-                send_email(user.email, subject, body)
-            except Exception as e:
-                current_app.logger.error(f'Error sending to {user.email}: {str(e)}')
+    users = [user for user in users if user.email]
+    url = f"{current_app.config.get('APP_URL', '').rstrip('/')}/schedule/register"
+    period = (week_start or datetime.now().date()).isoformat()
+    queued = _queue_batch('schedule_registration', users, [{'user': user, 'url': url} for user in users],
+                          key=lambda user: f'schedule-registration:{period}:{user.id}:email')
+    db.session.commit()
+    return queued
 
 
-def send_schedule_reminder_email(users):
+def send_schedule_reminder_email(users, week_start=None):
     """
-    Gui email nhac nho NV chua dang ky lich
+    Xep email nhac nho NV chua dang ky lich vao hang doi
 
     Args:
         users: List User objects chua dang ky
-    """
-    subject = "[HR] NHAC NHO: Ban chua dang ky lich lam viec"
-
-    body = """
-Xin chao {name},
-
-Ban CHUA DANG KY lich lam viec cho tuan sau.
-
-Han cuoi dang ky: 18h Thu Bay hom nay.
-
-Vui long dang ky ngay de tranh bi xep lich tu dong.
+        week_start: Tuan can dang ky (khoa chong gui trung; None = hom nay)
 
-Tran trong,
-HR Management System
+    Returns:
+        int: So email moi
     """
-
-    for user in users:
-        if user.email:
-            try:
-                personalized_body = body.format(name=user.full_name)
-                send_email(user.email, subject, personalized_body)
-            except Exception as e:
-                current_app.logger.error(f'Error sending reminder to {user.email}: {str(e)}')
+    users = [user for user in users if user.email]
+    period = (week_start or datetime.now().date()).isoformat()
+    queued = _queue_batch('schedule_reminder', users, [{'user': user} for user in users],
+                          key=lambda user: f'schedule-reminder:{period}:{user.id}:email')
+    db.session.commit()
+    return queued
 
 
 def send_schedule_confirmed_email(user, week_start, shifts):
@@ -104,31 +104,8 @@ def send_schedule_confirmed_email(user, week_start, shifts):
     if not user.email:
         return False
 
-    subject = f"[HR] Lich lam viec tuan {week_start.strftime('%d/%m/%Y')}"
-
-    shift_lines = []
-    for shift in shifts:
-        day_names = ['Thu 2', 'Thu 3', 'Thu 4', 'Thu 5', 'Thu 6', 'Thu 7', 'CN']
-        day_name = day_names[shift.date.weekday()]
-        shift_lines.append(
-            f"- {day_name} ({shift.date.strftime('%d/%m')}): "
-            f"{shift.shift_start_time.strftime('%H:%M')} - {shift.shift_end_time.strftime('%H:%M')}"
-        )
-
-    body = f"""
-Xin chao {user.full_name},
-
-Lich lam viec cua ban tuan {week_start.strftime('%d/%m/%Y')} da duoc xac nhan:
-
-{chr(10).join(shift_lines)}
-
-Vui long di lam dung gio.
-
-Tran trong,
-HR Management System
-    """
-
-    return send_email(user.email, subject, body)
+    message = render('email', 'schedule_confirmed', user=user, week_start=week_start, shifts=shifts)
+    return send_email(user.email, message['subject'], message['body'])
 
 
 def send_late_notification(user, late_count, late_minutes, penalty):
@@ -144,41 +121,30 @@ def send_late_notification(user, late_count, late_minutes, penalty):
     if not user.email:
         return False
 
-    if late_count == 1:
-        subject = "[HR] Nhac nho di muon"
-        body = f"""
-Xin chao {user.full_name},
-
-Ban da di muon {late_minutes} phut.
-
-Day la lan dau trong thang nen chua bi phat.
-Hay co gang di lam dung gio!
-
-Tran trong,
-HR Management System
-        """
-    else:
-        subject = f"[HR] Canh bao di muon lan {late_count}"
-        body = f"""
-Xin chao {user.full_name},
+    message = render('email', 'late', user=user, late_count=late_count,
+                     late_minutes=late_minutes, penalty=penalty)
+    return send_email(user.email, message['subject'], message['body'])
 
-Ban da di muon {late_minutes} phut.
 
-Day la lan thu {late_count} trong thang.
-Tien phat: {penalty:,.0f} VND
-
-De nghi ban tuan thu di lam dung gio.
+def queue_late_emails(entries, date):
+    """
+    Xep email canh bao di muon trong ngay vao hang doi (gop digest 'late', khong commit)
 
-Tran trong,
-HR Management System
-        """
+    Args:
+        entries: List dict {'user', 'late_count', 'late_minutes', 'penalty'}
+        date: Ngay di muon (khoa chong gui trung)
 
-    return send_email(user.email, subject, body)
+    Returns:
+        int: So email moi
+    """
+    entries = [entry for entry in entries if entry['user'].email]
+    return _queue_batch('late', [entry['user'] for entry in entries], entries,
+                        key=lambda user: f'late:{date.isoformat()}:{user.id}:email', digest='late')
 
 
 def send_payslip_email(user, payroll):
     """
-    Gui email phieu luong
+    Xep email phieu luong vao hang doi
 
     Args:
         user: User object
@@ -187,27 +153,30 @@ def send_payslip_email(user, payroll):
     if not user.email:
         return False
 
-    subject = f"[HR] Phieu luong thang {payroll.month}/{payroll.year}"
-
-    body = f"""
-Xin chao {user.full_name},
+    return send_payslip_emails([payroll], {user.id: user}) == 1
 
-Phieu luong thang {payroll.month}/{payroll.year} cua ban:
 
-- Tong gio lam: {payroll.total_work_hours} gio
-- So ca lam: {payroll.total_shifts} ca
-- Luong gop: {payroll.gross_salary:,.0f} VND
-- Tien an ca: {payroll.meal_support_amount:,.0f} VND
-- Tien thuong: {payroll.total_reward:,.0f} VND
-- Tien phat: {payroll.total_penalty:,.0f} VND
-- Tam ung: {payroll.advance_payment:,.0f} VND
-
-THUC LINH: {payroll.net_salary:,.0f} VND
-
-Vui long dang nhap he thong de xem chi tiet va tai phieu luong PDF.
-
-Tran trong,
-HR Management System
+def send_payslip_emails(payrolls, users=None):
     """
+    Xep email phieu luong cho ca ky luong (doc NV 1 query, render mau 1 lan)
 
-    return send_email(user.email, subject, body)
+    Args:
+        users: Map user_id -> User da co (None = doc tu DB)
+
+    Returns:
+        int: So email moi
+    """
+    if users is None:
+        users = {user.id: user for user in User.query.filter(
+            User.id.in_({payroll.user_id for payroll in payrolls})
+        )} if payrolls else {}
+    payrolls = [payroll for payroll in payrolls
+                if payroll.user_id in users and users[payroll.user_id].email]
+    recipients = [users[payroll.user_id] for payroll in payrolls]
+    periods = {payroll.user_id: f'{payroll.year}-{payroll.month:02d}' for payroll in payrolls}
+
+    queued = _queue_batch('payslip', recipients, [
+        {'user': user, 'payroll': payroll} for user, payroll in zip(recipients, payrolls)
+    ], key=lambda user: f'payslip:{periods[user.id]}:{user.id}:email', digest='payslip')
+    db.session.commit()
+    return queued
@@ -0,0 +1,174 @@
+"""
+Gui tin qua HTTP toi SMS gateway va Zalo OA (asyncio + httpx)
+
+- 1 AsyncClient (pool ket noi keep-alive) cho ca lo tin
+- So request dong thoi gioi han boi NOTIFY_HTTP_CONCURRENCY (Semaphore)
+- SMS: mac dinh 1 request / so ({'phone', 'message'}). Gateway ho tro gui nhieu
+  so: dat SMS_API_BATCH_SIZE > 1 -> gom tin cung noi dung thanh 1 request
+  ({'phones': [...], 'message'}); send_one luon gui 1 so
+- Zalo OA: API gui tung user, chay song song tren cung pool
+- Gioi han request/giay theo kenh (RateLimiter dung chung voi email)
+
+Chua cau hinh SMS_API_URL: SMS chi ghi log (nhu truoc). Chua co
+ZALO_OA_ACCESS_TOKEN: tin Zalo bao loi.
+"""
+
+import asyncio
+import threading
+import time
+import httpx
+from flask import current_app
+
+
+ZALO_OA_API_URL = 'https://openapi.zalo.me/v2.0/oa/message'
+
+CONCURRENCY = 20
+TIMEOUT = 10
+SMS_BATCH_SIZE = 1  # > 1 chi khi gateway nhan {'phones': [...]}
+
+
+class RateLimiter:
+    """Gioi han so lan goi/giay (dung chung giua cac thread / coroutine)"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self.next_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        """Giu 1 luot, tra ve so giay phai cho"""
+        if not self.interval:
+            return 0
+        with self.lock:
+            now = time.monotonic()
+            delay = self.next_at - now
+            self.next_at = max(now, self.next_at) + self.interval
+        return max(delay, 0)
+
+    def wait(self):
+        delay = self.reserve()
+        if delay:
+            time.sleep(delay)
+
+
+def gateway_settings():
+    """Doc cau hinh gateway tu app (goi trong app context, truoc khi chay event loop)"""
+    config = current_app.config
+    return {
+        'sms_url': config.get('SMS_API_URL'),
+        'sms_key': config.get('SMS_API_KEY'),
+        'sms_batch_size': max(config.get('SMS_API_BATCH_SIZE', SMS_BATCH_SIZE), 1),
+        'zalo_url': config.get('ZALO_OA_API_URL') or ZALO_OA_API_URL,
+        'zalo_token': config.get('ZALO_OA_ACCESS_TOKEN'),
+        'concurrency': config.get('NOTIFY_HTTP_CONCURRENCY', CONCURRENCY),
+        'timeout': config.get('NOTIFY_HTTP_TIMEOUT', TIMEOUT)
+    }
+
+
+def _build_requests(settings, channel, items):
+    """List request (item_ids, url, payload, headers) cho 1 kenh"""
+    if channel == 'sms':
+        headers = {'Authorization': f'Bearer {settings["sms_key"]}'} if settings['sms_key'] else {}
+        by_body = {}
+        for item in items:
+            by_body.setdefault(item['body'], []).append(item)
+        requests = []
+        size = settings['sms_batch_size']
+        for body, group in by_body.items():
+            for i in range(0, len(group), size):
+                chunk = group[i:i + size]
+                if size == 1:
+                    payload = {'phone': chunk[0]['recipient'], 'message': body}
+                else:
+                    payload = {'phones': [item['recipient'] for item in chunk], 'message': body}
+                requests.append(([item['id'] for item in chunk], settings['sms_url'], payload, headers))
+        return requests
+
+    headers = {'access_token': settings['zalo_token'] or ''}
+    return [([item['id']], settings['zalo_url'], {
+        'recipient': {'user_id': item['recipient']},
+        'message': {'text': item['body']}
+    }, headers) for item in items]
+
+
+def _response_error(channel, response):
+    """None neu gateway nhan tin, nguoc lai mo ta loi"""
+    if not response.is_success:
+        return f'HTTP {response.status_code}'
+    if channel == 'zalo':
+        # Zalo OA tra 200 kem {"error": ma loi, "message": ...}
+        try:
+            data = response.json()
+        except ValueError:
+            return 'Zalo: phan hoi khong hop le'
+        if data.get('error'):
+            return f'Zalo {data.get("error")}: {data.get("message")}'
+    return None
+
+
+async def _post(client, semaphore, limiter, channel, request):
+    item_ids, url, payload, headers = request
+    async with semaphore:
+        delay = limiter.reserve() if limiter else 0
+        if delay:
+            await asyncio.sleep(delay)
+        try:
+            response = await client.post(url, json=payload, headers=headers)
+            error = _response_error(channel, response)
+        except httpx.HTTPError as e:
+            error = f'{type(e).__name__}: {str(e)}'
+    return {item_id: error for item_id in item_ids}
+
+
+async def _dispatch(settings, batches, limiters):
+    limits = httpx.Limits(max_connections=settings['concurrency'],
+                          max_keepalive_connections=settings['concurrency'])
+    semaphore = asyncio.Semaphore(settings['concurrency'])
+    async with httpx.AsyncClient(limits=limits, timeout=settings['timeout']) as client:
+        tasks = [
+            _post(client, semaphore, limiters.get(channel), channel, request)
+            for channel, items in batches.items()
+            for request in _build_requests(settings, channel, items)
+        ]
+        results = {}
+        for result in await asyncio.gather(*tasks):
+            results.update(result)
+    return results
+
+
+def dispatch(batches, limiters=None, settings=None):
+    """
+    Gui tin SMS / Zalo qua HTTP (chay 1 event loop cho ca lo)
+
+    Args:
+        batches: {'sms' | 'zalo': [{'id', 'recipient', 'body'}]}
+        limiters: {kenh: RateLimiter} (None = khong gioi han)
+        settings: Ket qua gateway_settings() (None = doc tu app hien tai)
+
+    Returns:
+        dict: {id: None (da gui) | mo ta loi}
+    """
+    if settings is None:
+        settings = gateway_settings()
+    limiters = limiters or {}
+    results = {}
+
+    batches = {channel: items for channel, items in batches.items() if items}
+    if 'sms' in batches and not settings['sms_url']:
+        # Chua tich hop gateway: chi ghi log
+        for item in batches.pop('sms'):
+            current_app.logger.info(f'[SMS] To: {item["recipient"]} | Message: {item["body"]}')
+            results[item['id']] = None
+    if 'zalo' in batches and not settings['zalo_token']:
+        for item in batches.pop('zalo'):
+            results[item['id']] = 'Chua cau hinh ZALO_OA_ACCESS_TOKEN'
+
+    if batches:
+        results.update(asyncio.run(_dispatch(settings, batches, limiters)))
+    return results
+
+
+def send_one(channel, recipient, body):
+    """Gui 1 tin (dong bo); tra ve None neu thanh cong, nguoc lai mo ta loi"""
+    settings = dict(gateway_settings(), sms_batch_size=1)
+    return dispatch({channel: [{'id': 0, 'recipient': recipient, 'body': body}]}, settings=settings)[0]
@@ -0,0 +1,137 @@
+"""
+Thong bao trong he thong (Notification) va bo dem chua doc
+
+- notify_many: INSERT nhieu thong bao 1 lan + tang User.unread_notifications
+  (1 cau UPDATE cho moi muc tang, thuong chi 1 cau)
+- mark_read: danh dau da doc theo lo va tru bo dem dung so dong da doi
+- Chuong thong bao doc current_user.unread_notifications (da nap san khi
+  dang nhap) -> khong COUNT moi trang
+
+Khong commit: nguoi goi quyet dinh transaction.
+"""
+
+from datetime import datetime
+from sqlalchemy import update, case
+from app.models import Notification, User, db
+
+
+CHUNK_SIZE = 500
+
+
+def _bump_unread(increments):
+    """Cong bo dem chua doc {user_id: so thong bao} (giu nguyen updated_at cua User)"""
+    by_amount = {}
+    for user_id, amount in increments.items():
+        if amount:
+            by_amount.setdefault(amount, []).append(user_id)
+    for amount, user_ids in by_amount.items():
+        for i in range(0, len(user_ids), CHUNK_SIZE):
+            db.session.execute(
+                update(User).where(User.id.in_(user_ids[i:i + CHUNK_SIZE])).values(
+                    unread_notifications=case(
+                        (User.unread_notifications + amount < 0, 0),
+                        else_=User.unread_notifications + amount
+                    ),
+                    updated_at=User.updated_at
+                ),
+                execution_options={'synchronize_session': False}
+            )
+
+
+def notify_many(notifications):
+    """
+    Tao thong bao cho nhieu NV cung luc
+
+    Args:
+        notifications: List dict {'user_id', 'title', 'message', 'type'}
+
+    Returns:
+        int: So thong bao da tao
+    """
+    if not notifications:
+        return 0
+
+    now = datetime.utcnow()
+    rows = [{
+        'user_id': item['user_id'],
+        'title': item['title'],
+        'message': item['message'],
+        'type': item.get('type'),
+        'is_read': False,
+        'created_at': now
+    } for item in notifications]
+    for i in range(0, len(rows), CHUNK_SIZE):
+        db.session.execute(Notification.__table__.insert(), rows[i:i + CHUNK_SIZE])
+
+    increments = {}
+    for row in rows:
+        increments[row['user_id']] = increments.get(row['user_id'], 0) + 1
+    _bump_unread(increments)
+    return len(rows)
+
+
+def notify(user_id, title, message, type=None):
+    """Tao 1 thong bao"""
+    return notify_many([{'user_id': user_id, 'title': title, 'message': message, 'type': type}])
+
+
+def notify_users(user_ids, title, message, type=None):
+    """Gui cung 1 thong bao cho nhieu NV"""
+    return notify_many([{'user_id': user_id, 'title': title, 'message': message, 'type': type}
+                        for user_id in user_ids])
+
+
+def mark_read(user_id, notification_ids=None):
+    """
+    Danh dau da doc (None = tat ca thong bao cua NV)
+
+    Returns:
+        int: So thong bao vua chuyen sang da doc
+    """
+    criteria = [Notification.user_id == user_id, Notification.is_read.isnot(True)]
+    if notification_ids is not None:
+        if not notification_ids:
+            return 0
+        criteria.append(Notification.id.in_(notification_ids))
+
+    changed = db.session.execute(
+        update(Notification).where(*criteria).values(is_read=True),
+        execution_options={'synchronize_session': False}
+    ).rowcount
+
+    if notification_ids is None:
+        # Doc het: dat ve 0 (tu sua neu bo dem lech)
+        db.session.execute(
+            update(User).where(User.id == user_id)
+            .values(unread_notifications=0, updated_at=User.updated_at),
+            execution_options={'synchronize_session': False}
+        )
+    elif changed:
+        _bump_unread({user_id: -changed})
+    return changed
+
+
+def mark_all_read(user_ids):
+    """Danh dau da doc tat ca thong bao cua nhieu NV (2 cau UPDATE)"""
+    if not user_ids:
+        return 0
+    changed = db.session.execute(
+        update(Notification).where(
+            Notification.user_id.in_(user_ids), Notification.is_read.isnot(True)
+        ).values(is_read=True),
+        execution_options={'synchronize_session': False}
+    ).rowcount
+    db.session.execute(
+        update(User).where(User.id.in_(user_ids))
+        .values(unread_notifications=0, updated_at=User.updated_at),
+        execution_options={'synchronize_session': False}
+    )
+    return changed
+
+
+def get_notifications(user_id, limit=20, before_id=None):
+    """Thong bao moi nhat cua NV (dung index user_id, created_at)"""
+    query = Notification.query.filter(Notification.user_id == user_id)
+    if before_id:
+        query = query.filter(Notification.id < before_id)
+    return query.order_by(Notification.created_at.desc(), Notification.id.desc()).limit(limit).all()
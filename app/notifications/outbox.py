@@ -0,0 +1,259 @@
+"""
+Hang doi thong bao gui ra ngoai (NotificationOutbox)
+
+- enqueue_many: xep tin vao bang theo lo; idempotency_key trung thi bo qua
+  (job chay lai / gui lai khong tao tin trung)
+- deliver_pending: worker nhan 1 lo tin den han (UPDATE ... RETURNING, subquery
+  FOR UPDATE SKIP LOCKED tren PostgreSQL / MySQL -> nhieu process khong lay trung), gui:
+  - email: dung lai ket noi SMTP (mail.connect()) cho ca lo
+  - SMS / Zalo: gateway HTTP bat dong bo (app/notifications/gateway.py) chay
+    o thread rieng, song song voi email
+  - Moi kenh co gioi han tin/giay rieng
+- Loi: thu lai sau NOTIFY_RETRY_SECONDS * 2^(lan thu - 1), qua NOTIFY_MAX_ATTEMPTS
+  thi danh dau 'failed'
+- Tin co 'digest' (loai gop duoc) cho den cuoi cua so roi gop thanh 1 tin / NV / kenh
+  (app/notifications/digest.py)
+"""
+
+import smtplib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from flask_mail import Message
+from sqlalchemy import update, select
+from app import mail
+from app.models import NotificationOutbox, db
+from app.notifications.digest import is_digest_kind, digest_release_at, flush_digests
+from app.notifications.gateway import RateLimiter, dispatch, gateway_settings
+
+
+CHANNELS = ('email', 'sms', 'zalo')
+
+BATCH_SIZE = 200
+MAX_ATTEMPTS = 5
+RETRY_SECONDS = 60
+LEASE_MINUTES = 10  # Tin dang gui qua thoi gian nay (worker chet) duoc nhan lai
+
+# Loi cua rieng 1 thu (dia chi sai...), ket noi SMTP van dung duoc
+MESSAGE_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+
+
+def enqueue_many(messages):
+    """
+    Xep tin vao hang doi (khong commit)
+
+    Args:
+        messages: List dict {'channel', 'recipient', 'body', 'key', 'subject'?, 'html'?, 'user_id'?,
+                  'digest'?: loai tin (gop vao digest neu thuoc NOTIFY_DIGEST_KINDS)}
+
+    Returns:
+        int: So tin moi (bo qua key da co)
+    """
+    rows, seen = [], set()
+    now = datetime.utcnow()
+    release_at = None
+    for message in messages:
+        if message['channel'] not in CHANNELS:
+            raise ValueError(f'Kenh khong ho tro: {message["channel"]}')
+        if not message.get('recipient') or message['key'] in seen:
+            continue
+        seen.add(message['key'])
+        held = is_digest_kind(message.get('digest'))
+        if held and release_at is None:
+            release_at = digest_release_at()
+        rows.append({
+            'channel': message['channel'],
+            'recipient': message['recipient'],
+            'subject': message.get('subject'),
+            'body': message['body'],
+            'html': message.get('html'),
+            'user_id': message.get('user_id'),
+            'idempotency_key': message['key'],
+            'digest': message.get('digest'),
+            'status': 'held' if held else 'pending',
+            'attempts': 0,
+            'next_attempt_at': release_at if held else now,
+            'created_at': now
+        })
+
+    existing = set()
+    for i in range(0, len(rows), BATCH_SIZE):
+        keys = [row['idempotency_key'] for row in rows[i:i + BATCH_SIZE]]
+        existing.update(key for (key,) in db.session.query(NotificationOutbox.idempotency_key)
+                        .filter(NotificationOutbox.idempotency_key.in_(keys)))
+    rows = [row for row in rows if row['idempotency_key'] not in existing]
+
+    for i in range(0, len(rows), BATCH_SIZE):
+        db.session.execute(NotificationOutbox.__table__.insert(), rows[i:i + BATCH_SIZE])
+    return len(rows)
+
+
+def enqueue(channel, recipient, body, key, subject=None, html=None, user_id=None, digest=None):
+    """Xep 1 tin (khong commit); tra ve True neu la tin moi"""
+    return enqueue_many([{
+        'channel': channel, 'recipient': recipient, 'body': body, 'key': key,
+        'subject': subject, 'html': html, 'user_id': user_id, 'digest': digest
+    }]) == 1
+
+
+def claim_batch(limit):
+    """
+    Nhan 1 lo tin den han: chuyen sang 'sending' va giu LEASE_MINUTES (1 cau UPDATE)
+
+    PostgreSQL / MySQL: subquery SELECT ... FOR UPDATE SKIP LOCKED khoa cac dong duoc
+    chon, worker khac bo qua dong dang bi khoa. Dieu kien den han duoc kiem tra lai o
+    WHERE ngoai (dong vua duoc worker khac nhan thi khong con thoa). SQLite ghi tuan tu
+    (khoa ca CSDL) nen khong can.
+    """
+    now = datetime.utcnow()
+    due_criteria = (NotificationOutbox.status.in_(['pending', 'sending']),
+                    NotificationOutbox.next_attempt_at <= now)
+    due = select(NotificationOutbox.id).where(*due_criteria)\
+        .order_by(NotificationOutbox.next_attempt_at, NotificationOutbox.id).limit(limit)
+    if db.engine.dialect.name in ('postgresql', 'mysql', 'mariadb'):
+        due = due.with_for_update(skip_locked=True)
+    values = {'status': 'sending', 'next_attempt_at': now + timedelta(minutes=LEASE_MINUTES)}
+    columns = (NotificationOutbox.id, NotificationOutbox.channel, NotificationOutbox.recipient,
+               NotificationOutbox.subject, NotificationOutbox.body, NotificationOutbox.html,
+               NotificationOutbox.attempts)
+    options = {'synchronize_session': False}
+
+    if db.engine.dialect.update_returning:
+        stmt = update(NotificationOutbox)\
+            .where(NotificationOutbox.id.in_(due.scalar_subquery()), *due_criteria)\
+            .values(**values).returning(*columns)
+        rows = db.session.execute(stmt, execution_options=options).all()
+    else:
+        # MySQL khong co UPDATE ... RETURNING: SELECT ... FOR UPDATE SKIP LOCKED giu khoa
+        # cac dong den het transaction, UPDATE theo id roi commit
+        ids = [item_id for (item_id,) in db.session.execute(due)]
+        rows = db.session.query(*columns).filter(NotificationOutbox.id.in_(ids)).all() if ids else []
+        if rows:
+            db.session.execute(
+                update(NotificationOutbox).where(NotificationOutbox.id.in_(ids), *due_criteria)
+                .values(**values), execution_options=options
+            )
+    db.session.commit()
+    return [row._asdict() for row in rows]
+
+
+def _send_emails(items, limiter):
+    """Gui email qua 1 ket noi SMTP; loi ket noi -> cac thu con lai thu lai sau"""
+    results = {}
+    pending = list(items)
+    while pending:
+        try:
+            with mail.connect() as conn:
+                while pending:
+                    item = pending[0]
+                    limiter.wait()
+                    try:
+                        conn.send(Message(subject=item['subject'] or '', recipients=[item['recipient']],
+                                          body=item['body'], html=item['html']))
+                        results[item['id']] = None
+                    except MESSAGE_ERRORS as e:
+                        results[item['id']] = str(e)
+                    pending.pop(0)
+        except Exception as e:
+            for item in pending:
+                results[item['id']] = f'SMTP: {str(e)}'
+            pending = []
+    return results
+
+
+def _send_http(app, batches, limiters, settings):
+    """Gui SMS / Zalo qua gateway (chay trong thread, can app context rieng)"""
+    with app.app_context():
+        try:
+            return dispatch(batches, limiters, settings)
+        except Exception as e:
+            return {item['id']: str(e) for items in batches.values() for item in items}
+
+
+def deliver_pending(limit=None):
+    """
+    Gui 1 lo tin den han trong hang doi
+
+    Returns:
+        dict: {'claimed', 'sent', 'retry', 'failed', 'elapsed'}
+    """
+    config = current_app.config
+    started = time.perf_counter()
+    items = claim_batch(limit or config.get('NOTIFY_BATCH_SIZE', BATCH_SIZE))
+    if not items:
+        return {'claimed': 0, 'sent': 0, 'retry': 0, 'failed': 0, 'elapsed': 0}
+
+    rates = config.get('NOTIFY_RATE_LIMITS', {})
+    limiters = {channel: RateLimiter(rates.get(channel, 0)) for channel in CHANNELS}
+    by_channel = {}
+    for item in items:
+        by_channel.setdefault(item['channel'], []).append(item)
+
+    results = {}
+    batches = {channel: by_channel[channel] for channel in ('sms', 'zalo') if channel in by_channel}
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        future = pool.submit(_send_http, current_app._get_current_object(), batches, limiters,
+                             gateway_settings()) if batches else None
+        # Email gui o thread hien tai trong luc SMS / Zalo chay song song
+        if by_channel.get('email'):
+            results.update(_send_emails(by_channel['email'], limiters['email']))
+        if future is not None:
+            results.update(future.result())
+
+    counts = _record_results(items, results)
+    counts['claimed'] = len(items)
+    counts['elapsed'] = round(time.perf_counter() - started, 3)
+    return counts
+
+
+def _record_results(items, results):
+    """Cap nhat trang thai ca lo (1 cau UPDATE nhieu dong)"""
+    config = current_app.config
+    max_attempts = config.get('NOTIFY_MAX_ATTEMPTS', MAX_ATTEMPTS)
+    retry_seconds = config.get('NOTIFY_RETRY_SECONDS', RETRY_SECONDS)
+    now = datetime.utcnow()
+
+    updates = []
+    counts = {'sent': 0, 'retry': 0, 'failed': 0}
+    for item in items:
+        error = results.get(item['id'], 'Khong co ket qua gui')
+        attempts = item['attempts'] + 1
+        if error is None:
+            updates.append({'id': item['id'], 'status': 'sent', 'attempts': attempts,
+                            'sent_at': now, 'last_error': None})
+            counts['sent'] += 1
+        elif attempts >= max_attempts:
+            updates.append({'id': item['id'], 'status': 'failed', 'attempts': attempts, 'last_error': error})
+            counts['failed'] += 1
+        else:
+            delay = retry_seconds * 2 ** (attempts - 1)
+            updates.append({'id': item['id'], 'status': 'pending', 'attempts': attempts, 'last_error': error,
+                            'next_attempt_at': now + timedelta(seconds=delay)})
+            counts['retry'] += 1
+
+    # Nhom theo tap cot de moi nhom la 1 executemany
+    groups = {}
+    for row in updates:
+        groups.setdefault(tuple(sorted(row)), []).append(row)
+    for rows in groups.values():
+        db.session.execute(update(NotificationOutbox), rows)
+    db.session.commit()
+
+    if counts['failed']:
+        current_app.logger.error(f'Notification outbox: {counts["failed"]} tin gui that bai qua {max_attempts} lan')
+    return counts
+
+
+def deliver_all(limit=None, max_batches=50):
+    """Gop digest den han roi gui het tin den han (nhieu lo lien tiep); dung cho job / CLI"""
+    digests = flush_digests()
+    total = {'claimed': 0, 'sent': 0, 'retry': 0, 'failed': 0}
+    for _ in range(max_batches):
+        result = deliver_pending(limit)
+        for key in total:
+            total[key] += result[key]
+        if not result['claimed']:
+            break
+    total['digests'] = digests['digests']
+    return total
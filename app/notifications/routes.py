@@ -0,0 +1,40 @@
+from flask import render_template, redirect, url_for, request, jsonify
+from flask_login import login_required, current_user
+from app.notifications import bp
+from app.notifications.inbox import get_notifications, mark_read
+from app.models import db
+
+
+@bp.route('/')
+@login_required
+def index():
+    """Danh sach thong bao cua NV"""
+    before_id = request.args.get('before', type=int)
+    notifications = get_notifications(current_user.id, limit=20, before_id=before_id)
+    return render_template('notifications/index.html',
+                           notifications=notifications,
+                           next_before=notifications[-1].id if len(notifications) == 20 else None)
+
+
+@bp.route('/mark-read', methods=['POST'])
+@login_required
+def mark_as_read():
+    """Danh dau da doc: ids (JSON / form) hoac tat ca"""
+    if request.is_json:
+        ids = (request.get_json(silent=True) or {}).get('ids')
+    else:
+        ids = request.form.getlist('ids', type=int) or None
+    changed = mark_read(current_user.id, ids)
+    db.session.commit()
+
+    if request.is_json:
+        db.session.refresh(current_user)
+        return jsonify({'success': True, 'changed': changed, 'unread': current_user.unread_notifications})
+    return redirect(request.referrer or url_for('notifications.index'))
+
+
+@bp.route('/unread-count')
+@login_required
+def unread_count():
+    """So thong bao chua doc (doc tu bo dem, khong COUNT)"""
+    return jsonify({'unread': current_user.unread_notifications})
@@ -4,6 +4,8 @@ Module gui SMS thong bao
 """
 
 from flask import current_app
+from app.notifications.gateway import send_one
+from app.notifications.templates import render, render_batch
 
 
 def send_sms(phone, message):
@@ -18,12 +20,14 @@ def send_sms(phone, message):
         bool: Thanh cong hay khong
     """
     # TODO: Tich hop voi SMS Gateway (Twilio, Nexmo, VNPT, Viettel...)
-    # Hien tai chi log ra console
+    # Co SMS_API_URL: POST qua app/notifications/gateway.py; khong co thi chi log
+    # Gui hang loat: xep vao hang doi (queue_schedule_reminder_sms...) de gui theo lo
 
     try:
-        current_app.logger.info(f'[SMS] To: {phone} | Message: {message}')
-        print(f'[SMS] To: {phone} | Message: {message}')
-        return True
+        error = send_one('sms', phone, message)
+        if error:
+            current_app.logger.error(f'Error sending SMS: {error}')
+        return error is None
     except Exception as e:
         current_app.logger.error(f'Error sending SMS: {str(e)}')
         return False
@@ -42,12 +46,8 @@ def send_late_sms(user, late_count, late_minutes, penalty):
     if not user.phone:
         return False
 
-    if late_count == 1:
-        message = f"[HR] Ban di muon {late_minutes} phut. Lan 1, chua phat. Hay di dung gio!"
-    else:
-        message = f"[HR] Ban di muon {late_minutes} phut. Lan {late_count}, phat {penalty:,.0f}d. De nghi di dung gio."
-
-    return send_sms(user.phone, message)
+    message = render('sms', 'late', late_count=late_count, late_minutes=late_minutes, penalty=penalty)
+    return send_sms(user.phone, message['body'])
 
 
 def send_schedule_reminder_sms(user):
@@ -57,8 +57,55 @@ def send_schedule_reminder_sms(user):
     if not user.phone:
         return False
 
-    message = "[HR] Ban chua dang ky lich tuan sau. Han cuoi: 18h Thu 7. Vui long dang ky ngay!"
-    return send_sms(user.phone, message)
+    return send_sms(user.phone, render('sms', 'schedule_reminder', user=user)['body'])
+
+
+def queue_schedule_reminder_sms(users, week_start):
+    """
+    Xep SMS nhac dang ky lich cho nhieu NV vao hang doi (worker gui song song)
+
+    Returns:
+        int: So tin moi
+    """
+    from app.notifications.outbox import enqueue_many
+    from app.models import db
+
+    users = [user for user in users if user.phone]
+    messages = render_batch('sms', 'schedule_reminder', [{'user': user} for user in users])
+    queued = enqueue_many([{
+        'channel': 'sms',
+        'recipient': user.phone,
+        'body': message['body'],
+        'user_id': user.id,
+        'key': f'schedule-reminder:{week_start.isoformat()}:{user.id}:sms'
+    } for user, message in zip(users, messages)])
+    db.session.commit()
+    return queued
+
+
+def queue_late_sms(entries, date):
+    """
+    Xep SMS canh bao di muon trong ngay vao hang doi (gop digest 'late', khong commit)
+
+    Args:
+        entries: List dict {'user', 'late_count', 'late_minutes', 'penalty'}
+        date: Ngay di muon (khoa chong gui trung)
+
+    Returns:
+        int: So tin moi
+    """
+    from app.notifications.outbox import enqueue_many
+
+    entries = [entry for entry in entries if entry['user'].phone]
+    messages = render_batch('sms', 'late', entries)
+    return enqueue_many([{
+        'channel': 'sms',
+        'recipient': entry['user'].phone,
+        'body': message['body'],
+        'user_id': entry['user'].id,
+        'key': f'late:{date.isoformat()}:{entry["user"].id}:sms',
+        'digest': 'late'
+    } for entry, message in zip(entries, messages)])
 
 
 def send_schedule_confirmed_sms(user, shift_count):
@@ -68,5 +115,4 @@ def send_schedule_confirmed_sms(user, shift_count):
     if not user.phone:
         return False
 
-    message = f"[HR] Lich lam viec tuan sau da xac nhan. Ban co {shift_count} ca. Xem chi tiet tren he thong."
-    return send_sms(user.phone, message)
+    return send_sms(user.phone, render('sms', 'schedule_confirmed', user=user, shift_count=shift_count)['body'])
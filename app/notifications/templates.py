@@ -0,0 +1,273 @@
+"""
+Mau noi dung thong bao (email / SMS / Zalo / trong he thong 'app') bien dich san bang Jinja
+
+- Moi mau (kenh, loai, ngon ngu) chi bien dich 1 lan, cache trong process
+- Ghi de tu DB: SystemConfig key 'notify_template:<kenh>:<loai>:<ngon ngu>:<subject|body>'
+  Doc tat ca ban ghi de bang 1 query, cache OVERRIDE_TTL giay (khong tra DB moi tin);
+  sua mau thi goi invalidate_templates()
+- render_batch: lay mau 1 lan, render cho ca danh sach nguoi nhan
+- Mau '<kenh>/digest': gop nhieu tin cua 1 NV (items: cac tin goc co subject, body)
+"""
+
+import threading
+from jinja2 import Environment, StrictUndefined, TemplateError
+from flask import current_app
+from app.cache import TTLCache
+from app.models import SystemConfig
+
+
+DEFAULT_LOCALE = 'vi'
+OVERRIDE_PREFIX = 'notify_template:'
+OVERRIDE_TTL = 300
+
+DAY_NAMES = ['Thu 2', 'Thu 3', 'Thu 4', 'Thu 5', 'Thu 6', 'Thu 7', 'CN']
+
+SIGNATURE = """
+Tran trong,
+HR Management System
+"""
+
+DEFAULT_TEMPLATES = {
+    ('email', 'schedule_registration', 'vi'): {
+        'subject': '[HR] Mo dang ky lich lam viec tuan sau',
+        'body': """
+Xin chao,
+
+He thong da mo dang ky lich lam viec cho tuan sau.
+
+Vui long dang nhap va dang ky lich lam viec truoc 18h Thu Bay.
+
+Link dang ky: {{ url }}
+""" + SIGNATURE
+    },
+    ('email', 'schedule_reminder', 'vi'): {
+        'subject': '[HR] NHAC NHO: Ban chua dang ky lich lam viec',
+        'body': """
+Xin chao {{ user.full_name }},
+
+Ban CHUA DANG KY lich lam viec cho tuan sau.
+
+Han cuoi dang ky: 18h Thu Bay hom nay.
+
+Vui long dang ky ngay de tranh bi xep lich tu dong.
+""" + SIGNATURE
+    },
+    ('email', 'schedule_confirmed', 'vi'): {
+        'subject': "[HR] Lich lam viec tuan {{ week_start.strftime('%d/%m/%Y') }}",
+        'body': """
+Xin chao {{ user.full_name }},
+
+Lich lam viec cua ban tuan {{ week_start.strftime('%d/%m/%Y') }} da duoc xac nhan:
+
+{% for shift in shifts -%}
+- {{ day_names[shift.date.weekday()] }} ({{ shift.date.strftime('%d/%m') }}): {{ shift.shift_start_time.strftime('%H:%M') }} - {{ shift.shift_end_time.strftime('%H:%M') }}
+{% endfor %}
+Vui long di lam dung gio.
+""" + SIGNATURE
+    },
+    ('email', 'late', 'vi'): {
+        'subject': '{% if late_count == 1 %}[HR] Nhac nho di muon{% else %}[HR] Canh bao di muon lan {{ late_count }}{% endif %}',
+        'body': """
+Xin chao {{ user.full_name }},
+
+Ban da di muon {{ late_minutes }} phut.
+{% if late_count == 1 %}
+Day la lan dau trong thang nen chua bi phat.
+Hay co gang di lam dung gio!
+{% else %}
+Day la lan thu {{ late_count }} trong thang.
+Tien phat: {{ penalty|money }} VND
+
+De nghi ban tuan thu di lam dung gio.
+{% endif %}""" + SIGNATURE
+    },
+    ('email', 'payslip', 'vi'): {
+        'subject': '[HR] Phieu luong thang {{ payroll.month }}/{{ payroll.year }}',
+        'body': """
+Xin chao {{ user.full_name }},
+
+Phieu luong thang {{ payroll.month }}/{{ payroll.year }} cua ban:
+
+- Tong gio lam: {{ payroll.total_work_hours }} gio
+- So ca lam: {{ payroll.total_shifts }} ca
+- Luong gop: {{ payroll.gross_salary|money }} VND
+- Tien an ca: {{ payroll.meal_support_amount|money }} VND
+- Tien thuong: {{ payroll.total_reward|money }} VND
+- Tien phat: {{ payroll.total_penalty|money }} VND
+- Tam ung: {{ payroll.advance_payment|money }} VND
+
+THUC LINH: {{ payroll.net_salary|money }} VND
+
+Vui long dang nhap he thong de xem chi tiet va tai phieu luong PDF.
+""" + SIGNATURE
+    },
+    ('email', 'digest', 'vi'): {
+        'subject': '[HR] Tong hop {{ count }} thong bao',
+        'body': """
+Xin chao,
+
+Ban co {{ count }} thong bao moi:
+{% for item in items %}
+{{ loop.index }}. {{ item.subject or 'Thong bao' }}
+{{ item.body|replace(signature, '')|trim }}
+{% endfor %}""" + SIGNATURE
+    },
+    ('sms', 'digest', 'vi'): {
+        'body': '[HR] {{ count }} thong bao:{% for item in items %} {{ loop.index }}) '
+                '{{ item.body|replace("[HR] ", "")|trim }}{% endfor %}'
+    },
+    ('zalo', 'digest', 'vi'): {
+        'body': 'Ban co {{ count }} thong bao:{% for item in items %}\n{{ loop.index }}) {{ item.body|trim }}{% endfor %}'
+    },
+    ('sms', 'late', 'vi'): {
+        'body': '{% if late_count == 1 %}[HR] Ban di muon {{ late_minutes }} phut. Lan 1, chua phat. Hay di dung gio!'
+                '{% else %}[HR] Ban di muon {{ late_minutes }} phut. Lan {{ late_count }}, phat {{ penalty|money }}d. '
+                'De nghi di dung gio.{% endif %}'
+    },
+    ('sms', 'schedule_reminder', 'vi'): {
+        'body': '[HR] Ban chua dang ky lich tuan sau. Han cuoi: 18h Thu 7. Vui long dang ky ngay!'
+    },
+    ('sms', 'schedule_confirmed', 'vi'): {
+        'body': '[HR] Lich lam viec tuan sau da xac nhan. Ban co {{ shift_count }} ca. Xem chi tiet tren he thong.'
+    },
+    ('app', 'late', 'vi'): {
+        'subject': '{% if late_count == 1 %}Nhac nho di muon{% else %}Canh bao di muon lan {{ late_count }}{% endif %}',
+        'body': '{% if late_count == 1 %}Ban di muon {{ late_minutes }} phut. Day la lan dau trong thang, chua bi phat. '
+                'Hay co gang di dung gio!{% else %}Ban di muon {{ late_minutes }} phut. Day la lan {{ late_count }} '
+                'trong thang. Tien phat: {{ penalty|money }}d. De nghi tuan thu di lam dung gio.{% endif %}'
+    },
+    ('zalo', 'late', 'vi'): {
+        'body': '{% if late_count == 1 %}Ban di muon {{ late_minutes }} phut. Lan 1, chua phat. Hay di dung gio nhe!'
+                '{% else %}Ban di muon {{ late_minutes }} phut. Lan {{ late_count }}, phat {{ penalty|money }}d. '
+                'De nghi di dung gio.{% endif %}'
+    },
+}
+
+
+def _money(value):
+    return f'{value or 0:,.0f}'
+
+
+_env = Environment(autoescape=False, keep_trailing_newline=True, undefined=StrictUndefined)
+_env.filters['money'] = _money
+_env.globals['day_names'] = DAY_NAMES
+_env.globals['signature'] = SIGNATURE
+
+_compiled = {}  # (kenh, loai, ngon ngu) -> (nguon, {phan: Template})
+_defaults = {}  # ((kenh, loai, ngon ngu), phan) -> Template mac dinh
+_compiled_lock = threading.Lock()
+_override_cache = TTLCache(ttl=OVERRIDE_TTL, maxsize=1)
+
+
+def _load_overrides():
+    """{(kenh, loai, ngon ngu, phan): nguon} tu SystemConfig (1 query, cache TTL)"""
+    def load():
+        overrides = {}
+        for config in SystemConfig.query.filter(SystemConfig.key.like(f'{OVERRIDE_PREFIX}%')):
+            parts = config.key[len(OVERRIDE_PREFIX):].split(':')
+            if len(parts) == 4 and parts[3] in ('subject', 'body') and config.value:
+                overrides[tuple(parts)] = config.value
+        return overrides
+    return _override_cache.get_or_set('overrides', load)
+
+
+def invalidate_templates():
+    """Doc lai ban ghi de tu DB o lan render tiep theo"""
+    _override_cache.clear()
+
+
+def _default_template(key, part):
+    """Mau mac dinh da bien dich (dung khi mau ghi de loi)"""
+    template = _defaults.get((key, part))
+    if template is None:
+        template = _defaults[(key, part)] = _env.from_string(DEFAULT_TEMPLATES[key][part])
+    return template
+
+
+def _compile(key, sources):
+    compiled = {}
+    for part, source in sources.items():
+        if source == DEFAULT_TEMPLATES[key][part]:
+            compiled[part] = _default_template(key, part)
+            continue
+        try:
+            compiled[part] = _env.from_string(source)
+        except TemplateError as e:
+            current_app.logger.error(f'Mau thong bao {key} ({part}) loi: {str(e)}, dung mau mac dinh')
+            compiled[part] = _default_template(key, part)
+    return compiled
+
+
+def _template_key(channel, kind, locale):
+    """Khoa DEFAULT_TEMPLATES cho (kenh, loai, ngon ngu); khong co ngon ngu thi dung DEFAULT_LOCALE"""
+    key = (channel, kind, locale)
+    if key not in DEFAULT_TEMPLATES:
+        key = (channel, kind, DEFAULT_LOCALE)
+        if key not in DEFAULT_TEMPLATES:
+            raise KeyError(f'Khong co mau thong bao {channel}/{kind}')
+    return key
+
+
+def get_template(channel, kind, locale=None):
+    """
+    Mau da bien dich cho (kenh, loai, ngon ngu)
+
+    Returns:
+        dict: {'subject'?: Template, 'body': Template}
+    """
+    locale = locale or DEFAULT_LOCALE
+    key = _template_key(channel, kind, locale)
+
+    overrides = _load_overrides()
+    sources = {part: overrides.get((channel, kind, locale, part), source)
+               for part, source in DEFAULT_TEMPLATES[key].items()}
+
+    cached = _compiled.get(key + (locale,))
+    if cached is None or cached[0] != sources:
+        with _compiled_lock:
+            cached = (sources, _compile(key, sources))
+            _compiled[key + (locale,)] = cached
+    return cached[1]
+
+
+def render_batch(channel, kind, contexts, locale=None):
+    """
+    Render 1 mau cho nhieu nguoi nhan (lay mau 1 lan)
+
+    Mau ghi de loi khi render (StrictUndefined: bien khong co...) -> ghi log va
+    render lai bang mau mac dinh cho nguoi nhan do, khong lam hong ca lo.
+
+    Args:
+        contexts: List dict bien cho tung nguoi nhan
+
+    Returns:
+        list: [{'subject': str | None, 'body': str}] cung thu tu contexts
+    """
+    template = get_template(channel, kind, locale)
+    key = _template_key(channel, kind, locale or DEFAULT_LOCALE)
+    errors = {}
+
+    def render_part(part, context):
+        compiled = template[part]
+        try:
+            return compiled.render(context)
+        except Exception as e:
+            if compiled is _default_template(key, part):
+                raise
+            errors.setdefault(part, [0, str(e)])[0] += 1
+            return _default_template(key, part).render(context)
+
+    results = [{
+        'subject': render_part('subject', context) if 'subject' in template else None,
+        'body': render_part('body', context)
+    } for context in contexts]
+
+    for part, (count, error) in errors.items():
+        current_app.logger.error(f'Mau thong bao {key} ({part}) loi khi render ({count} tin): {error}, '
+                                 f'dung mau mac dinh')
+    return results
+
+
+def render(channel, kind, locale=None, **context):
+    """Render 1 thong bao: {'subject', 'body'}"""
+    return render_batch(channel, kind, [context], locale)[0]
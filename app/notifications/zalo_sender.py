@@ -4,7 +4,8 @@ Module gui thong bao qua Zalo OA
 """
 
 from flask import current_app
-import requests
+from app.notifications.gateway import send_one
+from app.notifications.templates import render
 
 
 def send_zalo_message(user_id, message):
@@ -18,8 +19,8 @@ def send_zalo_message(user_id, message):
     Returns:
         bool: Thanh cong hay khong
     """
-    # TODO: Tich hop voi Zalo OA API
-    # https://developers.zalo.me/docs/api/official-account-api
+    # Zalo OA API: https://developers.zalo.me/docs/api/official-account-api
+    # Gui hang loat: xep vao hang doi, worker gui song song qua app/notifications/gateway.py
 
     try:
         access_token = current_app.config.get('ZALO_OA_ACCESS_TOKEN')
@@ -27,32 +28,11 @@ def send_zalo_message(user_id, message):
             current_app.logger.warning('Zalo OA access token not configured')
             return False
 
-        # API endpoint
-        url = 'https://openapi.zalo.me/v2.0/oa/message'
-
-        headers = {
-            'access_token': access_token,
-            'Content-Type': 'application/json'
-        }
-
-        payload = {
-            'recipient': {
-                'user_id': user_id
-            },
-            'message': {
-                'text': message
-            }
-        }
-
-        # Hien tai chi log, chua gui thuc
         current_app.logger.info(f'[ZALO] To: {user_id} | Message: {message}')
-        print(f'[ZALO] To: {user_id} | Message: {message}')
-
-        # Uncomment de gui thuc:
-        # response = requests.post(url, headers=headers, json=payload)
-        # return response.status_code == 200
-
-        return True
+        error = send_one('zalo', user_id, message)
+        if error:
+            current_app.logger.error(f'Error sending Zalo message: {error}')
+        return error is None
 
     except Exception as e:
         current_app.logger.error(f'Error sending Zalo message: {str(e)}')
@@ -66,10 +46,7 @@ def send_late_zalo(user, late_count, late_minutes, penalty):
     # TODO: Can luu tru zalo_user_id trong User model
     # Hien tai chua co nen chi log
 
-    if late_count == 1:
-        message = f"Ban di muon {late_minutes} phut. Lan 1, chua phat. Hay di dung gio nhe!"
-    else:
-        message = f"Ban di muon {late_minutes} phut. Lan {late_count}, phat {penalty:,.0f}d. De nghi di dung gio."
+    message = render('zalo', 'late', late_count=late_count, late_minutes=late_minutes, penalty=penalty)['body']
 
     print(f'[ZALO] To: {user.full_name} | {message}')
     return True
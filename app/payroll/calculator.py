@@ -16,11 +16,13 @@ CONG THUC TINH LUONG:
 """
 
 from datetime import datetime, date as date_type
+from sqlalchemy import func
 from app.models import (
     Payroll, AttendanceRecord, Violation, Reward, Holiday, User,
     PayrollStatus, db
 )
 from flask import current_app
+from app.dashboard.events import publish_payroll_totals
 
 
 def get_holiday_multiplier(check_date):
@@ -141,7 +143,7 @@ def calculate_rewards(user_id, month, year):
     return total_reward, rewards
 
 
-def calculate_monthly_payroll(user_id, month, year, advance_payment=0):
+def calculate_monthly_payroll(user_id, month, year, advance_payment=0, commit=True):
     """
     Tinh luong thang cho 1 nhan vien
 
@@ -150,6 +152,7 @@ def calculate_monthly_payroll(user_id, month, year, advance_payment=0):
         month: Thang
         year: Nam
         advance_payment: Tien tam ung
+        commit: False = chi flush, nguoi goi commit (ghi checkpoint cung transaction)
 
     Returns:
         Payroll object
@@ -200,7 +203,10 @@ def calculate_monthly_payroll(user_id, month, year, advance_payment=0):
     payroll.net_salary = round(net_salary, 0)
     payroll.status = PayrollStatus.DRAFT
 
-    db.session.commit()
+    if commit:
+        db.session.commit()
+    else:
+        db.session.flush()
 
     return payroll
 
@@ -220,6 +226,12 @@ def calculate_all_payrolls(month, year):
         if payroll:
             payrolls.append(payroll)
 
+    # Tong luong thang (1 query, tranh nap lai tung payroll da expire sau commit)
+    count, total_net = db.session.query(
+        func.count(Payroll.id), func.coalesce(func.sum(Payroll.net_salary), 0)
+    ).filter(Payroll.month == month, Payroll.year == year).one()
+    publish_payroll_totals(month, year, count, total_net)
+
     return payrolls
 
 
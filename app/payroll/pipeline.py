@@ -0,0 +1,219 @@
+"""
+Tinh luong cuoi thang theo lo, co checkpoint tung NV
+
+Moi ky luong co 1 PayrollRun; moi NV 1 PayrollRunItem di qua cac buoc:
+    pending -> computed (tinh + luu Payroll) -> rendered (PDF luu tru)
+            -> queued (email phieu luong da vao hang doi)
+
+- Chia NV thanh lo PAYROLL_CHUNK_SIZE, PAYROLL_WORKERS lo chay song song
+  (moi thread 1 app context / session rieng). Chay song song can PostgreSQL /
+  MySQL: SQLite khoa ca file khi ghi, cac lo se tranh khoa (database is
+  locked) nen tren SQLite luon chay tuan tu (workers=1)
+- computed: Payroll va checkpoint ghi cung 1 transaction
+- rendered / queued: ghi checkpoint sau moi lo; chay lai 1 buoc la an toan
+  (PDF ghi de, email co idempotency key trong outbox -> khong gui trung)
+- Process chet giua chung: chay lai run_payroll(thang, nam) chi xu ly cac NV
+  chua toi 'queued', bat dau tu buoc dang do
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import func, update
+from app.models import PayrollRun, PayrollRunItem, Payroll, User, db
+from app.dashboard.events import publish_payroll_totals
+
+
+CHUNK_SIZE = 50
+WORKERS = 4
+
+
+def start_run(month, year):
+    """
+    Lay (hoac tao) PayrollRun cua ky luong va them NV active chua co trong run
+
+    Returns:
+        PayrollRun
+    """
+    run = PayrollRun.query.filter_by(month=month, year=year).first()
+    if run is None:
+        run = PayrollRun(month=month, year=year, status='running')
+        db.session.add(run)
+        db.session.flush()
+
+    existing = db.session.query(PayrollRunItem.user_id).filter(PayrollRunItem.run_id == run.id)
+    new_user_ids = [user_id for (user_id,) in db.session.query(User.id).filter(
+        User.status == 'active', ~User.id.in_(existing)
+    )]
+    if new_user_ids:
+        now = datetime.utcnow()
+        db.session.execute(PayrollRunItem.__table__.insert(), [
+            {'run_id': run.id, 'user_id': user_id, 'stage': 'pending', 'updated_at': now}
+            for user_id in new_user_ids
+        ])
+        run.status = 'running'
+        run.finished_at = None
+    run.total_items = db.session.query(func.count(PayrollRunItem.id))\
+        .filter(PayrollRunItem.run_id == run.id).scalar()
+    db.session.commit()
+    return run
+
+
+def _set_stage(item_ids, stage, **values):
+    if item_ids:
+        db.session.execute(
+            update(PayrollRunItem).where(PayrollRunItem.id.in_(item_ids))
+            .values(stage=stage, error=None, updated_at=datetime.utcnow(), **values),
+            execution_options={'synchronize_session': False}
+        )
+
+
+def _set_error(item_id, error):
+    db.session.execute(
+        update(PayrollRunItem).where(PayrollRunItem.id == item_id)
+        .values(error=error, updated_at=datetime.utcnow()),
+        execution_options={'synchronize_session': False}
+    )
+    db.session.commit()
+
+
+def _compute(run, items):
+    """Buoc 1: tinh luong tung NV, Payroll + checkpoint cung transaction"""
+    from app.payroll.calculator import calculate_monthly_payroll
+
+    for item in items:
+        if item.stage != 'pending':
+            continue
+        try:
+            payroll = calculate_monthly_payroll(item.user_id, run.month, run.year, commit=False)
+            if payroll is None:
+                db.session.rollback()
+                _set_error(item.id, 'Khong tim thay NV')
+                continue
+            _set_stage([item.id], 'computed', payroll_id=payroll.id)
+            db.session.commit()
+            item.stage, item.payroll_id = 'computed', payroll.id
+        except Exception as e:
+            db.session.rollback()
+            _set_error(item.id, f'Tinh luong: {str(e)}')
+
+
+def _render(run, items):
+    """Buoc 2: tao phieu luong PDF luu tru (ban gui cuoi thang)"""
+    from app.payroll.report_generator import generate_payslip_pdf
+
+    folder = os.path.join(current_app.config.get('PAYSLIP_FOLDER', 'exports/payslips'),
+                          f'{run.year}-{run.month:02d}')
+    os.makedirs(folder, exist_ok=True)
+
+    rendered = []
+    for item in items:
+        if item.stage != 'computed':
+            continue
+        path = os.path.join(folder, f'{item.user_id}.pdf')
+        try:
+            generate_payslip_pdf(item.payroll_id, output_path=path)
+            rendered.append(item)
+        except Exception as e:
+            db.session.rollback()
+            _set_error(item.id, f'Tao PDF: {str(e)}')
+
+    # Checkpoint ca lo (1 executemany; tao lai PDF khi chay lai la an toan)
+    if rendered:
+        now = datetime.utcnow()
+        db.session.execute(update(PayrollRunItem), [{
+            'id': item.id, 'stage': 'rendered', 'error': None, 'updated_at': now,
+            'pdf_path': os.path.join(folder, f'{item.user_id}.pdf')
+        } for item in rendered])
+        db.session.commit()
+        for item in rendered:
+            item.stage = 'rendered'
+
+
+def _enqueue(run, items):
+    """Buoc 3: xep email phieu luong vao hang doi (idempotency key: khong gui trung)"""
+    from app.notifications.email_sender import send_payslip_emails
+
+    ready = [item for item in items if item.stage == 'rendered']
+    if not ready:
+        return
+    payrolls = Payroll.query.filter(Payroll.id.in_([item.payroll_id for item in ready])).all()
+    try:
+        send_payslip_emails(payrolls)
+    except Exception as e:
+        db.session.rollback()
+        for item in ready:
+            _set_error(item.id, f'Xep email: {str(e)}')
+        return
+    _set_stage([item.id for item in ready], 'queued')
+    db.session.commit()
+
+
+def process_chunk(run_id, item_ids):
+    """Chay ca 3 buoc cho 1 lo NV (trong app context hien tai)"""
+    run = db.session.get(PayrollRun, run_id)
+    items = PayrollRunItem.query.filter(PayrollRunItem.id.in_(item_ids))\
+        .order_by(PayrollRunItem.id).all()
+    _compute(run, items)
+    _render(run, items)
+    _enqueue(run, items)
+
+
+def _run_chunk(app, run_id, item_ids):
+    with app.app_context():
+        process_chunk(run_id, item_ids)
+
+
+def run_payroll(month, year, chunk_size=None, workers=None):
+    """
+    Tinh luong ca ky theo lo (tiep tuc tu checkpoint neu da chay do)
+
+    Returns:
+        dict: {'run_id', 'total', 'processed', 'queued', 'failed', 'status', 'elapsed'}
+    """
+    config = current_app.config
+    chunk_size = chunk_size or config.get('PAYROLL_CHUNK_SIZE', CHUNK_SIZE)
+    workers = workers or config.get('PAYROLL_WORKERS', WORKERS)
+    if workers > 1 and db.engine.dialect.name == 'sqlite':
+        current_app.logger.warning(f'Tinh luong: SQLite khong ghi song song duoc, bo qua workers={workers}')
+        workers = 1
+    started = time.perf_counter()
+
+    run = start_run(month, year)
+    run_id = run.id
+    item_ids = [item_id for (item_id,) in db.session.query(PayrollRunItem.id).filter(
+        PayrollRunItem.run_id == run_id, PayrollRunItem.stage != 'queued'
+    ).order_by(PayrollRunItem.id)]
+    chunks = [item_ids[i:i + chunk_size] for i in range(0, len(item_ids), chunk_size)]
+
+    if chunks:
+        app = current_app._get_current_object()
+        with ThreadPoolExecutor(max_workers=max(min(workers, len(chunks)), 1)) as pool:
+            for future in [pool.submit(_run_chunk, app, run_id, chunk) for chunk in chunks]:
+                future.result()
+
+    stages = dict(db.session.query(PayrollRunItem.stage, func.count(PayrollRunItem.id))
+                  .filter(PayrollRunItem.run_id == run_id).group_by(PayrollRunItem.stage))
+    queued = stages.get('queued', 0)
+    run = db.session.get(PayrollRun, run_id)
+    run.status = 'done' if queued == run.total_items else 'partial'
+    run.finished_at = datetime.utcnow()
+    db.session.commit()
+
+    # Tong luong thang (1 query)
+    count, total_net = db.session.query(
+        func.count(Payroll.id), func.coalesce(func.sum(Payroll.net_salary), 0)
+    ).filter(Payroll.month == month, Payroll.year == year).one()
+    publish_payroll_totals(month, year, count, total_net)
+
+    return {
+        'run_id': run_id,
+        'total': run.total_items,
+        'processed': len(item_ids),
+        'queued': queued,
+        'failed': run.total_items - queued,
+        'status': run.status,
+        'elapsed': round(time.perf_counter() - started, 3)
+    }
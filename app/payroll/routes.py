@@ -11,6 +11,7 @@ from app.payroll.calculator import (
 from app.payroll.report_generator import generate_payslip_pdf, generate_monthly_report_pdf
 from app.models import Payroll, User, UserRole, PayrollStatus, db
 from app.auth.routes import manager_required, admin_required
+from app.dashboard.staff_snapshot import refresh_staff_snapshots
 
 
 @bp.route('/')
@@ -62,6 +63,7 @@ def calculate():
 
     try:
         payrolls = calculate_all_payrolls(month, year)
+        refresh_staff_snapshots()
         flash(f'Da tinh luong cho {len(payrolls)} nhan vien.', 'success')
     except Exception as e:
         flash(f'Loi khi tinh luong: {str(e)}', 'danger')
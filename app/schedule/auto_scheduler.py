@@ -3,33 +3,150 @@ Thuat toan xep lich tu dong voi che do DRAFT:
 - KHONG GHI DE lich dang ky cua NV (shift_source='employee')
 - Tao lich NHAP (shift_source='system', draft_status='draft')
 - Quan ly xem va sua truoc khi luu chinh thuc
+- Phan bo ca bang bo giai min-cost flow (app/schedule/solver.py): phu toi da
+  cac ca (uu tien gio dong), ton trong nguyen vong va chia deu so ca
+- Lich nhap giu rang buoc nghi giua ca / gio toi da cua validator (solver_rules), cung
+  gio ca trong SystemConfig (get_dynamic_shift_times)
 """
 
 from datetime import datetime, timedelta, time
-from collections import defaultdict
+from flask import current_app
+from sqlalchemy.orm import selectinload
 from app.models import (
-    User, WorkSchedule, ScheduleShift, CustomerTraffic,
+    User, WorkSchedule, ScheduleShift, CustomerTraffic, SystemConfig,
     EmploymentType, ShiftType, ScheduleStatus, db
 )
+from app.schedule.solver import solve_schedule, SLOTS, DEFAULT_MAX_SHIFTS
+from app.schedule.persistence import save_assignments
+from app.schedule.forecast import get_staffing_demand
 
 
-# Dinh nghia thoi gian cac ca
+# Dinh nghia thoi gian cac ca (mac dinh; gio thuc te: get_dynamic_shift_times)
 SHIFT_TIMES = {
     ShiftType.MORNING: (time(7, 0), time(12, 0)),
     ShiftType.AFTERNOON: (time(12, 0), time(18, 0)),
     ShiftType.EVENING: (time(18, 0), time(22, 0))
 }
 
+# Thu tu ca trong bo giai (shift index 0-2)
+SHIFT_ORDER = [ShiftType.MORNING, ShiftType.AFTERNOON, ShiftType.EVENING]
+
+# Trong so phu song cua ca gio dong (ca thuong = 1)
+PEAK_WEIGHT = 2.0
+
+
+def get_shift_settings():
+    """Lay cai dat ca lam viec tu SystemConfig"""
+    settings = {
+        'morning_color': '#FEF3C7',  # Mac dinh yellow
+        'afternoon_color': '#FED7AA',  # Mac dinh orange
+        'evening_color': '#C7D2FE',  # Mac dinh indigo
+        'morning_start': '07:00',
+        'morning_end': '12:00',
+        'afternoon_start': '12:00',
+        'afternoon_end': '18:00',
+        'evening_start': '18:00',
+        'evening_end': '22:00',
+    }
+
+    # Load tu SystemConfig
+    for config in SystemConfig.query.filter(SystemConfig.key.like('shift_%')).all():
+        key = config.key.replace('shift_', '')
+        settings[key] = config.value
+
+    return settings
+
+
+def get_dynamic_shift_times():
+    """
+    Lay thoi gian ca tu SystemConfig (tra ve datetime.time objects)
+
+    Bo giai (solver_rules), luu lich nhap (save_assignments) va validator deu dung
+    ham nay -> cung do dai ca / khoang nghi.
+    """
+    settings = get_shift_settings()
+
+    def parse_time(time_str):
+        try:
+            parts = time_str.split(':')
+            return time(int(parts[0]), int(parts[1]))
+        except:
+            return None
+
+    return {
+        ShiftType.MORNING: (
+            parse_time(settings['morning_start']) or time(7, 0),
+            parse_time(settings['morning_end']) or time(12, 0)
+        ),
+        ShiftType.AFTERNOON: (
+            parse_time(settings['afternoon_start']) or time(12, 0),
+            parse_time(settings['afternoon_end']) or time(18, 0)
+        ),
+        ShiftType.EVENING: (
+            parse_time(settings['evening_start']) or time(18, 0),
+            parse_time(settings['evening_end']) or time(22, 0)
+        ),
+    }
+
+
+def build_solver_requests(schedules):
+    """
+    Chuyen lich dang ky thanh dau vao cho bo giai
+
+    Args:
+        schedules: List WorkSchedule (theo thu tu gui dang ky)
+
+    Returns:
+        list: [{'user_id', 'days': {day: ([shift_index], is_and)}}]
+    """
+    requests = []
+    for schedule in schedules:
+        # Chi lay shifts NV dang ky (shift_source='employee' hoac None)
+        employee_shifts = [s for s in schedule.shifts if s.shift_source in ('employee', None)]
+        if not employee_shifts:
+            # Co the NV chua dang ky shift nao, lay tat ca shifts
+            employee_shifts = schedule.shifts
+
+        days = {}
+        for shift in employee_shifts:
+            day = (shift.date - schedule.week_start_date).days
+            if not 0 <= day < 7:
+                continue
+            shifts, is_and = days.get(day, ([], False))
+            shifts.append(SHIFT_ORDER.index(shift.shift_type))
+            days[day] = (shifts, is_and or bool(shift.is_and_condition))
+
+        requests.append({'user_id': schedule.user_id, 'days': days})
+    return requests
+
 
-def auto_generate_schedule(week_start_date, staff_per_shift=2, selected_staff_ids=None, create_draft=True):
+def get_shift_weights(week_start_date):
+    """Trong so 21 ca theo gio dong cua tuan truoc (du lieu iPOS)"""
+    weights = [1.0] * SLOTS
+    for weekday, shift_type in get_peak_hours(week_start_date - timedelta(days=7)):
+        weights[weekday * 3 + SHIFT_ORDER.index(shift_type)] = PEAK_WEIGHT
+    return weights
+
+
+def get_week_demand(week_start_date, staff_per_shift):
+    """So NV can cho 21 ca: co dinh staff_per_shift, hoac theo du bao neu la None"""
+    if staff_per_shift is None:
+        return get_staffing_demand(week_start_date)
+    return [staff_per_shift] * SLOTS
+
+
+def auto_generate_schedule(week_start_date, staff_per_shift=2, selected_staff_ids=None, create_draft=True,
+                           max_shifts=None, backend=None):
     """
     Xep lich tu dong cho 1 tuan - VERSION MOI VOI DRAFT
 
     Args:
         week_start_date: Ngay dau tuan (Monday)
-        staff_per_shift: So nhan vien moi ca (2, 3, hoac 4)
+        staff_per_shift: So nhan vien moi ca (2, 3, hoac 4; None = theo du bao luong khach)
         selected_staff_ids: Chi xep cho cac NV nay (None = tat ca)
         create_draft: True = tao lich nhap, False = luu truc tiep
+        max_shifts: So ca toi da moi NV/tuan (None = AUTO_SCHEDULE_MAX_SHIFTS)
+        backend: Bo giai 'auto', 'flow', 'ortools', 'greedy' (None = AUTO_SCHEDULE_SOLVER)
 
     Returns:
         dict: Ket qua xep lich
@@ -50,107 +167,40 @@ def auto_generate_schedule(week_start_date, staff_per_shift=2, selected_staff_id
     submitted_schedules = WorkSchedule.query.filter(
         WorkSchedule.week_start_date == week_start_date,
         WorkSchedule.status.in_([ScheduleStatus.SUBMITTED, ScheduleStatus.APPROVED])
-    ).order_by(WorkSchedule.submitted_at).all()
+    ).options(selectinload(WorkSchedule.shifts)).order_by(WorkSchedule.submitted_at).all()
 
     # Loc theo selected_staff_ids neu co
     if selected_staff_ids:
         submitted_schedules = [s for s in submitted_schedules if s.user_id in selected_staff_ids]
 
-    # 3. KHOI TAO LICH TRONG (7 ngay x 3 ca)
-    week_schedule = {}
-    for day_offset in range(7):
-        date = week_start_date + timedelta(days=day_offset)
-        week_schedule[date] = {
-            ShiftType.MORNING: [],
-            ShiftType.AFTERNOON: [],
-            ShiftType.EVENING: []
-        }
-
-    # 4. THEO DOI SO CA CUA MOI NV
-    shift_count = defaultdict(int)
-    days_worked = defaultdict(set)
-
-    # 5. XEP THEO NGUYEN VONG CUA NV DA DANG KY
-    # Chi xep vao ca NV da dang ky, TON TRONG nguyen vong
-    for schedule in submitted_schedules:
-        user = schedule.user
-
-        # Lay shifts ma NV da dang ky (chi lay shift_source='employee' hoac None)
-        employee_shifts = [s for s in schedule.shifts
-                          if s.shift_source in ('employee', None) or s.shift_source == 'employee']
-
-        # Neu khong co shift nao, skip
-        if not employee_shifts:
-            # Co the NV chua dang ky shift nao, lay tat ca shifts
-            employee_shifts = schedule.shifts
-
-        for shift in employee_shifts:
-            date = shift.date
-            shift_type = shift.shift_type
-
-            if date not in week_schedule:
-                continue
-
-            # Kiem tra ca con cho khong
-            if len(week_schedule[date][shift_type]) < staff_per_shift:
-                # Kiem tra user chua co trong ca nay
-                if user not in week_schedule[date][shift_type]:
-                    # Kiem tra nguoi nay chua lam qua nhieu ca
-                    if shift_count[user.id] < 18:  # Toi da 18 ca/tuan
-                        week_schedule[date][shift_type].append(user)
-                        shift_count[user.id] += 1
-                        days_worked[user.id].add(date)
-
-    # 6. LUU VAO DATABASE
-    results = []
-
-    for date, shifts in week_schedule.items():
-        for shift_type, staff_list in shifts.items():
-            for user in staff_list:
-                # Tim WorkSchedule cua user
-                ws = WorkSchedule.query.filter_by(
-                    user_id=user.id,
-                    week_start_date=week_start_date
-                ).first()
-
-                if not ws:
-                    ws = WorkSchedule(
-                        user_id=user.id,
-                        week_start_date=week_start_date,
-                        week_end_date=week_end_date,
-                        status=ScheduleStatus.SUBMITTED,
-                        submitted_at=datetime.now()
-                    )
-                    db.session.add(ws)
-                    db.session.flush()
-
-                # Kiem tra shift da ton tai chua (chi kiem tra system draft)
-                shift_start, shift_end = SHIFT_TIMES[shift_type]
-
-                existing_draft = ScheduleShift.query.filter_by(
-                    schedule_id=ws.id,
-                    date=date,
-                    shift_type=shift_type,
-                    shift_source='system',
-                    draft_status='draft'
-                ).first()
-
-                if not existing_draft:
-                    # Tao shift moi
-                    new_shift = ScheduleShift(
-                        schedule_id=ws.id,
-                        date=date,
-                        shift_type=shift_type,
-                        shift_start_time=shift_start,
-                        shift_end_time=shift_end,
-                        is_preferred=True,
-                        is_confirmed=not create_draft,  # True neu luu truc tiep
-                        is_and_condition=False,
-                        shift_source='system',
-                        draft_status='draft' if create_draft else 'final'
-                    )
-                    db.session.add(new_shift)
-                    results.append(new_shift)
+    # 3. GIAI BAI TOAN XEP CA (phu song theo gio dong + can bang so ca)
+    if max_shifts is None:
+        max_shifts = current_app.config.get('AUTO_SCHEDULE_MAX_SHIFTS', DEFAULT_MAX_SHIFTS)
+    if backend is None:
+        backend = current_app.config.get('AUTO_SCHEDULE_SOLVER', 'auto')
+
+    from app.schedule.validator import solver_rules
+
+    shift_times = get_dynamic_shift_times()
+    demand = get_week_demand(week_start_date, staff_per_shift)
+    solution = solve_schedule(
+        build_solver_requests(submitted_schedules),
+        demand=demand,
+        weights=get_shift_weights(week_start_date),
+        max_shifts=max_shifts,
+        backend=backend,
+        rules=solver_rules(shift_times)
+    )
+
+    # 4. CHUYEN KET QUA THANH DANH SACH CA (user_id, ngay, loai ca)
+    assignments = [
+        (user_id, week_start_date + timedelta(days=day), SHIFT_ORDER[shift_index])
+        for user_id, slots in solution['assignments'].items()
+        for day, shift_index in slots
+    ]
+
+    # 5. LUU VAO DATABASE (bulk: prefetch + INSERT nhieu dong)
+    total_shifts = save_assignments(week_start_date, assignments, shift_times, create_draft=create_draft)
 
     db.session.commit()
 
@@ -158,8 +208,11 @@ def auto_generate_schedule(week_start_date, staff_per_shift=2, selected_staff_id
         'success': True,
         'week_start': week_start_date,
         'week_end': week_end_date,
-        'total_shifts': len(results),
-        'total_employees': len(set(shift_count.keys()))
+        'total_shifts': total_shifts,
+        'total_employees': len(solution['assignments']),
+        'backend': solution['backend'],
+        'solve_time': round(solution['solve_time'], 3),
+        'warnings': check_schedule_constraints(week_start_date, solution['filled'], demand)
     }
 
 
@@ -167,32 +220,40 @@ def get_peak_hours(week_start_date):
     """Lay cac gio dong tu du lieu iPOS tuan truoc"""
     week_end_date = week_start_date + timedelta(days=6)
 
-    peak_data = CustomerTraffic.query.filter(
+    peak_data = db.session.query(CustomerTraffic.date, CustomerTraffic.hour).filter(
         CustomerTraffic.date >= week_start_date,
         CustomerTraffic.date <= week_end_date,
         CustomerTraffic.is_peak_hour == True
     ).all()
 
     peak_shifts = set()
-    for p in peak_data:
-        hour = int(p.hour_segment.split('h')[0])
+    for peak_date, hour in peak_data:
+        if hour is None:
+            continue
         if 7 <= hour < 12:
-            peak_shifts.add((p.date.weekday(), ShiftType.MORNING))
+            peak_shifts.add((peak_date.weekday(), ShiftType.MORNING))
         elif 12 <= hour < 18:
-            peak_shifts.add((p.date.weekday(), ShiftType.AFTERNOON))
+            peak_shifts.add((peak_date.weekday(), ShiftType.AFTERNOON))
         elif 18 <= hour < 22:
-            peak_shifts.add((p.date.weekday(), ShiftType.EVENING))
+            peak_shifts.add((peak_date.weekday(), ShiftType.EVENING))
 
     return peak_shifts
 
 
-def check_schedule_constraints(week_schedule):
-    """Kiem tra cac rang buoc"""
+def check_schedule_constraints(week_start_date, coverage, staff_per_shift=2):
+    """
+    Kiem tra so NV moi ca
+
+    Args:
+        coverage: List 21 so NV da xep (index = ngay * 3 + ca)
+        staff_per_shift: So NV can moi ca hoac list 21 ca
+    """
     errors = []
 
-    for date, shifts in week_schedule.items():
-        for shift_type, staff_list in shifts.items():
-            if len(staff_list) < 2:
-                errors.append(f'{date} - {shift_type.value}: Chi co {len(staff_list)} nguoi (can 2)')
+    for slot, count in enumerate(coverage):
+        required = staff_per_shift[slot] if isinstance(staff_per_shift, list) else staff_per_shift
+        if count < required:
+            date = week_start_date + timedelta(days=slot // 3)
+            errors.append(f'{date} - {SHIFT_ORDER[slot % 3].value}: Chi co {count} nguoi (can {required})')
 
     return errors
@@ -0,0 +1,206 @@
+"""
+Xep lich hang loat: nhieu tuan x nhieu cua hang
+
+Moi cap (cua hang, tuan) la 1 bai toan doc lap (NV thuoc 1 cua hang qua
+User.store_id). Du lieu dang ky duoc doc 1 lan cho ca khoang tuan, cac bai
+toan duoc giai song song tren process pool (bo giai thuan Python, khong dung
+DB), sau do toan bo lich nhap duoc ghi trong 1 transaction.
+
+Process pool dung context 'spawn': fork tu worker gunicorn nhieu thread (ket noi
+DB trong pool, lock dang giu) khong an toan. Job nen (scheduler) giai ngay trong
+process (workers=1).
+
+Du bao luong khach (CustomerTraffic) la cua ca chuoi, chua tach theo cua hang:
+che do 'forecast' chia nhu cau cho tung cua hang theo ti le NV active cua cua hang
+do. Mac dinh xep co dinh AUTO_SCHEDULE_STAFF_PER_SHIFT NV/ca.
+"""
+
+import math
+import multiprocessing
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from flask import current_app
+from sqlalchemy import func
+from sqlalchemy.orm import selectinload
+from app.models import User, UserRole, WorkSchedule, ScheduleShift, ScheduleStatus, db
+from app.schedule.solver import solve_schedule, SLOTS
+from app.schedule.auto_scheduler import (
+    SHIFT_ORDER, build_solver_requests, get_shift_weights, get_week_demand, get_dynamic_shift_times
+)
+from app.schedule.persistence import save_assignments
+from app.schedule.validator import solver_rules
+
+
+def week_range(start_week, weeks):
+    """Danh sach ngay dau tuan (Monday) lien tiep"""
+    start_week = start_week - timedelta(days=start_week.weekday())
+    return [start_week + timedelta(weeks=i) for i in range(weeks)]
+
+
+def _load_problems(week_starts, store_ids, selected_staff_ids):
+    """Doc lich dang ky cua ca khoang tuan (2 query) va chia theo (cua hang, tuan)"""
+    query = db.session.query(WorkSchedule, User.store_id)\
+        .join(User, WorkSchedule.user_id == User.id)\
+        .options(selectinload(WorkSchedule.shifts))\
+        .filter(
+            WorkSchedule.week_start_date.in_(week_starts),
+            WorkSchedule.status.in_([ScheduleStatus.SUBMITTED, ScheduleStatus.APPROVED])
+        )
+    if store_ids is not None:
+        query = query.filter(User.store_id.in_(store_ids))
+    if selected_staff_ids:
+        query = query.filter(WorkSchedule.user_id.in_(selected_staff_ids))
+
+    grouped = defaultdict(list)
+    for schedule, store_id in query.order_by(WorkSchedule.submitted_at).all():
+        grouped[(store_id, schedule.week_start_date)].append(schedule)
+
+    # Cua hang duoc chi dinh nhung chua co ai dang ky van co trong bao cao
+    for store_id in (store_ids or []):
+        for week_start in week_starts:
+            grouped.setdefault((store_id, week_start), [])
+
+    return grouped
+
+
+def _delete_old_drafts(week_starts, store_ids, selected_staff_ids):
+    """Xoa lich nhap cu cua cac NV thuoc pham vi xep (khong dung lich NV dang ky)"""
+    schedule_ids = db.session.query(WorkSchedule.id)\
+        .join(User, WorkSchedule.user_id == User.id)\
+        .filter(WorkSchedule.week_start_date.in_(week_starts))
+    if store_ids is not None:
+        schedule_ids = schedule_ids.filter(User.store_id.in_(store_ids))
+    if selected_staff_ids:
+        schedule_ids = schedule_ids.filter(WorkSchedule.user_id.in_(selected_staff_ids))
+
+    return ScheduleShift.query.filter(
+        ScheduleShift.schedule_id.in_(schedule_ids.scalar_subquery()),
+        ScheduleShift.shift_source == 'system',
+        ScheduleShift.draft_status == 'draft'
+    ).delete(synchronize_session=False)
+
+
+def _store_shares(store_ids):
+    """Ti le NV active cua tung cua hang tren ca chuoi (1 query)"""
+    counts = dict(db.session.query(User.store_id, func.count(User.id))
+                  .filter(User.status == 'active', User.role != UserRole.ADMIN).group_by(User.store_id))
+    total = sum(counts.values())
+    return {store_id: (counts.get(store_id, 0) / total if total else 0) for store_id in store_ids}
+
+
+def _scale_demand(demand, share):
+    """Nhu cau cua ca chuoi -> cua 1 cua hang (lam tron len, ca co nhu cau can it nhat 1 NV)"""
+    return [max(math.ceil(count * share), 1) if count > 0 else 0 for count in demand]
+
+
+def _solve_all(problems, workers):
+    """Giai cac bai toan, song song neu co nhieu hon 1; loi pool -> chay tuan tu"""
+    keys = list(problems.keys())
+    if workers > 1 and len(keys) > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=min(workers, len(keys)),
+                                     mp_context=multiprocessing.get_context('spawn')) as pool:
+                futures = [pool.submit(solve_schedule, **problems[key]) for key in keys]
+                return dict(zip(keys, [f.result() for f in futures]))
+        except (BrokenProcessPool, OSError) as e:
+            current_app.logger.warning(f'Process pool unavailable, solving sequentially: {str(e)}')
+    return {key: solve_schedule(**problems[key]) for key in keys}
+
+
+def generate_schedules_batch(week_starts, store_ids=None, staff_per_shift=None, selected_staff_ids=None,
+                             max_shifts=None, backend=None, workers=None, create_draft=True):
+    """
+    Xep lich cho nhieu tuan va nhieu cua hang
+
+    Args:
+        week_starts: List ngay dau tuan (Monday)
+        store_ids: List id cua hang (None = tat ca, ke ca NV chua gan cua hang)
+        staff_per_shift: So NV moi ca (None = AUTO_SCHEDULE_STAFF_PER_SHIFT,
+                         'forecast' = du bao luong khach chia theo ti le NV cua hang)
+        selected_staff_ids: Chi xep cho cac NV nay (None = tat ca)
+        max_shifts: So ca toi da moi NV/tuan (None = AUTO_SCHEDULE_MAX_SHIFTS)
+        backend: Bo giai (None = AUTO_SCHEDULE_SOLVER)
+        workers: So process giai song song (None = AUTO_SCHEDULE_WORKERS)
+        create_draft: True = tao lich nhap, False = luu truc tiep
+
+    Returns:
+        dict: {'success', 'problems': [{'store_id', 'week_start', 'staff', 'total_shifts',
+               'backend', 'solve_time', 'warnings'}], 'total_shifts', 'elapsed'}
+    """
+    started = time.perf_counter()
+    config = current_app.config
+    if max_shifts is None:
+        max_shifts = config.get('AUTO_SCHEDULE_MAX_SHIFTS', 18)
+    if backend is None:
+        backend = config.get('AUTO_SCHEDULE_SOLVER', 'auto')
+    if workers is None:
+        workers = config.get('AUTO_SCHEDULE_WORKERS') or os.cpu_count() or 1
+    use_forecast = staff_per_shift == 'forecast'
+    if staff_per_shift is None:
+        staff_per_shift = config.get('AUTO_SCHEDULE_STAFF_PER_SHIFT', 2)
+
+    week_starts = sorted(set(week_starts))
+    grouped = _load_problems(week_starts, store_ids, selected_staff_ids)
+    weights = {week_start: get_shift_weights(week_start) for week_start in week_starts}
+    demands = {week_start: get_week_demand(week_start, None if use_forecast else staff_per_shift)
+               for week_start in week_starts}
+    shares = _store_shares({store_id for store_id, _ in grouped}) if use_forecast else None
+    shift_times = get_dynamic_shift_times()
+    rules = solver_rules(shift_times)
+
+    problems = {key: {
+        'requests': build_solver_requests(schedules),
+        'demand': _scale_demand(demands[key[1]], shares[key[0]]) if use_forecast else demands[key[1]],
+        'weights': weights[key[1]],
+        'max_shifts': max_shifts,
+        'backend': backend,
+        'rules': rules
+    } for key, schedules in grouped.items()}
+
+    solutions = _solve_all(problems, workers)
+
+    # Ghi tat ca lich nhap trong 1 transaction
+    report = []
+    try:
+        if create_draft:
+            _delete_old_drafts(week_starts, store_ids, selected_staff_ids)
+
+        for (store_id, week_start), solution in sorted(
+                solutions.items(), key=lambda item: (item[0][1], item[0][0] is None, item[0][0] or 0)):
+            assignments = [
+                (user_id, week_start + timedelta(days=day), SHIFT_ORDER[shift_index])
+                for user_id, slots in solution['assignments'].items()
+                for day, shift_index in slots
+            ]
+            total = save_assignments(week_start, assignments, shift_times, create_draft=create_draft,
+                                     store_id=store_id)
+            demand = problems[(store_id, week_start)]['demand']
+            report.append({
+                'store_id': store_id,
+                'week_start': week_start,
+                'staff': len(problems[(store_id, week_start)]['requests']),
+                'total_shifts': total,
+                'backend': solution['backend'],
+                'solve_time': round(solution['solve_time'], 3),
+                'warnings': [
+                    f'{week_start + timedelta(days=day)} - {SHIFT_ORDER[shift].value}: '
+                    f'Con thieu {missing} nguoi (can {demand[day * 3 + shift]})'
+                    for day, shift, missing in solution['unfilled']
+                ]
+            })
+
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return {
+        'success': True,
+        'problems': report,
+        'total_shifts': sum(item['total_shifts'] for item in report),
+        'elapsed': round(time.perf_counter() - started, 3)
+    }
@@ -0,0 +1,188 @@
+"""
+Du bao nhu cau nhan su tu du lieu luong khach iPOS (CustomerTraffic)
+
+- Gom bill_count lich su thanh mang [tuan, thu, gio] (NumPy)
+- Thong ke truot theo tuan (trung binh, do lech chuan) cho tung thu x gio
+- Du bao bill gio cao diem moi ca = trung binh + z * do lech chuan
+- So NV can = ceil(bill gio cao diem / so bill 1 NV xu ly duoc trong 1 gio)
+
+Ket qua (ma tran 7 ngay x 3 ca) duoc tinh truoc hang dem, luu bang
+staffing_forecasts va cache trong bo nho, nen xep lich khong phai quet lai
+lich su luong khach.
+"""
+
+import json
+from datetime import datetime, timedelta
+import numpy as np
+from flask import current_app
+from app.cache import TTLCache
+from app.models import CustomerTraffic, StaffingForecast, db
+
+
+# Khung gio cac ca (theo thu tu ca cua bo giai: sang, chieu, toi)
+SHIFT_HOURS = [(7, 12), (12, 18), (18, 22)]
+
+DEFAULT_STAFF_PER_SHIFT = 2
+HISTORY_WEEKS = 8
+ROLLING_WINDOW = 4
+SERVICE_Z = 1.0  # Du phong: trung binh + 1 do lech chuan
+BILLS_PER_STAFF = 20  # So bill 1 NV xu ly duoc trong 1 gio
+
+_forecast_cache = TTLCache(ttl=3600, maxsize=64)
+
+
+def load_traffic_matrix(week_start_date, weeks=HISTORY_WEEKS):
+    """
+    Doc lich su luong khach cac tuan truoc week_start_date (1 query)
+
+    Returns:
+        ndarray: [weeks, 7, 24] tong bill_count, NaN = khong co du lieu
+    """
+    history_start = week_start_date - timedelta(weeks=weeks)
+    rows = db.session.query(
+        CustomerTraffic.date, CustomerTraffic.hour, CustomerTraffic.bill_count
+    ).filter(
+        CustomerTraffic.date >= history_start,
+        CustomerTraffic.date < week_start_date,
+        CustomerTraffic.hour.isnot(None)
+    ).all()
+
+    totals = np.zeros((weeks, 7, 24))
+    counts = np.zeros((weeks, 7, 24), dtype=np.int64)
+    if rows:
+        offsets = np.array([(row.date - history_start).days for row in rows])
+        hours = np.array([row.hour for row in rows])
+        bills = np.array([row.bill_count or 0 for row in rows], dtype=float)
+        index = (offsets // 7, offsets % 7, hours)
+        np.add.at(totals, index, bills)
+        np.add.at(counts, index, 1)
+
+    return np.where(counts > 0, totals, np.nan)
+
+
+def rolling_stats(matrix, window=ROLLING_WINDOW):
+    """
+    Trung binh va do lech chuan truot theo tuan (bo qua NaN)
+
+    Args:
+        matrix: [weeks, ...]
+
+    Returns:
+        tuple: (mean, std) dang [weeks - window + 1, ...]
+    """
+    window = max(1, min(window, matrix.shape[0]))
+    valid = ~np.isnan(matrix)
+    values = np.where(valid, matrix, 0.0)
+
+    zeros = np.zeros((1,) + matrix.shape[1:])
+    csum = np.concatenate([zeros, np.cumsum(values, axis=0)])
+    csum_sq = np.concatenate([zeros, np.cumsum(values ** 2, axis=0)])
+    ccount = np.concatenate([zeros, np.cumsum(valid, axis=0)])
+
+    total = csum[window:] - csum[:-window]
+    total_sq = csum_sq[window:] - csum_sq[:-window]
+    count = ccount[window:] - ccount[:-window]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = total / count
+        variance = np.maximum(total_sq / count - mean ** 2, 0.0)
+    return mean, np.sqrt(variance)
+
+
+def headcount_from_bills(hourly, bills_per_staff, min_staff, max_staff):
+    """
+    Chuyen du bao bill theo gio [7, 24] thanh so NV can [7, 3]
+
+    Ca khong co du lieu -> DEFAULT_STAFF_PER_SHIFT (gioi han trong [min, max])
+    """
+    peaks = np.stack([
+        np.max(np.where(np.isnan(hourly[:, start:end]), -np.inf, hourly[:, start:end]), axis=1)
+        for start, end in SHIFT_HOURS
+    ], axis=1)
+    missing = ~np.isfinite(peaks)
+    staff = np.ceil(np.where(missing, 0, peaks) / bills_per_staff)
+    staff = np.where(missing, DEFAULT_STAFF_PER_SHIFT, staff)
+    return np.clip(staff, min_staff, max_staff).astype(int), np.where(missing, 0, peaks)
+
+
+def compute_forecast(week_start_date):
+    """
+    Du bao so NV can cho tuan week_start_date
+
+    Returns:
+        dict: {'headcount': 7x3, 'expected_bills': 7x3, 'history_weeks': int}
+    """
+    config = current_app.config
+    weeks = config.get('FORECAST_HISTORY_WEEKS', HISTORY_WEEKS)
+    matrix = load_traffic_matrix(week_start_date, weeks)
+
+    mean, std = rolling_stats(matrix, config.get('FORECAST_ROLLING_WINDOW', ROLLING_WINDOW))
+    hourly = mean[-1] + config.get('FORECAST_SERVICE_Z', SERVICE_Z) * std[-1]
+
+    headcount, bills = headcount_from_bills(
+        hourly,
+        config.get('FORECAST_BILLS_PER_STAFF', BILLS_PER_STAFF),
+        config.get('FORECAST_MIN_STAFF', 1),
+        config.get('FORECAST_MAX_STAFF', 10)
+    )
+
+    return {
+        'headcount': headcount.tolist(),
+        'expected_bills': np.round(bills, 1).tolist(),
+        'history_weeks': int((~np.isnan(matrix)).any(axis=(1, 2)).sum())
+    }
+
+
+def _store_forecast(week_start_date, forecast):
+    row = StaffingForecast.query.filter_by(week_start_date=week_start_date).first()
+    if row is None:
+        row = StaffingForecast(week_start_date=week_start_date)
+        db.session.add(row)
+    row.headcount = json.dumps(forecast['headcount'])
+    row.expected_bills = json.dumps(forecast['expected_bills'])
+    row.history_weeks = forecast['history_weeks']
+    row.computed_at = datetime.utcnow()
+    return row
+
+
+def refresh_forecasts(week_starts):
+    """Tinh lai va luu du bao cho cac tuan (goi tu job hang dem)"""
+    for week_start in week_starts:
+        _store_forecast(week_start, compute_forecast(week_start))
+    db.session.commit()
+    _forecast_cache.clear()
+    return len(week_starts)
+
+
+def invalidate_forecasts(since_date):
+    """Xoa du bao cac tuan sau since_date (lich su luong khach vua thay doi)"""
+    deleted = StaffingForecast.query.filter(
+        StaffingForecast.week_start_date > since_date
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    _forecast_cache.clear()
+    return deleted
+
+
+def get_staffing_demand(week_start_date):
+    """
+    So NV can cho 21 ca cua tuan (index = ngay * 3 + ca) cho bo giai
+
+    Doc tu cache / bang staffing_forecasts; chua co thi tinh va luu lai.
+    """
+    def load():
+        row = StaffingForecast.query.filter_by(week_start_date=week_start_date).first()
+        if row is not None:
+            headcount = json.loads(row.headcount)
+        else:
+            forecast = compute_forecast(week_start_date)
+            headcount = forecast['headcount']
+            try:
+                _store_forecast(week_start_date, forecast)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                current_app.logger.warning(f'Could not store staffing forecast {week_start_date}: {str(e)}')
+        return [count for day in headcount for count in day]
+
+    return list(_forecast_cache.get_or_set(week_start_date, load))
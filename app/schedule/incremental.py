@@ -0,0 +1,275 @@
+"""
+Xep lai lich nhap tung phan khi quan ly sua 1 ca (them / xoa / doi NV)
+
+Trang thai bo giai cua tuan (nguyen vong, ma tran ca dang xep, so ca moi NV)
+duoc cache theo tuan. Moi thay doi chi giai lai cac ca cua ngay bi anh huong:
+- Ca quan ly vua them: khoa, khong bi bo giai go ra
+- Ca quan ly vua xoa: chan, bo giai khong xep lai NV do vao ca do
+- So ca o cac ngay khac tinh vao can bang (base_counts) va rang buoc nghi giua
+  ca / gio toi da (base_slots); ca dang xep duoc uu tien giu nguyen (keep)
+  -> chi tra ve thay doi nho nhat
+
+Cache duoc doi chieu voi DB bang (so ca nhap, tong id) truoc khi dung; lech
+(vd worker khac da sua) thi doc lai tu DB. Khoa / chan chi nho trong cache.
+"""
+
+import threading
+import time
+from datetime import timedelta
+from flask import current_app
+from sqlalchemy import func
+from sqlalchemy.orm import selectinload
+from app.cache import TTLCache
+from app.models import WorkSchedule, ScheduleShift, ScheduleStatus, db
+from app.schedule.solver import solve_schedule, SHIFTS, SLOTS, DEFAULT_MAX_SHIFTS
+from app.schedule.auto_scheduler import (
+    SHIFT_ORDER, build_solver_requests, get_shift_weights, get_week_demand, get_dynamic_shift_times
+)
+from app.schedule.persistence import save_assignments
+from app.schedule.validator import solver_rules
+
+
+_state_cache = TTLCache(ttl=1800, maxsize=16)
+_state_lock = threading.Lock()
+
+
+def _week_drafts(week_start_date):
+    week_end_date = week_start_date + timedelta(days=6)
+    return (
+        ScheduleShift.date >= week_start_date,
+        ScheduleShift.date <= week_end_date,
+        ScheduleShift.shift_source == 'system',
+        ScheduleShift.draft_status == 'draft'
+    )
+
+
+def _fingerprint(week_start_date):
+    """(so ca nhap, tong id) cua tuan - 1 query"""
+    count, id_sum = db.session.query(
+        func.count(ScheduleShift.id), func.coalesce(func.sum(ScheduleShift.id), 0)
+    ).filter(*_week_drafts(week_start_date)).one()
+    return count, id_sum
+
+
+def _slot(week_start_date, date, shift_type):
+    return (date - week_start_date).days * SHIFTS + SHIFT_ORDER.index(shift_type)
+
+
+def _load_drafts(week_start_date, days=None):
+    """{user_id: {slot: shift_id}} cac ca nhap (loc theo ngay neu co)"""
+    query = db.session.query(
+        ScheduleShift.id, WorkSchedule.user_id, ScheduleShift.date, ScheduleShift.shift_type
+    ).join(WorkSchedule, ScheduleShift.schedule_id == WorkSchedule.id)\
+        .filter(*_week_drafts(week_start_date))
+    if days is not None:
+        query = query.filter(ScheduleShift.date.in_(
+            [week_start_date + timedelta(days=day) for day in days]
+        ))
+
+    drafts = {}
+    for shift_id, user_id, date, shift_type in query.all():
+        drafts.setdefault(user_id, {})[_slot(week_start_date, date, shift_type)] = shift_id
+    return drafts
+
+
+def build_week_state(week_start_date, staff_per_shift=2, selected_staff_ids=None, shift_times=None):
+    """Doc nguyen vong + lich nhap cua tuan tu DB (4 query)"""
+    if shift_times is None:
+        shift_times = get_dynamic_shift_times()
+    schedules = WorkSchedule.query.filter(
+        WorkSchedule.week_start_date == week_start_date,
+        WorkSchedule.status.in_([ScheduleStatus.SUBMITTED, ScheduleStatus.APPROVED])
+    ).options(selectinload(WorkSchedule.shifts)).order_by(WorkSchedule.submitted_at).all()
+    if selected_staff_ids:
+        schedules = [s for s in schedules if s.user_id in selected_staff_ids]
+    requests = build_solver_requests(schedules)
+
+    return {
+        'week_start': week_start_date,
+        'staff_per_shift': staff_per_shift,
+        'selected_staff_ids': selected_staff_ids,
+        'requests': requests,
+        'positions': {request['user_id']: pos for pos, request in enumerate(requests)},
+        'demand': get_week_demand(week_start_date, staff_per_shift),
+        'weights': get_shift_weights(week_start_date),
+        'max_shifts': current_app.config.get('AUTO_SCHEDULE_MAX_SHIFTS', DEFAULT_MAX_SHIFTS),
+        'shift_times': shift_times,
+        'rules': solver_rules(shift_times),
+        'drafts': _load_drafts(week_start_date),
+        'locked': set(),   # (user_id, slot) quan ly them
+        'blocked': set(),  # (user_id, slot) quan ly xoa
+        'fingerprint': _fingerprint(week_start_date)
+    }
+
+
+def invalidate_week_state(week_start_date):
+    """Xoa trang thai cache (sau khi xep lai ca tuan / luu / huy lich nhap)"""
+    _state_cache.delete(week_start_date)
+
+
+def _apply_change(state, change):
+    """Cap nhat ma tran ca va fingerprint theo 1 thay doi da ghi vao DB"""
+    action, user_id, slot, shift_id = change
+    drafts = state['drafts'].setdefault(user_id, {})
+    count, id_sum = state['fingerprint']
+    if action == 'add':
+        drafts[slot] = shift_id
+        state['fingerprint'] = (count + 1, id_sum + shift_id)
+    else:
+        drafts.pop(slot, None)
+        state['fingerprint'] = (count - 1, id_sum - shift_id)
+
+
+def _mark_change(state, change):
+    action, user_id, slot, _ = change
+    if action == 'add':
+        state['locked'].add((user_id, slot))
+        state['blocked'].discard((user_id, slot))
+    else:
+        state['blocked'].add((user_id, slot))
+        state['locked'].discard((user_id, slot))
+
+
+def _solve_day(state, day):
+    """
+    Giai lai 3 ca cua 1 ngay, giu nguyen cac ngay khac
+
+    Returns:
+        tuple: (added [(user_id, slot)], removed [(user_id, slot)], solve_time)
+    """
+    day_slots = set(range(day * SHIFTS, (day + 1) * SHIFTS))
+    drafts, locked, blocked = state['drafts'], state['locked'], state['blocked']
+
+    # NV co dinh trong ngay: NV khong dang ky (them tay) va NV co ca bi khoa.
+    # Moi ca trong ngay cua ho giu nguyen (khong giai lai, khong bi go ra)
+    demand = [0] * SLOTS
+    for s in day_slots:
+        demand[s] = state['demand'][s]
+    fixed_users = {
+        user_id for user_id, slots in drafts.items()
+        if any(user_id not in state['positions'] or (user_id, s) in locked for s in day_slots & slots.keys())
+    }
+    for user_id in fixed_users:
+        for s in day_slots & drafts[user_id].keys():
+            demand[s] = max(demand[s] - 1, 0)
+
+    requests, base_counts, base_slots, keep = [], [], [], set()
+    for pos, request in enumerate(state['requests']):
+        user_id = request['user_id']
+        slots = drafts.get(user_id, {})
+        base_slots.append({s for s in slots if s not in day_slots})
+        base_counts.append(len(base_slots[-1]))
+        if user_id not in fixed_users:
+            keep.update((pos, s) for s in slots if s in day_slots)
+
+        days = {}
+        if day in request['days'] and user_id not in fixed_users:
+            shifts, is_and = request['days'][day]
+            shifts = [sh for sh in shifts if (user_id, day * SHIFTS + sh) not in blocked]
+            if shifts:
+                days[day] = (shifts, is_and)
+        requests.append({'user_id': user_id, 'days': days})
+
+    solution = solve_schedule(
+        requests, demand, weights=state['weights'], max_shifts=state['max_shifts'],
+        backend='flow', base_counts=base_counts, keep=keep,
+        rules=state.get('rules'), base_slots=base_slots
+    )
+
+    new = {(user_id, d * SHIFTS + sh)
+           for user_id, slots in solution['assignments'].items() for d, sh in slots}
+    old = {(state['requests'][pos]['user_id'], s) for pos, s in keep}
+    return sorted(new - old), sorted(old - new), solution['solve_time']
+
+
+def rebalance_week(week_start_date, changes, staff_per_shift=2, selected_staff_ids=None):
+    """
+    Xep lai cac ngay bi anh huong sau khi quan ly sua lich nhap
+
+    Args:
+        week_start_date: Ngay dau tuan
+        changes: List (action 'add'/'remove', user_id, date, ShiftType, shift_id)
+                 da duoc ghi vao DB
+        staff_per_shift: So NV moi ca luc xep lich (None = theo du bao)
+        selected_staff_ids: NV duoc chon luc xep lich (None = tat ca)
+
+    Returns:
+        dict: {'added': [...], 'removed': [...], 'solve_time'} - moi phan tu
+              {'user_id', 'date', 'shift_type'}
+    """
+    started = time.perf_counter()
+    changes = [(action, user_id, _slot(week_start_date, date, shift_type), shift_id)
+               for action, user_id, date, shift_type, shift_id in changes]
+
+    # Admin doi gio ca -> rang buoc doi, tinh lai trang thai
+    shift_times = get_dynamic_shift_times()
+    with _state_lock:
+        state = _state_cache.get(week_start_date)
+        if state is not None and state['staff_per_shift'] == staff_per_shift \
+                and state['selected_staff_ids'] == selected_staff_ids \
+                and state['shift_times'] == shift_times:
+            for change in changes:
+                _apply_change(state, change)
+            if state['fingerprint'] != _fingerprint(week_start_date):
+                state = None
+        else:
+            state = None
+        if state is None:
+            state = build_week_state(week_start_date, staff_per_shift, selected_staff_ids, shift_times)
+        for change in changes:
+            _mark_change(state, change)
+
+        days = sorted({slot // SHIFTS for _, _, slot, _ in changes})
+        added, removed = [], []
+        for day in days:
+            day_added, day_removed, _ = _solve_day(state, day)
+            added.extend(day_added)
+            removed.extend(day_removed)
+
+        try:
+            _write_diff(state, days, added, removed)
+        except Exception:
+            db.session.rollback()
+            _state_cache.delete(week_start_date)
+            raise
+        _state_cache.set(week_start_date, state)
+
+    def describe(items):
+        return [{
+            'user_id': user_id,
+            'date': (week_start_date + timedelta(days=slot // SHIFTS)).isoformat(),
+            'shift_type': SHIFT_ORDER[slot % SHIFTS].value
+        } for user_id, slot in items]
+
+    return {
+        'added': describe(added),
+        'removed': describe(removed),
+        'solve_time': round(time.perf_counter() - started, 4)
+    }
+
+
+def _write_diff(state, days, added, removed):
+    """Ghi thay doi vao DB (xoa theo id, insert lo) va cap nhat cache"""
+    week_start_date = state['week_start']
+    if not added and not removed:
+        return
+
+    removed_ids = [state['drafts'][user_id].pop(slot) for user_id, slot in removed]
+    if removed_ids:
+        ScheduleShift.query.filter(ScheduleShift.id.in_(removed_ids))\
+            .delete(synchronize_session=False)
+
+    save_assignments(week_start_date, [
+        (user_id, week_start_date + timedelta(days=slot // SHIFTS), SHIFT_ORDER[slot % SHIFTS])
+        for user_id, slot in added
+    ], state['shift_times'])
+    db.session.commit()
+
+    # Doc lai id cac ca cua ngay vua giai lai
+    day_slots = {s for day in days for s in range(day * SHIFTS, (day + 1) * SHIFTS)}
+    for slots in state['drafts'].values():
+        for s in day_slots & slots.keys():
+            del slots[s]
+    for user_id, slots in _load_drafts(week_start_date, days).items():
+        state['drafts'].setdefault(user_id, {}).update(slots)
+    state['fingerprint'] = _fingerprint(week_start_date)
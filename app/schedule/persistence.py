@@ -0,0 +1,191 @@
+"""
+Luu ket qua xep lich tu dong vao database theo lo (bulk)
+
+- Doc truoc tat ca WorkSchedule va ca nhap cua tuan vao dict (2 query)
+- Tao WorkSchedule con thieu bang 1 cau INSERT ... RETURNING id
+- Ghi tat ca ca moi bang INSERT nhieu dong (chia lo CHUNK_SIZE dong)
+- Duyet / tra / huy duyet / day lich bang UPDATE theo tap (tuan hoac lich),
+  RETURNING cac dong da doi de ghi log - so cau lenh khong phu thuoc so NV
+
+Khong commit: nguoi goi quyet dinh transaction.
+"""
+
+from datetime import datetime, timedelta
+from sqlalchemy import insert, update, or_
+from app.models import WorkSchedule, ScheduleShift, ScheduleStatus, db
+
+
+# Gioi han so dong moi cau INSERT (tranh vuot gioi han tham so cua SQLite)
+CHUNK_SIZE = 500
+
+
+def _chunks(items, size=CHUNK_SIZE):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def get_week_schedule_ids(week_start_date, user_ids):
+    """Map user_id -> WorkSchedule.id cua tuan (1 query)"""
+    if not user_ids:
+        return {}
+    return dict(db.session.query(WorkSchedule.user_id, WorkSchedule.id).filter(
+        WorkSchedule.week_start_date == week_start_date,
+        WorkSchedule.user_id.in_(user_ids)
+    ).all())
+
+
+def create_missing_schedules(week_start_date, user_ids, schedule_ids, status=ScheduleStatus.SUBMITTED):
+    """
+    Tao WorkSchedule cho cac NV chua co lich tuan (1 cau INSERT)
+
+    Args:
+        schedule_ids: Map user_id -> schedule_id hien co (duoc cap nhat tai cho)
+    """
+    missing = [uid for uid in sorted(set(user_ids)) if uid not in schedule_ids]
+    if not missing:
+        return schedule_ids
+
+    now = datetime.now()
+    week_end_date = week_start_date + timedelta(days=6)
+    rows = [{
+        'user_id': uid,
+        'week_start_date': week_start_date,
+        'week_end_date': week_end_date,
+        'status': status,
+        'submitted_at': now
+    } for uid in missing]
+
+    if db.engine.dialect.insert_returning:
+        for chunk in _chunks(rows):
+            result = db.session.execute(
+                insert(WorkSchedule).values(chunk).returning(WorkSchedule.user_id, WorkSchedule.id)
+            )
+            schedule_ids.update(dict(result.all()))
+    else:
+        # CSDL khong ho tro RETURNING: insert roi doc lai id
+        for chunk in _chunks(rows):
+            db.session.execute(insert(WorkSchedule).values(chunk))
+        schedule_ids.update(get_week_schedule_ids(week_start_date, missing))
+
+    return schedule_ids
+
+
+def get_existing_draft_keys(week_start_date):
+    """Tap (schedule_id, date, shift_type) cac ca nhap he thong da co trong tuan"""
+    week_end_date = week_start_date + timedelta(days=6)
+    return set(db.session.query(
+        ScheduleShift.schedule_id, ScheduleShift.date, ScheduleShift.shift_type
+    ).filter(
+        ScheduleShift.date >= week_start_date,
+        ScheduleShift.date <= week_end_date,
+        ScheduleShift.shift_source == 'system',
+        ScheduleShift.draft_status == 'draft'
+    ).all())
+
+
+def save_assignments(week_start_date, assignments, shift_times, create_draft=True, store_id=None):
+    """
+    Ghi ket qua xep lich
+
+    Args:
+        week_start_date: Ngay dau tuan
+        assignments: List (user_id, date, ShiftType)
+        shift_times: Map ShiftType -> (gio bat dau, gio ket thuc)
+        create_draft: True = ca nhap, False = ca chinh thuc (da xac nhan)
+        store_id: Cua hang lam ca (None = cua hang cua NV)
+
+    Returns:
+        int: So ca da tao
+    """
+    if not assignments:
+        return 0
+
+    user_ids = {user_id for user_id, _, _ in assignments}
+    schedule_ids = get_week_schedule_ids(week_start_date, user_ids)
+    create_missing_schedules(week_start_date, user_ids, schedule_ids)
+    existing = get_existing_draft_keys(week_start_date)
+
+    rows = []
+    for user_id, date, shift_type in assignments:
+        schedule_id = schedule_ids[user_id]
+        key = (schedule_id, date, shift_type)
+        if key in existing:
+            continue
+        existing.add(key)
+
+        shift_start, shift_end = shift_times[shift_type]
+        rows.append({
+            'schedule_id': schedule_id,
+            'date': date,
+            'shift_type': shift_type,
+            'shift_start_time': shift_start,
+            'shift_end_time': shift_end,
+            'is_preferred': True,
+            'is_confirmed': not create_draft,  # True neu luu truc tiep
+            'is_and_condition': False,
+            'shift_source': 'system',
+            'draft_status': 'draft' if create_draft else 'final',
+            'store_id': store_id
+        })
+
+    for chunk in _chunks(rows):
+        db.session.execute(insert(ScheduleShift).values(chunk))
+
+    return len(rows)
+
+
+def _update_returning(model, criteria, values, columns):
+    """UPDATE ... WHERE criteria RETURNING columns (1 cau; CSDL cu: SELECT roi UPDATE)"""
+    options = {'synchronize_session': False}
+    if db.engine.dialect.update_returning:
+        stmt = update(model).where(*criteria).values(**values).returning(*columns)
+        return db.session.execute(stmt, execution_options=options).all()
+
+    rows = db.session.query(model.id, *columns).filter(*criteria).all()
+    if rows:
+        db.session.execute(
+            update(model).where(model.id.in_([row[0] for row in rows])).values(**values),
+            execution_options=options
+        )
+    return [row[1:] for row in rows]
+
+
+def set_schedules_status(criteria, status, approved_by=None):
+    """
+    Doi trang thai cac WorkSchedule thoa dieu kien (1 cau UPDATE)
+
+    Args:
+        criteria: List dieu kien loc WorkSchedule (vd theo id hoac tuan + trang thai)
+        status: ScheduleStatus moi; APPROVED ghi nguoi duyet, trang thai khac xoa thong tin duyet
+        approved_by: user_id nguoi duyet
+
+    Returns:
+        list: [(schedule_id, user_id)] cac lich da doi
+    """
+    approved = status == ScheduleStatus.APPROVED
+    values = {
+        'status': status,
+        'approved_at': datetime.now() if approved else None,
+        'approved_by': approved_by if approved else None
+    }
+    return _update_returning(WorkSchedule, criteria, values, (WorkSchedule.id, WorkSchedule.user_id))
+
+
+def set_shifts_confirmed(schedule_criteria, confirmed):
+    """
+    Xac nhan / bo xac nhan tat ca ca cua cac lich thoa dieu kien (1 cau UPDATE)
+
+    Args:
+        schedule_criteria: Dieu kien tren ScheduleShift (vd schedule_id.in_(...))
+        confirmed: Gia tri is_confirmed moi; chi cap nhat ca dang khac gia tri nay
+
+    Returns:
+        list: schedule_id cua moi ca da doi (lap lai theo so ca)
+    """
+    if confirmed:
+        changed = or_(ScheduleShift.is_confirmed.is_(None), ScheduleShift.is_confirmed == False)
+    else:
+        changed = ScheduleShift.is_confirmed == True
+    rows = _update_returning(ScheduleShift, [*schedule_criteria, changed],
+                             {'is_confirmed': confirmed}, (ScheduleShift.schedule_id,))
+    return [schedule_id for (schedule_id,) in rows]
@@ -0,0 +1,66 @@
+"""
+Tang truy van cho cac trang lich (duyet, xem, xep lich)
+
+Nap san quan he ma template dung (schedule.user, schedule.shifts) de moi
+trang chay mot so query co dinh, khong phu thuoc so NV:
+- joinedload: quan he 1-1 (WorkSchedule.user) - cung query
+- selectinload: quan he 1-n (WorkSchedule.shifts) - 1 query IN cho ca trang
+"""
+
+from sqlalchemy import exists
+from sqlalchemy.orm import joinedload, selectinload
+from app.models import WorkSchedule, User, UserRole, ScheduleStatus, db
+
+
+def schedule_options():
+    """Options nap san NV va ca cho WorkSchedule"""
+    return (joinedload(WorkSchedule.user), selectinload(WorkSchedule.shifts))
+
+
+def get_week_schedules(week_start_date, statuses):
+    """
+    Lich dang ky cua tuan theo trang thai, kem NV va ca (2 query)
+
+    Returns:
+        dict: {ScheduleStatus: [WorkSchedule]} theo thu tu gui dang ky
+    """
+    schedules = WorkSchedule.query.filter(
+        WorkSchedule.week_start_date == week_start_date,
+        WorkSchedule.status.in_(statuses)
+    ).options(*schedule_options()).order_by(WorkSchedule.submitted_at, WorkSchedule.id).all()
+
+    grouped = {status: [] for status in statuses}
+    for schedule in schedules:
+        grouped[schedule.status].append(schedule)
+    return grouped
+
+
+def get_unregistered_staff(week_start_date, statuses):
+    """NV active chua co lich tuan o cac trang thai da cho (NOT EXISTS, 1 query)"""
+    registered = exists().where(
+        WorkSchedule.user_id == User.id,
+        WorkSchedule.week_start_date == week_start_date,
+        WorkSchedule.status.in_(statuses)
+    )
+    return User.query.filter(
+        User.status == 'active',
+        User.role == UserRole.STAFF,
+        ~registered
+    ).order_by(User.full_name).all()
+
+
+def get_registered_cells(schedules, week_start_date):
+    """{schedule_id: set((ngay 0-6, 'morning'|'afternoon'|'evening'))} tu ca da nap san"""
+    return {
+        schedule.id: {((shift.date - week_start_date).days, shift.shift_type.value)
+                      for shift in schedule.shifts}
+        for schedule in schedules
+    }
+
+
+def is_week_published(week_start_date):
+    """Tuan da co lich duoc duyet chua (1 query EXISTS)"""
+    return db.session.query(exists().where(
+        WorkSchedule.week_start_date == week_start_date,
+        WorkSchedule.status == ScheduleStatus.APPROVED
+    )).scalar()
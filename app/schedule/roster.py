@@ -0,0 +1,186 @@
+"""
+WeekRoster: lich 1 tuan dang mang bit gon [NV x 7 ngay x 3 ca]
+
+Moi o la 1 byte co cac co:
+- REGISTERED: NV dang ky (shift_source 'employee' hoac None)
+- DRAFT: ca nhap he thong (system, draft)
+- FINAL: ca he thong da luu (system, final)
+- CONFIRMED: ca da xac nhan (is_confirmed, moi nguon)
+
+Doc tu 1 query (ScheduleShift join WorkSchedule join User, Store). Dem phu song,
+tim ca xep ngoai nguyen vong, so sanh nhap / chinh thuc deu la phep toan
+tren mang NumPy; grid() tra ve cau truc ngay -> ca -> [{'user', 'shift'}]
+cho template, to_json() cho API.
+
+Cua hang cua ca = ScheduleShift.store_id, khong co thi lay User.store_id
+(stores[lop, NV, ngay, ca], 0 = chua gan cua hang).
+"""
+
+from datetime import timedelta
+import numpy as np
+from sqlalchemy import func
+from app.models import ScheduleShift, WorkSchedule, User, Store, db
+from app.schedule.solver import DAYS, SHIFTS
+from app.schedule.auto_scheduler import SHIFT_ORDER
+
+
+REGISTERED = 1
+DRAFT = 2
+FINAL = 4
+CONFIRMED = 8
+
+LAYERS = (REGISTERED, DRAFT, FINAL, CONFIRMED)
+FLAG_NAMES = {REGISTERED: 'registered', DRAFT: 'draft', FINAL: 'final', CONFIRMED: 'confirmed'}
+
+
+def _row_flags(shift_source, draft_status, is_confirmed):
+    if shift_source in ('employee', None):
+        flags = REGISTERED
+    elif draft_status == 'draft':
+        flags = DRAFT
+    else:
+        flags = FINAL
+    if is_confirmed:
+        flags |= CONFIRMED
+    return flags
+
+
+class WeekRoster:
+    """
+    Lich 1 tuan: cells[NV, ngay, ca] = to hop co, shift_ids[lop, NV, ngay, ca] = id ca,
+    row_counts[lop, NV, ngay, ca] = so dong ScheduleShift (> 1 la trung lich),
+    stores[lop, NV, ngay, ca] = id cua hang, store_clash[lop, NV, ngay, ca] = cac dong
+    cung o thuoc 2 cua hang khac nhau
+    """
+
+    def __init__(self, week_start_date, users, cells, shift_ids, row_counts,
+                 stores=None, store_clash=None, store_codes=None):
+        self.week_start = week_start_date
+        self.users = users  # [{'id', 'full_name', 'username'}] theo thu tu hang
+        self.index = {user['id']: row for row, user in enumerate(users)}
+        self.cells = cells
+        self.shift_ids = shift_ids
+        self.row_counts = row_counts
+        self.stores = stores if stores is not None else np.zeros(shift_ids.shape, dtype=np.int64)
+        self.store_clash = store_clash if store_clash is not None else np.zeros(shift_ids.shape, dtype=bool)
+        self.store_codes = store_codes or {}  # {store_id: ma cua hang}
+
+    @classmethod
+    def load(cls, week_start_date, user_ids=None):
+        """Doc tat ca ca cua tuan (1 query), loc theo NV neu co"""
+        week_end_date = week_start_date + timedelta(days=6)
+        store_id = func.coalesce(ScheduleShift.store_id, User.store_id)
+        query = db.session.query(
+            ScheduleShift.id, ScheduleShift.date, ScheduleShift.shift_type,
+            ScheduleShift.shift_source, ScheduleShift.draft_status, ScheduleShift.is_confirmed,
+            User.id.label('user_id'), User.full_name, User.username,
+            store_id.label('store_id'), Store.code.label('store_code')
+        ).select_from(ScheduleShift)\
+            .join(WorkSchedule, ScheduleShift.schedule_id == WorkSchedule.id)\
+            .join(User, WorkSchedule.user_id == User.id)\
+            .outerjoin(Store, Store.id == store_id)\
+            .filter(ScheduleShift.date >= week_start_date, ScheduleShift.date <= week_end_date)
+        if user_ids is not None:
+            query = query.filter(User.id.in_(user_ids))
+        rows = query.order_by(User.full_name, User.id, ScheduleShift.id).all()
+
+        users, index = [], {}
+        for row in rows:
+            if row.user_id not in index:
+                index[row.user_id] = len(users)
+                users.append({'id': row.user_id, 'full_name': row.full_name, 'username': row.username})
+
+        cells = np.zeros((len(users), DAYS, SHIFTS), dtype=np.uint8)
+        shift_ids = np.zeros((len(LAYERS), len(users), DAYS, SHIFTS), dtype=np.int64)
+        row_counts = np.zeros((len(LAYERS), len(users), DAYS, SHIFTS), dtype=np.uint8)
+        stores = np.zeros((len(LAYERS), len(users), DAYS, SHIFTS), dtype=np.int64)
+        store_clash = np.zeros((len(LAYERS), len(users), DAYS, SHIFTS), dtype=bool)
+        store_codes = {}
+        for row in rows:
+            day = (row.date - week_start_date).days
+            shift = SHIFT_ORDER.index(row.shift_type)
+            user = index[row.user_id]
+            flags = _row_flags(row.shift_source, row.draft_status, row.is_confirmed)
+            cells[user, day, shift] |= flags
+            if row.store_id:
+                store_codes[row.store_id] = row.store_code
+            for layer, flag in enumerate(LAYERS):
+                if not flags & flag:
+                    continue
+                row_counts[layer, user, day, shift] += 1
+                if row.store_id:
+                    current = stores[layer, user, day, shift]
+                    if not current:
+                        stores[layer, user, day, shift] = row.store_id
+                    elif current != row.store_id:
+                        store_clash[layer, user, day, shift] = True
+                # Trung o (NV dang ky + he thong xep): uu tien id ca he thong
+                if not shift_ids[layer, user, day, shift] or row.shift_source == 'system':
+                    shift_ids[layer, user, day, shift] = row.id
+
+        return cls(week_start_date, users, cells, shift_ids, row_counts, stores, store_clash, store_codes)
+
+    def mask(self, flag):
+        """Mang bool [NV, ngay, ca] cac o co co flag"""
+        return (self.cells & flag) != 0
+
+    def store_map(self, flag):
+        """Id cua hang [NV, ngay, ca] cua lop (to hop) flag; 0 = khong co / chua gan"""
+        result = np.zeros(self.cells.shape, dtype=np.int64)
+        clash = np.zeros(self.cells.shape, dtype=bool)
+        for layer, layer_flag in enumerate(LAYERS):
+            if flag & layer_flag:
+                layer_stores = self.stores[layer]
+                clash |= self.store_clash[layer] | ((result != 0) & (layer_stores != 0) & (result != layer_stores))
+                result = np.where(result == 0, layer_stores, result)
+        return result, clash
+
+    def coverage(self, flag):
+        """So NV moi ca [ngay, ca]"""
+        return self.mask(flag).sum(axis=0)
+
+    def total(self, flag):
+        return int(self.mask(flag).sum())
+
+    def shift_counts(self, flag):
+        """{user_id: so ca trong tuan}"""
+        counts = self.mask(flag).sum(axis=(1, 2))
+        return {user['id']: int(count) for user, count in zip(self.users, counts) if count}
+
+    def _cells(self, mask):
+        return [(self.users[user]['id'], self.week_start + timedelta(days=int(day)), SHIFT_ORDER[shift])
+                for user, day, shift in np.argwhere(mask)]
+
+    def conflicts(self, flag=DRAFT):
+        """Ca duoc xep nhung NV khong dang ky: [(user_id, date, ShiftType)]"""
+        return self._cells(self.mask(flag) & ~self.mask(REGISTERED))
+
+    def diff(self, old_flag, new_flag):
+        """Khac biet giua 2 lop (vd FINAL -> DRAFT): {'added': [...], 'removed': [...]}"""
+        old, new = self.mask(old_flag), self.mask(new_flag)
+        return {'added': self._cells(new & ~old), 'removed': self._cells(old & ~new)}
+
+    def grid(self, flag):
+        """{date: {'morning'|'afternoon'|'evening': [{'user', 'shift'}]}} cho template"""
+        layer = LAYERS.index(flag)
+        mask = self.mask(flag)
+        grid = {}
+        for day in range(DAYS):
+            date = self.week_start + timedelta(days=day)
+            grid[date] = {}
+            for shift, shift_type in enumerate(SHIFT_ORDER):
+                grid[date][shift_type.value] = [{
+                    'user': self.users[user],
+                    'shift': {'id': int(self.shift_ids[layer, user, day, shift]), 'date': date,
+                              'shift_type': shift_type}
+                } for user in np.nonzero(mask[:, day, shift])[0]]
+        return grid
+
+    def to_json(self):
+        return {
+            'week_start': self.week_start.isoformat(),
+            'users': self.users,
+            'flags': {name: flag for flag, name in FLAG_NAMES.items()},
+            'shift_types': [shift_type.value for shift_type in SHIFT_ORDER],
+            'cells': self.cells.tolist()
+        }
@@ -1,14 +1,28 @@
-from flask import render_template, redirect, url_for, flash, request, session, jsonify
+import os
+from flask import render_template, redirect, url_for, flash, request, session, jsonify, current_app, abort
 from flask_login import login_required, current_user
+from werkzeug.utils import secure_filename
 from datetime import datetime, timedelta, time
 from app.schedule import bp
 from app.schedule.forms import WeeklyScheduleForm
-from app.schedule.auto_scheduler import auto_generate_schedule
+from app.schedule.auto_scheduler import (
+    auto_generate_schedule, get_week_demand, get_shift_settings, get_dynamic_shift_times
+)
+from app.schedule.batch import generate_schedules_batch, week_range
+from app.schedule.traffic_import import import_traffic_file, ALLOWED_EXTENSIONS as TRAFFIC_EXTENSIONS
+from app.schedule.incremental import rebalance_week, invalidate_week_state
+from app.schedule.roster import WeekRoster, DRAFT, FINAL, CONFIRMED
+from app.schedule.validator import validate_roster, validate_week
+from app.schedule.persistence import set_schedules_status, set_shifts_confirmed
+from app.schedule.queries import (
+    get_week_schedules, get_unregistered_staff, get_registered_cells, is_week_published
+)
 from app.models import (
     WorkSchedule, ScheduleShift, User, ShiftType, ScheduleStatus,
-    UserRole, EmploymentType, ScheduleSettings, SystemConfig, db
+    UserRole, EmploymentType, ScheduleSettings, SystemConfig, ActivityLog, db
 )
 from app.auth.routes import manager_required, admin_required
+from app.dashboard.staff_snapshot import refresh_staff_snapshots
 
 
 # Dinh nghia thoi gian mac dinh cac ca
@@ -22,53 +36,60 @@ DEFAULT_SHIFT_TIMES = {
 SHIFT_TIMES = DEFAULT_SHIFT_TIMES
 
 
-def get_shift_settings():
-    """Lay cai dat ca lam viec tu SystemConfig"""
-    settings = {
-        'morning_color': '#FEF3C7',  # Mac dinh yellow
-        'afternoon_color': '#FED7AA',  # Mac dinh orange
-        'evening_color': '#C7D2FE',  # Mac dinh indigo
-        'morning_start': '07:00',
-        'morning_end': '12:00',
-        'afternoon_start': '12:00',
-        'afternoon_end': '18:00',
-        'evening_start': '18:00',
-        'evening_end': '22:00',
-    }
-
-    # Load tu SystemConfig
-    for config in SystemConfig.query.filter(SystemConfig.key.like('shift_%')).all():
-        key = config.key.replace('shift_', '')
-        settings[key] = config.value
+def refresh_week_snapshots(week_start):
+    """Tinh lai dashboard NV cho tat ca NV co lich trong tuan"""
+    user_ids = [uid for (uid,) in db.session.query(WorkSchedule.user_id).filter(
+        WorkSchedule.week_start_date == week_start
+    )]
+    refresh_staff_snapshots(user_ids)
+
+
+def log_schedule_changes(changed, description):
+    """Ghi log cho cac lich vua doi trang thai [(schedule_id, user_id)] (goi sau commit)"""
+    ActivityLog.log_many(
+        current_user.id, 'update', 'schedule',
+        [(schedule_id, f'{description} (NV #{user_id})') for schedule_id, user_id in changed],
+        ip_address=request.remote_addr
+    )
+
+
+def change_schedule_status(schedule_id, status, confirmed, description):
+    """Doi trang thai 1 lich + xac nhan ca cua no (2 cau UPDATE); 404 neu khong co"""
+    changed = set_schedules_status(
+        [WorkSchedule.id == schedule_id], status,
+        approved_by=current_user.id
+    )
+    if not changed:
+        abort(404)
+    set_shifts_confirmed([ScheduleShift.schedule_id == schedule_id], confirmed)
+    db.session.commit()
+    log_schedule_changes(changed, description)
 
-    return settings
+    user_id = changed[0][1]
+    refresh_staff_snapshots([user_id])
+    return db.session.get(User, user_id)
 
 
-def get_dynamic_shift_times():
-    """Lay thoi gian ca tu SystemConfig (tra ve datetime.time objects)"""
-    settings = get_shift_settings()
+def rebalance_draft(week_start, changes):
+    """Xep lai tung phan lich nhap sau khi quan ly sua (loi -> giu nguyen thay doi tay)"""
+    try:
+        return rebalance_week(
+            week_start, changes,
+            staff_per_shift=session.get('auto_staff_per_shift', 2),
+            selected_staff_ids=session.get('selected_staff_ids') or None
+        )
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.warning(f'Incremental rebalance failed for {week_start}: {str(e)}')
+        return None
 
-    def parse_time(time_str):
-        try:
-            parts = time_str.split(':')
-            return time(int(parts[0]), int(parts[1]))
-        except:
-            return None
-
-    return {
-        ShiftType.MORNING: (
-            parse_time(settings['morning_start']) or time(7, 0),
-            parse_time(settings['morning_end']) or time(12, 0)
-        ),
-        ShiftType.AFTERNOON: (
-            parse_time(settings['afternoon_start']) or time(12, 0),
-            parse_time(settings['afternoon_end']) or time(18, 0)
-        ),
-        ShiftType.EVENING: (
-            parse_time(settings['evening_start']) or time(18, 0),
-            parse_time(settings['evening_end']) or time(22, 0)
-        ),
-    }
+
+def check_week(week_start, flag, roster=None):
+    """Kiem tra rang buoc lich tuan (so NV/ca theo cau hinh xep lich dang dung)"""
+    demand = get_week_demand(week_start, session.get('auto_staff_per_shift', 2))
+    if roster is None:
+        return validate_week(week_start, flag, demand, get_dynamic_shift_times())
+    return validate_roster(roster, flag, demand, get_dynamic_shift_times())
 
 
 def get_next_week_dates():
@@ -266,6 +287,7 @@ def register():
                     db.session.add(shift)
 
         db.session.commit()
+        refresh_staff_snapshots([current_user.id])
         flash('Da gui dang ky lich thanh cong!', 'success')
         return redirect(url_for('schedule.my_schedule', week=0 if is_current_week else 1))
 
@@ -313,6 +335,7 @@ def resubmit_current_week():
     existing_schedule.status = ScheduleStatus.SUBMITTED
     existing_schedule.submitted_at = datetime.now()
     db.session.commit()
+    refresh_staff_snapshots([current_user.id])
 
     flash('Da day lich tuan hien tai len Quan ly thanh cong!', 'success')
     return redirect(url_for('schedule.my_schedule', week=0))
@@ -340,6 +363,7 @@ def reset_my_schedule():
         # Xoa schedule
         db.session.delete(existing_schedule)
         db.session.commit()
+        refresh_staff_snapshots([current_user.id])
         flash('Da reset lich thanh cong. Ban co the dang ky lai tu dau.', 'success')
     else:
         flash('Khong co lich de reset.', 'info')
@@ -482,34 +506,8 @@ def view():
     week_start = current_week_start + timedelta(weeks=week_offset)
     week_end = week_start + timedelta(days=6)
 
-    # Lay tat ca shifts trong tuan
-    shifts = db.session.query(
-        ScheduleShift, User
-    ).select_from(ScheduleShift)\
-     .join(WorkSchedule, ScheduleShift.schedule_id == WorkSchedule.id)\
-     .join(User, WorkSchedule.user_id == User.id)\
-     .filter(
-        ScheduleShift.date >= week_start,
-        ScheduleShift.date <= week_end,
-        ScheduleShift.is_confirmed == True
-    ).order_by(ScheduleShift.date, ScheduleShift.shift_type).all()
-
-    # Nhom theo ngay va ca (dung string keys cho template)
-    schedule_grid = {}
-    for day_offset in range(7):
-        date = week_start + timedelta(days=day_offset)
-        schedule_grid[date] = {
-            'morning': [],
-            'afternoon': [],
-            'evening': []
-        }
-
-    for shift, user in shifts:
-        shift_type_str = shift.shift_type.value  # Convert enum to string
-        schedule_grid[shift.date][shift_type_str].append({
-            'user': user,
-            'shift': shift
-        })
+    # Lay tat ca ca da xac nhan trong tuan (1 query), nhom theo ngay va ca
+    schedule_grid = WeekRoster.load(week_start).grid(CONFIRMED)
 
     # Lay danh sach NV de them ca
     staff_list = User.query.filter_by(status='active').order_by(User.full_name).all()
@@ -543,22 +541,14 @@ def review():
     is_current_week = week_start <= today <= week_end
     is_future_week = week_start > today
 
-    # Lay cac lich chua duyet
-    pending_schedules = WorkSchedule.query.filter(
-        WorkSchedule.week_start_date == week_start,
-        WorkSchedule.status == ScheduleStatus.SUBMITTED
-    ).order_by(WorkSchedule.submitted_at).all()
+    # Lay lich chua duyet + da duyet (kem NV va ca, 2 query)
+    statuses = [ScheduleStatus.SUBMITTED, ScheduleStatus.APPROVED]
+    schedules = get_week_schedules(week_start, statuses)
+    pending_schedules = schedules[ScheduleStatus.SUBMITTED]
+    approved_schedules = schedules[ScheduleStatus.APPROVED]
 
-    # Lay cac lich da duyet
-    approved_schedules = WorkSchedule.query.filter(
-        WorkSchedule.week_start_date == week_start,
-        WorkSchedule.status == ScheduleStatus.APPROVED
-    ).all()
-
-    # Thong ke NV chua dang ky
-    all_staff = User.query.filter_by(status='active', role=UserRole.STAFF).all()
-    registered_user_ids = [s.user_id for s in pending_schedules + approved_schedules]
-    not_registered = [u for u in all_staff if u.id not in registered_user_ids]
+    # Thong ke NV chua dang ky (NOT EXISTS trong DB)
+    not_registered = get_unregistered_staff(week_start, statuses)
 
     # Lay shift settings tu SystemConfig
     shift_settings = get_shift_settings()
@@ -567,6 +557,7 @@ def review():
                            pending_schedules=pending_schedules,
                            approved_schedules=approved_schedules,
                            not_registered=not_registered,
+                           registered_cells=get_registered_cells(pending_schedules + approved_schedules, week_start),
                            week_start=week_start,
                            week_end=week_end,
                            week_offset=week_offset,
@@ -582,17 +573,8 @@ def review():
 @manager_required
 def approve(schedule_id):
     """Duyet lich cho 1 NV"""
-    schedule = WorkSchedule.query.get_or_404(schedule_id)
-    schedule.status = ScheduleStatus.APPROVED
-    schedule.approved_at = datetime.now()
-    schedule.approved_by = current_user.id
-
-    # Confirm tat ca shifts
-    for shift in schedule.shifts:
-        shift.is_confirmed = True
-
-    db.session.commit()
-    flash(f'Da duyet lich cho {schedule.user.full_name}', 'success')
+    user = change_schedule_status(schedule_id, ScheduleStatus.APPROVED, True, 'Duyet lich')
+    flash(f'Da duyet lich cho {user.full_name}', 'success')
     return redirect(url_for('schedule.review'))
 
 
@@ -601,17 +583,8 @@ def approve(schedule_id):
 @manager_required
 def return_schedule(schedule_id):
     """Tra lich lai cho NV de sua"""
-    schedule = WorkSchedule.query.get_or_404(schedule_id)
-    schedule.status = ScheduleStatus.DRAFT
-    schedule.approved_at = None
-    schedule.approved_by = None
-
-    # Unconfirm tat ca shifts
-    for shift in schedule.shifts:
-        shift.is_confirmed = False
-
-    db.session.commit()
-    flash(f'Da tra lich lai cho {schedule.user.full_name} de sua', 'info')
+    user = change_schedule_status(schedule_id, ScheduleStatus.DRAFT, False, 'Tra lich de sua')
+    flash(f'Da tra lich lai cho {user.full_name} de sua', 'info')
     return redirect(url_for('schedule.review'))
 
 
@@ -620,17 +593,8 @@ def return_schedule(schedule_id):
 @manager_required
 def unapprove(schedule_id):
     """Huy duyet lich - cho phep NV sua lai"""
-    schedule = WorkSchedule.query.get_or_404(schedule_id)
-    schedule.status = ScheduleStatus.DRAFT
-    schedule.approved_at = None
-    schedule.approved_by = None
-
-    # Unconfirm tat ca shifts
-    for shift in schedule.shifts:
-        shift.is_confirmed = False
-
-    db.session.commit()
-    flash(f'Da huy duyet lich cua {schedule.user.full_name}', 'info')
+    user = change_schedule_status(schedule_id, ScheduleStatus.DRAFT, False, 'Huy duyet lich')
+    flash(f'Da huy duyet lich cua {user.full_name}', 'info')
     return redirect(url_for('schedule.review'))
 
 
@@ -671,6 +635,7 @@ def edit_schedule(schedule_id):
                     db.session.add(shift)
 
         db.session.commit()
+        refresh_staff_snapshots([schedule.user_id])
         flash(f'Da cap nhat lich cho {schedule.user.full_name}', 'success')
         return redirect(url_for('schedule.review'))
 
@@ -689,16 +654,19 @@ def auto_generate():
     week_start, week_end = get_next_week_dates()
 
     # Lay so nhan vien moi ca tu form
-    staff_per_shift = request.form.get('staff_per_shift', type=int, default=2)
-    if staff_per_shift < 1:
-        staff_per_shift = 2
-    if staff_per_shift > 4:
-        staff_per_shift = 4
+    if request.form.get('staff_per_shift') == 'forecast':
+        staff_per_shift = None  # Theo du bao luong khach
+    else:
+        staff_per_shift = request.form.get('staff_per_shift', type=int, default=2)
+        if staff_per_shift < 1:
+            staff_per_shift = 2
+        if staff_per_shift > 4:
+            staff_per_shift = 4
 
     try:
         result = auto_generate_schedule(week_start, staff_per_shift=staff_per_shift)
         if result and result.get('success'):
-            flash(f'Da xep lich tu dong thanh cong! Tuan {week_start.strftime("%d/%m")} - {week_end.strftime("%d/%m/%Y")}. Tong cong {result.get("total_shifts_assigned", 0)} ca ({staff_per_shift} NV/ca).', 'success')
+            flash(f'Da xep lich tu dong thanh cong! Tuan {week_start.strftime("%d/%m")} - {week_end.strftime("%d/%m/%Y")}. Tong cong {result.get("total_shifts_assigned", 0)} ca ({staff_per_shift or "du bao"} NV/ca).', 'success')
         else:
             flash('Xep lich tu dong hoan thanh nhung co the chua toi uu.', 'warning')
     except Exception as e:
@@ -708,6 +676,103 @@ def auto_generate():
     return redirect(url_for('schedule.review'))
 
 
+@bp.route('/api/batch-generate', methods=['POST'])
+@login_required
+@admin_required
+def batch_generate():
+    """Xep lich nhap hang loat cho nhieu tuan / nhieu cua hang (JSON)"""
+    data = request.get_json(silent=True) or {}
+
+    try:
+        if data.get('start'):
+            start = datetime.strptime(data['start'], '%Y-%m-%d').date()
+        else:
+            start, _ = get_next_week_dates()
+        weeks = min(max(int(data.get('weeks', 1)), 1), 12)
+        staff_per_shift = data.get('staff_per_shift')
+        if staff_per_shift is not None and staff_per_shift != 'forecast':
+            staff_per_shift = min(max(int(staff_per_shift), 1), 20)
+        store_ids = [int(sid) for sid in data['store_ids']] if data.get('store_ids') else None
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'error': 'Tham so khong hop le'}), 400
+
+    try:
+        result = generate_schedules_batch(
+            week_range(start, weeks),
+            store_ids=store_ids,
+            staff_per_shift=staff_per_shift
+        )
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+    for item in result['problems']:
+        item['week_start'] = item['week_start'].isoformat()
+    return jsonify(result)
+
+
+@bp.route('/api/roster')
+@login_required
+@manager_required
+def roster_api():
+    """Lich 1 tuan dang mang bit (API)"""
+    try:
+        week_start = datetime.strptime(request.args['week'], '%Y-%m-%d').date()
+    except (KeyError, ValueError):
+        week_start, _ = get_next_week_dates()
+    week_start -= timedelta(days=week_start.weekday())
+
+    roster = WeekRoster.load(week_start)
+    return jsonify({
+        'success': True,
+        'roster': roster.to_json(),
+        'coverage': {
+            'draft': roster.coverage(DRAFT).tolist(),
+            'confirmed': roster.coverage(CONFIRMED).tolist()
+        }
+    })
+
+
+@bp.route('/import-traffic', methods=['GET', 'POST'])
+@login_required
+@manager_required
+def import_traffic():
+    """Import du lieu luong khach tu iPOS (CSV / XLSX)"""
+    if request.method == 'POST':
+        file = request.files.get('file')
+        if file is None or file.filename == '':
+            flash('Chua chon file.', 'danger')
+            return redirect(request.url)
+
+        if '.' not in file.filename or file.filename.rsplit('.', 1)[1].lower() not in TRAFFIC_EXTENSIONS:
+            flash('Chi chap nhan file .csv hoac .xlsx', 'danger')
+            return redirect(request.url)
+
+        filename = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{secure_filename(file.filename)}"
+        upload_folder = current_app.config.get('UPLOAD_FOLDER', 'uploads')
+        os.makedirs(upload_folder, exist_ok=True)
+        filepath = os.path.join(upload_folder, filename)
+        file.save(filepath)
+
+        year = request.form.get('year', type=int, default=datetime.now().year)
+        try:
+            result = import_traffic_file(filepath, year)
+        except Exception as e:
+            flash(f'Loi khi import du lieu iPOS: {str(e)}', 'danger')
+            return redirect(request.url)
+
+        if result['success']:
+            flash(f"Da import {result['rows']} dong ({result['slots']} khung gio, "
+                  f"{result['start'].strftime('%d/%m/%Y')} - {result['end'].strftime('%d/%m/%Y')}), "
+                  f"{result['peak_hours']} gio dong.", 'success')
+        else:
+            flash('Khong import duoc du lieu iPOS.', 'danger')
+        for error in result['errors'][:5]:
+            flash(error, 'warning')
+        return redirect(request.url)
+
+    return render_template('schedule/import_traffic.html', current_year=datetime.now().year)
+
+
 @bp.route('/reset-schedule', methods=['POST'])
 @login_required
 @admin_required
@@ -723,15 +788,21 @@ def reset_schedule():
     try:
         # Chi dat is_confirmed = False cho cac shifts, khong xoa
         # Giu nguyen dang ky cua NV
-        shifts_reset = 0
-        schedules = WorkSchedule.query.filter_by(week_start_date=week_start).all()
-        for schedule in schedules:
-            for shift in schedule.shifts:
-                if shift.is_confirmed:
-                    shift.is_confirmed = False
-                    shifts_reset += 1
+        week_schedules = db.session.query(WorkSchedule.id).filter(WorkSchedule.week_start_date == week_start)
+        reset_ids = set_shifts_confirmed([ScheduleShift.schedule_id.in_(week_schedules.scalar_subquery())], False)
+        shifts_reset = len(reset_ids)
 
         db.session.commit()
+        counts = {}
+        for schedule_id in reset_ids:
+            counts[schedule_id] = counts.get(schedule_id, 0) + 1
+        ActivityLog.log_many(
+            current_user.id, 'update', 'schedule',
+            [(schedule_id, f'Reset {count} ca tuan {week_start.strftime("%d/%m/%Y")}')
+             for schedule_id, count in sorted(counts.items())],
+            ip_address=request.remote_addr
+        )
+        refresh_week_snapshots(week_start)
         flash(f'Da reset {shifts_reset} ca lam viec tuan {week_start.strftime("%d/%m")} - {week_end.strftime("%d/%m/%Y")}. Cac dang ky giu nguyen, co the xep lai bang tay.', 'success')
     except Exception as e:
         db.session.rollback()
@@ -815,6 +886,7 @@ def add_shift():
             )
             db.session.add(shift)
             db.session.commit()
+            refresh_staff_snapshots([user_id])
             flash('Da them ca lam viec thanh cong.', 'success')
 
         # Tinh week_offset de quay ve dung tuan
@@ -864,10 +936,26 @@ def edit_shift(shift_id):
                 db.session.add(new_schedule)
                 db.session.flush()
 
+            old_user_id = shift.schedule.user_id
             shift.schedule_id = new_schedule.id
             db.session.commit()
+
+            user_ids = {old_user_id, new_user_id}
+            if shift.shift_source == 'system' and shift.draft_status == 'draft' and old_user_id != new_user_id:
+                rebalanced = rebalance_draft(shift.schedule.week_start_date, [
+                    ('remove', old_user_id, shift.date, shift.shift_type, shift.id),
+                    ('add', new_user_id, shift.date, shift.shift_type, shift.id)
+                ])
+                if rebalanced:
+                    user_ids.update(item['user_id'] for item in rebalanced['added'] + rebalanced['removed'])
+            refresh_staff_snapshots(list(user_ids))
             flash('Da cap nhat ca lam viec.', 'success')
 
+            flag = DRAFT if shift.draft_status == 'draft' else FINAL
+            for violation in check_week(shift.schedule.week_start_date, flag):
+                if violation['user_id'] == new_user_id and violation['severity'] == 'error':
+                    flash(violation['message'], 'warning')
+
         return redirect(url_for('schedule.view', week=week_offset))
 
     # Lay danh sach NV de chon
@@ -888,8 +976,10 @@ def delete_shift(shift_id):
     shift_week_start = shift.date - timedelta(days=shift.date.weekday())
     week_offset = (shift_week_start - current_week_start).days // 7
 
+    shift_user_id = shift.schedule.user_id
     db.session.delete(shift)
     db.session.commit()
+    refresh_staff_snapshots([shift_user_id])
     flash('Da xoa ca lam viec.', 'success')
     return redirect(url_for('schedule.view', week=week_offset))
 
@@ -1016,18 +1106,26 @@ def config_auto_schedule():
 
     if request.method == 'POST':
         staff_per_shift = request.form.get('staff_per_shift', '2')
+        if staff_per_shift == 'forecast':
+            staff_per_shift = None  # Theo du bao luong khach
+        else:
+            staff_per_shift = int(staff_per_shift) if staff_per_shift.isdigit() else 2
+        session['auto_staff_per_shift'] = staff_per_shift
+        invalidate_week_state(week_start)
 
         # Chay auto-scheduler voi config moi
         try:
             result = auto_generate_schedule(
                 week_start,
-                staff_per_shift=int(staff_per_shift) if staff_per_shift.isdigit() else 2,
+                staff_per_shift=staff_per_shift,
                 selected_staff_ids=selected_ids,
                 create_draft=True  # TAO LICH NHAP, KHONG GHI DE
             )
 
             if result and result.get('success'):
                 flash(f'Da tao lich NHAP thanh cong! Tong: {result.get("total_shifts", 0)} ca', 'success')
+                if result.get('warnings'):
+                    flash(f'Con {len(result["warnings"])} ca thieu nguoi (khong du NV dang ky).', 'warning')
                 return redirect(url_for('schedule.review_draft'))
             else:
                 flash('Loi khi xep lich!', 'danger')
@@ -1057,46 +1155,18 @@ def review_draft():
     week_start = datetime.fromisoformat(week_start_str).date()
     week_end = week_start + timedelta(days=6)
 
-    # Lay tat ca shifts NHAP (draft)
-    draft_shifts = db.session.query(ScheduleShift, User)\
-        .select_from(ScheduleShift)\
-        .join(WorkSchedule, ScheduleShift.schedule_id == WorkSchedule.id)\
-        .join(User, WorkSchedule.user_id == User.id)\
-        .filter(
-            ScheduleShift.date >= week_start,
-            ScheduleShift.date <= week_end,
-            ScheduleShift.shift_source == 'system',
-            ScheduleShift.draft_status == 'draft'
-        )\
-        .order_by(ScheduleShift.date, ScheduleShift.shift_type)\
-        .all()
-
-    # To chuc theo ngay va ca
-    schedule_by_date = {}
-    for i in range(7):
-        date = week_start + timedelta(days=i)
-        schedule_by_date[date] = {
-            'morning': [],
-            'afternoon': [],
-            'evening': []
-        }
-
-    for shift, user in draft_shifts:
-        shift_type = shift.shift_type.value
-        if shift.date in schedule_by_date:
-            schedule_by_date[shift.date][shift_type].append({
-                'shift': shift,
-                'user': user
-            })
+    # Lay tat ca shifts NHAP (draft), to chuc theo ngay va ca
+    roster = WeekRoster.load(week_start)
 
     # Lay danh sach NV de them vao draft
     all_staff = User.query.filter_by(status='active').filter(User.role != UserRole.ADMIN).all()
 
     return render_template('schedule/review_draft.html',
-                           schedule_by_date=schedule_by_date,
+                           schedule_by_date=roster.grid(DRAFT),
                            week_start=week_start,
                            week_end=week_end,
-                           total_shifts=len(draft_shifts),
+                           total_shifts=roster.total(DRAFT),
+                           violations=check_week(week_start, DRAFT, roster),
                            all_staff=all_staff,
                            timedelta=timedelta)
 
@@ -1133,6 +1203,8 @@ def save_draft():
     ).update({'draft_status': 'final', 'is_confirmed': True})
 
     db.session.commit()
+    invalidate_week_state(week_start)
+    refresh_week_snapshots(week_start)
 
     # Giu lai auto_week_start de final_review dung, chi xoa selected_staff_ids
     session.pop('selected_staff_ids', None)
@@ -1162,9 +1234,11 @@ def discard_draft():
         ).delete()
 
         db.session.commit()
+        invalidate_week_state(week_start)
 
         # Xoa session
         session.pop('selected_staff_ids', None)
+        session.pop('auto_staff_per_shift', None)
         session.pop('auto_week_start', None)
 
         flash(f'Da huy {deleted} ca lich nhap!', 'info')
@@ -1191,9 +1265,16 @@ def remove_draft_shift():
         ).first()
 
         if shift:
+            week_start = shift.date - timedelta(days=shift.date.weekday())
+            change = ('remove', shift.schedule.user_id, shift.date, shift.shift_type, shift.id)
             db.session.delete(shift)
             db.session.commit()
-            return jsonify({'success': True})
+            # Lap cho trong bang NV khac da dang ky (chi giai lai ngay nay)
+            return jsonify({
+                'success': True,
+                'rebalanced': rebalance_draft(week_start, [change]),
+                'violations': check_week(week_start, DRAFT)
+            })
 
     return jsonify({'success': False, 'error': 'Khong tim thay shift'})
 
@@ -1209,10 +1290,12 @@ def add_draft_shift():
         user_id = int(data.get('user_id', 0)) if data.get('user_id') else 0
         date_str = data.get('date')
         shift_type_str = data.get('shift_type')
+        store_id = int(data['store_id']) if data.get('store_id') else None
     else:
         user_id = request.form.get('user_id', type=int)
         date_str = request.form.get('date')
         shift_type_str = request.form.get('shift_type')
+        store_id = request.form.get('store_id', type=int)
 
     if not all([user_id, date_str, shift_type_str]):
         return jsonify({'success': False, 'error': 'Thieu thong tin'})
@@ -1266,16 +1349,22 @@ def add_draft_shift():
             is_preferred=False,
             is_confirmed=False,
             shift_source='system',
-            draft_status='draft'
+            draft_status='draft',
+            store_id=store_id  # Dieu dong sang cua hang khac (None = cua hang cua NV)
         )
         db.session.add(shift)
         db.session.commit()
 
+        # Ca co the thua nguoi: bo giai dieu chinh cac ca con lai cua ngay
+        rebalanced = rebalance_draft(week_start, [('add', user_id, shift_date, shift_type, shift.id)])
+
         user = User.query.get(user_id)
         return jsonify({
             'success': True,
             'shift_id': shift.id,
-            'user_name': user.full_name if user else 'Unknown'
+            'user_name': user.full_name if user else 'Unknown',
+            'rebalanced': rebalanced,
+            'violations': check_week(week_start, DRAFT)
         })
 
     except Exception as e:
@@ -1313,50 +1402,19 @@ def final_review():
     # Tinh week_offset de truyen vao template
     week_offset = (week_start - current_week_start).days // 7
 
-    # Lay lich final (da luu)
-    final_shifts = db.session.query(ScheduleShift, User)\
-        .select_from(ScheduleShift)\
-        .join(WorkSchedule, ScheduleShift.schedule_id == WorkSchedule.id)\
-        .join(User, WorkSchedule.user_id == User.id)\
-        .filter(
-            ScheduleShift.date >= week_start,
-            ScheduleShift.date <= week_end,
-            ScheduleShift.is_confirmed == True
-        )\
-        .order_by(ScheduleShift.date, ScheduleShift.shift_type)\
-        .all()
-
-    # To chuc theo ngay va ca
-    schedule_by_date = {}
-    for i in range(7):
-        date = week_start + timedelta(days=i)
-        schedule_by_date[date] = {
-            'morning': [],
-            'afternoon': [],
-            'evening': []
-        }
-
-    for shift, user in final_shifts:
-        shift_type = shift.shift_type.value
-        if shift.date in schedule_by_date:
-            schedule_by_date[shift.date][shift_type].append({
-                'shift': shift,
-                'user': user
-            })
+    # Lay lich final (da luu), to chuc theo ngay va ca
+    roster = WeekRoster.load(week_start)
 
     # Kiem tra da publish chua
-    schedules = WorkSchedule.query.filter_by(
-        week_start_date=week_start,
-        status=ScheduleStatus.APPROVED
-    ).all()
-    is_published = len(schedules) > 0
+    is_published = is_week_published(week_start)
 
     return render_template('schedule/final_review.html',
-                           schedule_by_date=schedule_by_date,
+                           schedule_by_date=roster.grid(CONFIRMED),
                            week_start=week_start,
                            week_end=week_end,
                            week_offset=week_offset,
-                           total_shifts=len(final_shifts),
+                           total_shifts=roster.total(CONFIRMED),
+                           violations=check_week(week_start, CONFIRMED, roster),
                            is_published=is_published,
                            timedelta=timedelta)
 
@@ -1374,21 +1432,30 @@ def publish_to_staff():
     else:
         week_start, week_end = get_next_week_dates()
 
-    # Update trang thai WorkSchedule thanh APPROVED
-    schedules = WorkSchedule.query.filter(
+    # Confirm tat ca shifts + update trang thai WorkSchedule thanh APPROVED (UPDATE theo tuan,
+    # confirm truoc: subquery loc theo trang thai chua duyet)
+    pending = (
         WorkSchedule.week_start_date == week_start,
         WorkSchedule.status.in_([ScheduleStatus.SUBMITTED, ScheduleStatus.DRAFT])
-    ).all()
+    )
+    pending_ids = db.session.query(WorkSchedule.id).filter(*pending).scalar_subquery()
+    set_shifts_confirmed([ScheduleShift.schedule_id.in_(pending_ids)], True)
+
+    # Kiem tra lich NV se thay sau khi day (ca da xac nhan + ca vua xac nhan, chua commit):
+    # vi pham nghiem trong (nghi giua ca, gio/tuan, trung lich) chan day lich tru khi xac nhan
+    errors = [v for v in check_week(week_start, CONFIRMED) if v['severity'] == 'error']
+    if errors and request.form.get('force') != '1':
+        db.session.rollback()
+        flash(f'Lich con {len(errors)} vi pham, chua day ve NV. Sua lich hoac chon "Van day lich".', 'danger')
+        for violation in errors[:5]:
+            flash(violation['message'], 'warning')
+        return redirect(url_for('schedule.final_review'))
 
-    for schedule in schedules:
-        schedule.status = ScheduleStatus.APPROVED
-        schedule.approved_at = datetime.now()
-        schedule.approved_by = current_user.id
-        # Confirm tat ca shifts cua schedule nay
-        for shift in schedule.shifts:
-            shift.is_confirmed = True
+    schedules = set_schedules_status(list(pending), ScheduleStatus.APPROVED, approved_by=current_user.id)
 
     db.session.commit()
+    log_schedule_changes(schedules, f'Day lich tuan {week_start.strftime("%d/%m/%Y")}')
+    refresh_staff_snapshots([user_id for _, user_id in schedules])
 
     flash(f'Da day lich ve cho {len(schedules)} nhan vien!', 'success')
     return redirect(url_for('schedule.final_review'))
@@ -0,0 +1,473 @@
+"""
+Bo giai xep lich tu dong (khong phu thuoc database)
+
+Mo hinh luong chi phi nho nhat (min-cost flow):
+
+    nguon -> NV -> [NV, ngay] -> ca (ngay, loai ca) -> dich
+
+- NV -> ca: chi co cung cho ca NV da dang ky (ton trong nguyen vong)
+- [NV, ngay]: ngay "hoac" (khong tick Lam CA) co suc chua 1 -> toi da 1 ca/ngay
+- nguon -> NV: cac cung don vi chi phi tang dan (0, 1, 2... x BALANCE_COST)
+  -> uu tien chia deu so ca giua cac NV, toi da max_shifts ca/tuan
+- ca -> dich: suc chua = so NV can, chi phi = M - gia tri phu song
+  (ca gio dong co trong so cao hon) -> chi them NV khi con co loi
+
+Ngay "va" (is_and_condition) la rang buoc tat ca-hoac-khong, khong bieu dien
+duoc bang luong; sau khi giai se sua lai (bu them ca con thieu hoac bo ca le
+roi lap cho trong bang NV khac).
+
+Backend:
+- 'flow': successive shortest path (Dijkstra + potential), thuan Python
+- 'ortools': SimpleMinCostFlow cua OR-tools (neu co cai dat)
+- 'greedy': xep theo thu tu gui dang ky (du phong)
+- 'auto': ortools neu co, nguoc lai 'flow'; loi -> 'greedy'
+
+Xep lai tung phan (app/schedule/incremental.py): base_counts = so ca NV da co
+o cac ngay khong giai lai (tinh vao can bang va max_shifts), keep = cac ca dang
+xep (doi sang ca khac ton them CHANGE_COST -> thay doi it nhat).
+
+Rang buoc lao dong (rules, xem validator.solver_rules): nghi toi thieu giua 2 ngay,
+gio toi da/tuan, 2 ca trung gio. Luong khong bieu dien duoc (rang buoc giua cac
+ngay / theo gio), nen sau khi giai: bo ca vi pham (ca gia tri phu song thap truoc)
+roi lap cho trong bang NV khac con hop le. base_slots = ca da co ngoai bai toan.
+
+Dau vao/ra chi gom kieu co ban (int, list, dict) de co the chay o process khac.
+"""
+
+import heapq
+import time
+
+try:
+    from ortools.graph.python import min_cost_flow as ortools_min_cost_flow
+except ImportError:  # OR-tools la tuy chon
+    ortools_min_cost_flow = None
+
+
+DAYS = 7
+SHIFTS = 3  # 0 = sang, 1 = chieu, 2 = toi
+SLOTS = DAYS * SHIFTS
+
+DEFAULT_MAX_SHIFTS = 18
+
+# Thang chi phi (so nguyen): phu song >> can bang so ca >> thu tu dang ky
+COVERAGE_VALUE = 1000000
+BALANCE_COST = 1000
+RANK_COST = 999
+CHANGE_COST = 2 * BALANCE_COST  # Giu ca dang xep, tru khi lech so ca > 2
+
+BACKENDS = ('auto', 'flow', 'ortools', 'greedy')
+
+SOURCE = 0
+SINK = 1
+
+
+def slot_index(day, shift):
+    return day * SHIFTS + shift
+
+
+def _day_slots(request):
+    """[(day, [slot...], is_and)] cua 1 NV, bo ngay khong dang ky ca nao"""
+    result = []
+    for day, (shifts, is_and) in sorted(request['days'].items()):
+        slots = sorted(set(slot_index(day, s) for s in shifts if 0 <= s < SHIFTS))
+        if slots and 0 <= day < DAYS:
+            result.append((day, slots, bool(is_and) and len(slots) > 1))
+    return result
+
+
+def _capacity(day_slots, max_shifts):
+    """So ca toi da NV co the nhan trong tuan"""
+    total = sum(len(slots) if is_and else 1 for _, slots, is_and in day_slots)
+    return min(total, max_shifts)
+
+
+def build_network(requests, demand, values, max_shifts, base_counts=None, keep=None):
+    """
+    Dung do thi dang mang (kieu OR-tools): start, end, capacity, cost
+
+    base_counts: So ca da co cua tung NV (theo vi tri), keep: tap (vi tri, slot) dang xep
+
+    Returns:
+        dict: {'num_nodes', 'start', 'end', 'capacity', 'cost', 'big_m',
+               'assign_arcs': [(arc, user_pos, slot)]}
+    """
+    start, end, capacity, cost = [], [], [], []
+    assign_arcs = []
+
+    def add_arc(u, v, cap, c):
+        start.append(u)
+        end.append(v)
+        capacity.append(cap)
+        cost.append(c)
+        return len(start) - 1
+
+    big_m = max(values) + 1 if values else 1
+    slot_node = [2 + s for s in range(SLOTS)]
+    num_nodes = 2 + SLOTS
+    n_users = max(len(requests), 1)
+
+    for s in range(SLOTS):
+        if demand[s] > 0:
+            add_arc(slot_node[s], SINK, demand[s], big_m - values[s])
+
+    for pos, request in enumerate(requests):
+        day_slots = _day_slots(request)
+        base = base_counts[pos] if base_counts else 0
+        limit = _capacity(day_slots, max_shifts - base)
+        if limit <= 0:
+            continue
+
+        user_node = num_nodes
+        num_nodes += 1
+
+        # Chi phi loi (convex) -> can bang so ca giua cac NV
+        for j in range(limit):
+            add_arc(SOURCE, user_node, 1, (base + j) * BALANCE_COST)
+
+        rank_cost = pos * RANK_COST // n_users
+        for day, slots, is_and in day_slots:
+            if is_and or len(slots) == 1:
+                parent = user_node
+            else:
+                parent = num_nodes
+                num_nodes += 1
+                add_arc(user_node, parent, 1, 0)
+            for s in slots:
+                if demand[s] > 0:
+                    change_cost = CHANGE_COST if keep is not None and (pos, s) not in keep else 0
+                    arc = add_arc(parent, slot_node[s], 1, rank_cost + change_cost)
+                    assign_arcs.append((arc, pos, s))
+
+    return {
+        'num_nodes': num_nodes,
+        'start': start,
+        'end': end,
+        'capacity': capacity,
+        'cost': cost,
+        'big_m': big_m,
+        'assign_arcs': assign_arcs
+    }
+
+
+def min_cost_flow(num_nodes, start, end, capacity, cost, source, sink, stop_cost):
+    """
+    Successive shortest path voi Dijkstra + potential (chi phi khong am)
+
+    Tang luong cho den khi duong di re nhat co chi phi >= stop_cost
+    (tuc la them 1 don vi khong con loi).
+
+    Returns:
+        list: Luong tren tung cung
+    """
+    m = len(start)
+    to = [0] * (2 * m)
+    rcap = [0] * (2 * m)
+    rcost = [0] * (2 * m)
+    adj = [[] for _ in range(num_nodes)]
+    for i in range(m):
+        f, b = 2 * i, 2 * i + 1
+        to[f], rcap[f], rcost[f] = end[i], capacity[i], cost[i]
+        to[b], rcap[b], rcost[b] = start[i], 0, -cost[i]
+        adj[start[i]].append(f)
+        adj[end[i]].append(b)
+
+    inf = float('inf')
+    potential = [0] * num_nodes
+
+    while True:
+        dist = [inf] * num_nodes
+        prev = [-1] * num_nodes
+        done = [False] * num_nodes
+        dist[source] = 0
+        heap = [(0, source)]
+
+        while heap:
+            d, u = heapq.heappop(heap)
+            if done[u]:
+                continue
+            done[u] = True
+            if u == sink:
+                break
+            pu = potential[u]
+            for e in adj[u]:
+                if rcap[e] > 0:
+                    v = to[e]
+                    nd = d + rcost[e] + pu - potential[v]
+                    if nd < dist[v]:
+                        dist[v] = nd
+                        prev[v] = e
+                        heapq.heappush(heap, (nd, v))
+
+        if not done[sink]:
+            break
+
+        # Cap nhat potential (dung som o sink: nut chua chot lay dist[sink])
+        dsink = dist[sink]
+        for v in range(num_nodes):
+            potential[v] += dist[v] if dist[v] < dsink else dsink
+
+        if potential[sink] - potential[source] >= stop_cost:
+            break
+
+        push = inf
+        v = sink
+        while v != source:
+            e = prev[v]
+            push = min(push, rcap[e])
+            v = to[e ^ 1]
+        v = sink
+        while v != source:
+            e = prev[v]
+            rcap[e] -= push
+            rcap[e ^ 1] += push
+            v = to[e ^ 1]
+
+    return [rcap[2 * i + 1] for i in range(m)]
+
+
+def _solve_ortools(network, total_demand):
+    """Giai bang SimpleMinCostFlow (them cung nguon -> dich chi phi M cho luong du)"""
+    smcf = ortools_min_cost_flow.SimpleMinCostFlow()
+    for u, v, cap, c in zip(network['start'], network['end'], network['capacity'], network['cost']):
+        smcf.add_arc_with_capacity_and_unit_cost(u, v, cap, c)
+    bypass = smcf.add_arc_with_capacity_and_unit_cost(SOURCE, SINK, total_demand, network['big_m'])
+    for node in range(network['num_nodes']):
+        smcf.set_node_supply(node, 0)
+    smcf.set_node_supply(SOURCE, total_demand)
+    smcf.set_node_supply(SINK, -total_demand)
+
+    status = smcf.solve()
+    if status != smcf.OPTIMAL:
+        raise RuntimeError(f'OR-tools min cost flow status {status}')
+    return [smcf.flow(arc) for arc in range(bypass)]
+
+
+def _repair_and_days(requests, assigned, demand, values, limits):
+    """
+    Dam bao ngay "va" duoc xep du tat ca ca hoac khong ca nao
+
+    assigned: list set(slot) theo vi tri NV (sua tai cho)
+    limits: So ca toi da con nhan duoc cua tung NV
+    """
+    filled = [0] * SLOTS
+    for slots in assigned:
+        for s in slots:
+            filled[s] += 1
+
+    freed = set()
+    for pos, request in enumerate(requests):
+        for day, slots, is_and in _day_slots(request):
+            if not is_and:
+                continue
+            got = [s for s in slots if s in assigned[pos]]
+            if not got or len(got) == len(slots):
+                continue
+            missing = [s for s in slots if s not in assigned[pos]]
+            room = limits[pos] - len(assigned[pos])
+            if len(missing) <= room and all(filled[s] < demand[s] for s in missing):
+                # Bu them ca con thieu (ca con cho)
+                for s in missing:
+                    assigned[pos].add(s)
+                    filled[s] += 1
+            else:
+                # Bo ca le, de lap lai bang NV khac
+                for s in got:
+                    assigned[pos].discard(s)
+                    filled[s] -= 1
+                    freed.add(s)
+
+    if freed:
+        _greedy_fill(requests, assigned, filled, demand, values, limits,
+                     only_slots=freed)
+
+
+def _conflicting(a, b, conflicts):
+    """2 ca (slot) cua cung 1 NV vi pham rang buoc: conflicts = {(lech ngay, ca truoc, ca sau)}"""
+    day_a, shift_a = divmod(a, SHIFTS)
+    day_b, shift_b = divmod(b, SHIFTS)
+    delta = day_b - day_a
+    return (delta, shift_a, shift_b) in conflicts or (-delta, shift_b, shift_a) in conflicts
+
+
+def _rule_checker(assigned, rules, base_slots=None):
+    """Ham fits(pos, slots): NV pos nhan them cac ca slots co giu duoc rules khong"""
+    if rules is None:
+        return None
+    hours = rules['shift_hours']
+    conflicts = {tuple(item) for item in rules['conflicts']}
+
+    def fits(pos, slots):
+        current = (assigned[pos] | base_slots[pos]) if base_slots else assigned[pos]
+        total = sum(hours[s % SHIFTS] for s in current) + sum(hours[s % SHIFTS] for s in slots)
+        if total > rules['max_hours'] + 1e-9:
+            return False
+        return not any(_conflicting(s, other, conflicts) for s in slots for other in current)
+
+    return fits
+
+
+def _enforce_rules(requests, assigned, demand, values, limits, rules, base_slots=None):
+    """
+    Bo cac ca vi pham rules (nghi giua ca, trung gio, gio/tuan) roi lap lai cho trong
+
+    Ca ngay "va" bo cung nhau. Uu tien bo ca co gia tri phu song thap, ca muon hon.
+    """
+    hours = rules['shift_hours']
+    conflicts = {tuple(item) for item in rules['conflicts']}
+    filled = [0] * SLOTS
+    for slots in assigned:
+        for s in slots:
+            filled[s] += 1
+
+    freed = set()
+    for pos, request in enumerate(requests):
+        if not assigned[pos]:
+            continue
+        base = base_slots[pos] if base_slots else set()
+        units = {}
+        for day, slots, is_and in _day_slots(request):
+            for s in slots:
+                units[s] = tuple(slots) if is_and else (s,)
+
+        def unit(s):
+            return [x for x in units.get(s, (s,)) if x in assigned[pos]]
+
+        def drop(slots):
+            for s in slots:
+                assigned[pos].discard(s)
+                filled[s] -= 1
+                freed.add(s)
+
+        def cost(slots):
+            return sum(values[s] for s in slots), -max(slots)
+
+        while True:
+            pair = next(((a, b) for a in sorted(assigned[pos]) for b in sorted(assigned[pos] | base)
+                         if a != b and _conflicting(a, b, conflicts)), None)
+            if pair is None:
+                break
+            a, b = pair
+            if b in base:
+                drop(unit(a))
+            else:
+                drop(min(unit(a), unit(b), key=cost))
+
+        while assigned[pos] and sum(hours[s % SHIFTS] for s in assigned[pos] | base) > rules['max_hours'] + 1e-9:
+            drop(min((unit(s) for s in assigned[pos]), key=cost))
+
+    if freed:
+        _greedy_fill(requests, assigned, filled, demand, values, limits, only_slots=freed,
+                     fits=_rule_checker(assigned, rules, base_slots))
+
+
+def _greedy_fill(requests, assigned, filled, demand, values, limits, only_slots=None, fits=None):
+    """Lap cho trong theo thu tu dang ky, ca gio dong truoc (fits: kiem tra rules)"""
+    for pos, request in enumerate(requests):
+        for day, slots, is_and in sorted(
+                _day_slots(request),
+                key=lambda item: -max(values[s] for s in item[1])):
+            if len(assigned[pos]) >= limits[pos]:
+                break
+            if any(s in assigned[pos] for s in slots):
+                continue
+            if is_and:
+                if only_slots is not None and not any(s in only_slots for s in slots):
+                    continue
+                if len(assigned[pos]) + len(slots) <= limits[pos] and \
+                        all(filled[s] < demand[s] for s in slots) and \
+                        (fits is None or fits(pos, slots)):
+                    for s in slots:
+                        assigned[pos].add(s)
+                        filled[s] += 1
+            else:
+                candidates = [s for s in slots if filled[s] < demand[s]
+                              and (only_slots is None or s in only_slots)
+                              and (fits is None or fits(pos, [s]))]
+                if candidates:
+                    best = max(candidates, key=lambda s: (values[s], demand[s] - filled[s]))
+                    assigned[pos].add(best)
+                    filled[best] += 1
+
+
+def solve_schedule(requests, demand, weights=None, max_shifts=DEFAULT_MAX_SHIFTS, backend='auto',
+                   base_counts=None, keep=None, rules=None, base_slots=None):
+    """
+    Xep lich 1 tuan
+
+    Args:
+        requests: List dict {'user_id': int, 'days': {day: ([shift...], is_and)}},
+                  sap xep theo thu tu gui dang ky (day 0-6, shift 0-2)
+        demand: List 21 so NV can cho moi ca (index = day * 3 + shift)
+        weights: List 21 trong so phu song (None = deu 1; ca gio dong > 1)
+        max_shifts: So ca toi da moi NV/tuan
+        backend: 'auto', 'flow', 'ortools' hoac 'greedy'
+        base_counts: So ca NV da co ngoai bai toan nay (theo thu tu requests)
+        keep: Tap (vi tri NV, slot) dang xep, uu tien giu nguyen
+        rules: {'shift_hours': [gio 3 ca], 'max_hours', 'conflicts': [(lech ngay, ca, ca)]}
+               (None = khong kiem tra; xem validator.solver_rules)
+        base_slots: List set(slot) ca NV da co ngoai bai toan (tinh vao rules)
+
+    Returns:
+        dict: {'assignments': {user_id: [(day, shift)]}, 'filled': List 21,
+               'unfilled': [(day, shift, thieu)], 'backend': str, 'solve_time': float}
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f'Backend khong hop le: {backend}')
+
+    started = time.perf_counter()
+    demand = [max(int(d), 0) for d in demand]
+    weights = weights or [1] * SLOTS
+    values = [int(round(COVERAGE_VALUE * w)) for w in weights]
+    max_shifts = DEFAULT_MAX_SHIFTS if max_shifts is None else max_shifts
+    limits = [max_shifts - (base_counts[pos] if base_counts else 0) for pos in range(len(requests))]
+    assigned = [set() for _ in requests]
+
+    used = backend
+    if backend == 'auto':
+        used = 'ortools' if ortools_min_cost_flow is not None else 'flow'
+    if used == 'ortools' and ortools_min_cost_flow is None:
+        used = 'flow'
+
+    if used != 'greedy':
+        try:
+            network = build_network(requests, demand, values, max_shifts, base_counts, keep)
+            if used == 'ortools':
+                flows = _solve_ortools(network, sum(demand))
+            else:
+                flows = min_cost_flow(
+                    network['num_nodes'], network['start'], network['end'],
+                    network['capacity'], network['cost'], SOURCE, SINK, network['big_m']
+                )
+            for arc, pos, s in network['assign_arcs']:
+                if flows[arc] > 0:
+                    assigned[pos].add(s)
+            _repair_and_days(requests, assigned, demand, values, limits)
+        except (RuntimeError, MemoryError):
+            if backend != 'auto':
+                raise
+            used = 'greedy'
+            assigned = [set() for _ in requests]
+
+    if used == 'greedy':
+        filled = [0] * SLOTS
+        _greedy_fill(requests, assigned, filled, demand, values, limits,
+                     fits=_rule_checker(assigned, rules, base_slots))
+    if rules is not None:
+        _enforce_rules(requests, assigned, demand, values, limits, rules, base_slots)
+
+    filled = [0] * SLOTS
+    assignments = {}
+    for request, slots in zip(requests, assigned):
+        if slots:
+            assignments[request['user_id']] = [divmod(s, SHIFTS) for s in sorted(slots)]
+        for s in slots:
+            filled[s] += 1
+
+    return {
+        'assignments': assignments,
+        'filled': filled,
+        'unfilled': [(s // SHIFTS, s % SHIFTS, demand[s] - filled[s])
+                     for s in range(SLOTS) if filled[s] < demand[s]],
+        'backend': used,
+        'solve_time': time.perf_counter() - started
+    }
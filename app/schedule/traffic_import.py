@@ -0,0 +1,292 @@
+"""
+Import du lieu luong khach tu iPOS (CSV / XLSX) vao CustomerTraffic
+
+- Doc file theo dong (csv.reader / openpyxl read_only), khong nap ca file vao bo nho
+- Ho tro 2 dang:
+  1. Tong hop: | Ngay | Gio ("9h-10h", "09:00", 9) | So bill |
+  2. Tung bill: | Thoi gian (ngay + gio) | ... (moi dong = 1 bill)
+- Cong don bill theo (ngay, gio) roi upsert theo lo (INSERT ... ON CONFLICT)
+- Danh dau is_peak_hour bang 1 lan tinh percentile (NumPy) cho ca khoang ngay
+"""
+
+import csv
+import os
+import time as timer
+import unicodedata
+from collections import defaultdict
+from datetime import datetime, time, date as date_type
+import numpy as np
+from flask import current_app
+from sqlalchemy import update
+from app.attendance.import_handler import parse_date
+from app.models import CustomerTraffic, db
+from app.schedule.persistence import CHUNK_SIZE
+
+
+PEAK_PERCENTILE = 75  # Gio co bill >= percentile 75 trong ngay la gio dong
+
+DATE_HEADERS = {'ngay', 'date', 'ngay ban', 'ngay giao dich'}
+HOUR_HEADERS = {'gio', 'hour', 'khung gio', 'hour_segment', 'gio ban'}
+BILL_HEADERS = {'so bill', 'bill', 'bill_count', 'so hoa don', 'hoa don', 'so don'}
+DATETIME_HEADERS = {'thoi gian', 'datetime', 'ngay gio', 'created_at', 'thoi gian ban'}
+
+ALLOWED_EXTENSIONS = {'csv', 'xlsx'}
+
+
+def normalize_header(value):
+    """'Số Bill ' -> 'so bill' (bo dau, chu thuong)"""
+    text = str(value or '').strip().lower().replace('đ', 'd')
+    text = unicodedata.normalize('NFD', text)
+    return ''.join(ch for ch in text if unicodedata.category(ch) != 'Mn')
+
+
+def parse_hour(value):
+    """9, '9', '9h-10h', '09:00', time(9, 30), datetime -> 9 (None neu khong doc duoc)"""
+    if isinstance(value, (datetime, time)):
+        return value.hour
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        hour = int(value)
+    else:
+        text = str(value or '').strip().lower()
+        for sep in ('h', ':', '-'):
+            text = text.split(sep)[0]
+        try:
+            hour = int(text)
+        except ValueError:
+            return None
+    return hour if 0 <= hour < 24 else None
+
+
+def parse_datetime(value):
+    """Gia tri o 'Thoi gian' -> (date, hour)"""
+    if isinstance(value, datetime):
+        return value.date(), value.hour
+    text = str(value or '').strip()
+    for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%d/%m/%Y %H:%M:%S', '%d/%m/%Y %H:%M'):
+        try:
+            parsed = datetime.strptime(text, fmt)
+            return parsed.date(), parsed.hour
+        except ValueError:
+            continue
+    return None, None
+
+
+def iter_rows(file_path):
+    """Doc tung dong cua file CSV / XLSX (generator)"""
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext == '.csv':
+        with open(file_path, newline='', encoding='utf-8-sig') as f:
+            sample = f.read(4096)
+            f.seek(0)
+            try:
+                dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+            except csv.Error:
+                dialect = csv.excel
+            yield from csv.reader(f, dialect)
+    elif ext == '.xlsx':
+        from openpyxl import load_workbook
+        wb = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            yield from wb.active.iter_rows(values_only=True)
+        finally:
+            wb.close()
+    else:
+        raise ValueError(f'Dinh dang file khong ho tro: {ext}')
+
+
+def detect_columns(header):
+    """Tim vi tri cac cot tu dong tieu de; None neu khong nhan dien duoc"""
+    columns = {}
+    for index, value in enumerate(header):
+        name = normalize_header(value)
+        for key, names in (('date', DATE_HEADERS), ('hour', HOUR_HEADERS),
+                           ('bills', BILL_HEADERS), ('datetime', DATETIME_HEADERS)):
+            if name in names and key not in columns:
+                columns[key] = index
+    if 'datetime' in columns or ('date' in columns and 'hour' in columns):
+        return columns
+    return None
+
+
+def aggregate_traffic(rows, year=None):
+    """
+    Cong don so bill theo (ngay, gio)
+
+    Returns:
+        tuple: (dict {(date, hour): bills}, so dong da doc, list loi)
+    """
+    header = next(rows, None)
+    columns = detect_columns(header or [])
+    if columns is None:
+        return {}, 0, ['Khong nhan dien duoc cot Ngay / Gio trong dong tieu de']
+
+    totals = defaultdict(int)
+    date_cache = {}
+    errors = []
+    read = 0
+    for line, row in enumerate(rows, start=2):
+        if not row or all(cell in (None, '') for cell in row):
+            continue
+        read += 1
+        try:
+            if 'date' in columns and 'hour' in columns:
+                raw_date = row[columns['date']]
+                if isinstance(raw_date, str):
+                    # File iPOS lap lai cung 1 ngay nhieu dong: parse 1 lan
+                    if raw_date not in date_cache:
+                        date_cache[raw_date] = parse_date(raw_date, 'auto', year)
+                    day = date_cache[raw_date]
+                else:
+                    day = parse_date(raw_date, 'auto', year)
+                hour = parse_hour(row[columns['hour']])
+            else:
+                day, hour = parse_datetime(row[columns['datetime']])
+
+            if 'bills' in columns:
+                bills = int(float(row[columns['bills']] or 0))
+            else:
+                bills = 1  # Moi dong la 1 bill
+        except (IndexError, ValueError, TypeError):
+            day, hour, bills = None, None, 0
+
+        if not isinstance(day, date_type) or hour is None:
+            if len(errors) < 20:
+                errors.append(f'Dong {line}: khong doc duoc ngay/gio')
+            continue
+        totals[(day, hour)] += bills
+
+    return totals, read, errors
+
+
+def _upsert_statement(chunk):
+    """INSERT ... ON CONFLICT (date, hour) DO UPDATE; None neu CSDL khong ho tro"""
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        return None
+
+    stmt = insert(CustomerTraffic).values(chunk)
+    return stmt.on_conflict_do_update(
+        index_elements=['date', 'hour'],
+        set_={'bill_count': stmt.excluded.bill_count, 'hour_segment': stmt.excluded.hour_segment}
+    )
+
+
+def upsert_traffic(totals):
+    """Ghi so bill theo lo; (ngay, gio) da co thi ghi de so bill"""
+    rows = [{
+        'date': day,
+        'hour': hour,
+        'hour_segment': f'{hour}h-{hour + 1}h',
+        'bill_count': bills,
+        'is_peak_hour': False
+    } for (day, hour), bills in sorted(totals.items())]
+
+    for i in range(0, len(rows), CHUNK_SIZE):
+        chunk = rows[i:i + CHUNK_SIZE]
+        stmt = _upsert_statement(chunk)
+        if stmt is None:
+            # CSDL khong ho tro ON CONFLICT: xoa cac (ngay, gio) trung roi insert
+            for day, hours in _group_hours(chunk).items():
+                CustomerTraffic.query.filter(
+                    CustomerTraffic.date == day, CustomerTraffic.hour.in_(hours)
+                ).delete(synchronize_session=False)
+            db.session.execute(CustomerTraffic.__table__.insert(), chunk)
+        else:
+            db.session.execute(stmt)
+    return len(rows)
+
+
+def _group_hours(chunk):
+    grouped = defaultdict(list)
+    for row in chunk:
+        grouped[row['date']].append(row['hour'])
+    return grouped
+
+
+def update_peak_hours(start_date, end_date, percentile=None):
+    """
+    Danh dau gio dong cho cac ngay trong khoang: bill >= percentile cua ngay do
+
+    Returns:
+        int: So gio dong
+    """
+    if percentile is None:
+        percentile = current_app.config.get('TRAFFIC_PEAK_PERCENTILE', PEAK_PERCENTILE)
+
+    rows = db.session.query(
+        CustomerTraffic.id, CustomerTraffic.date, CustomerTraffic.hour,
+        CustomerTraffic.bill_count, CustomerTraffic.is_peak_hour
+    ).filter(
+        CustomerTraffic.date >= start_date,
+        CustomerTraffic.date <= end_date,
+        CustomerTraffic.hour.isnot(None)
+    ).all()
+    if not rows:
+        return 0
+
+    ids = np.array([row.id for row in rows])
+    bills = np.array([row.bill_count or 0 for row in rows], dtype=float)
+    offsets = np.array([(row.date - start_date).days for row in rows])
+    hours = np.array([row.hour for row in rows])
+    current = np.array([bool(row.is_peak_hour) for row in rows])
+
+    # Ma tran [ngay co du lieu, 24 gio], percentile theo tung ngay
+    days, day_index = np.unique(offsets, return_inverse=True)
+    matrix = np.full((len(days), 24), np.nan)
+    matrix[day_index, hours] = bills
+    thresholds = np.nanpercentile(matrix, percentile, axis=1)
+    is_peak = (bills >= thresholds[day_index]) & (bills > 0)
+
+    changed = np.nonzero(is_peak != current)[0]
+    if len(changed):
+        db.session.execute(update(CustomerTraffic), [
+            {'id': int(ids[i]), 'is_peak_hour': bool(is_peak[i])} for i in changed
+        ])
+    return int(is_peak.sum())
+
+
+def import_traffic_file(file_path, year=None):
+    """
+    Import file iPOS: doc, cong don, upsert, danh dau gio dong (1 transaction)
+
+    Returns:
+        dict: {'success', 'rows', 'slots', 'peak_hours', 'start', 'end', 'errors', 'elapsed'}
+    """
+    from app.schedule.forecast import invalidate_forecasts
+
+    started = timer.perf_counter()
+    try:
+        totals, read, errors = aggregate_traffic(iter_rows(file_path), year)
+    except (ValueError, OSError, UnicodeDecodeError) as e:
+        return {'success': False, 'errors': [f'Khong the doc file: {str(e)}']}
+
+    if not totals:
+        return {'success': False, 'rows': read, 'errors': errors or ['File khong co du lieu']}
+
+    start_date = min(day for day, _ in totals)
+    end_date = max(day for day, _ in totals)
+    try:
+        slots = upsert_traffic(totals)
+        peak_hours = update_peak_hours(start_date, end_date)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    # Lich su luong khach thay doi: du bao cac tuan sau phai tinh lai
+    invalidate_forecasts(start_date)
+
+    return {
+        'success': True,
+        'rows': read,
+        'slots': slots,
+        'peak_hours': peak_hours,
+        'start': start_date,
+        'end': end_date,
+        'errors': errors,
+        'elapsed': round(timer.perf_counter() - started, 3)
+    }
@@ -0,0 +1,197 @@
+"""
+Kiem tra rang buoc lich tuan tren WeekRoster (phep toan mang NumPy)
+
+- understaffed: ca it NV hon so can (canh bao)
+- rest_time: nghi giua ca cuoi ngay va ca dau ngay hom sau < SCHEDULE_MIN_REST_HOURS
+- max_hours: tong gio/tuan > SCHEDULE_MAX_WEEKLY_HOURS
+- double_booking: 1 NV co 2 ca trung gio trong ngay, hoac 2 dong ca cung 1 o
+  (vd 2 WorkSchedule cung tuan khi xep theo tung cua hang)
+- double_booking giua cac cua hang: cung 1 o o 2 cua hang, hoac 2 ca trong ngay
+  o 2 cua hang cach nhau < SCHEDULE_STORE_TRANSFER_MINUTES (khong kip di chuyen)
+
+Moi rang buoc la 1 mask [NV, ngay(, ca)] tinh cung luc cho ca tuan, chi cac
+o vi pham moi duoc chuyen thanh dict.
+"""
+
+from datetime import timedelta
+import numpy as np
+from flask import current_app
+from app.schedule.solver import DAYS, SHIFTS
+from app.schedule.auto_scheduler import SHIFT_ORDER, get_dynamic_shift_times
+from app.schedule.roster import WeekRoster, LAYERS
+
+
+MIN_REST_HOURS = 10
+MAX_WEEKLY_HOURS = 48
+STORE_TRANSFER_MINUTES = 60
+
+DAY_MINUTES = 24 * 60
+
+
+def _minutes(t):
+    return t.hour * 60 + t.minute
+
+
+def _shift_bounds(shift_times):
+    """(bat dau, ket thuc) theo phut tu 0h cho 3 ca; ca qua dem -> ket thuc + 24h"""
+    starts = np.array([_minutes(shift_times[shift_type][0]) for shift_type in SHIFT_ORDER])
+    ends = np.array([_minutes(shift_times[shift_type][1]) for shift_type in SHIFT_ORDER])
+    ends = np.where(ends <= starts, ends + DAY_MINUTES, ends)
+    return starts, ends
+
+
+def solver_rules(shift_times=None, min_rest_hours=None, max_weekly_hours=None):
+    """
+    Rang buoc nghi giua ca / gio toi da / trung gio cho bo giai (cung cach tinh voi validate_roster)
+
+    Returns:
+        dict: {'shift_hours': [gio 3 ca], 'max_hours', 'conflicts': [(lech ngay, ca, ca)]}
+    """
+    config = current_app.config
+    if min_rest_hours is None:
+        min_rest_hours = config.get('SCHEDULE_MIN_REST_HOURS', MIN_REST_HOURS)
+    if max_weekly_hours is None:
+        max_weekly_hours = config.get('SCHEDULE_MAX_WEEKLY_HOURS', MAX_WEEKLY_HOURS)
+    starts, ends = _shift_bounds(shift_times or get_dynamic_shift_times())
+
+    gaps = (starts[None, :] + DAY_MINUTES) - ends[:, None]
+    short = (gaps >= 0) & (gaps < min_rest_hours * 60)
+    overlap = (starts[:, None] < ends[None, :]) & (starts[None, :] < ends[:, None])
+    conflicts = [(1, int(i), int(j)) for i, j in np.argwhere(short)]
+    conflicts += [(0, int(i), int(j)) for i, j in np.argwhere(overlap) if i != j]
+    return {
+        'shift_hours': ((ends - starts) / 60).tolist(),
+        'max_hours': float(max_weekly_hours),
+        'conflicts': conflicts
+    }
+
+
+def _violation(kind, severity, message, user=None, date=None, shift_type=None):
+    return {
+        'type': kind,
+        'severity': severity,
+        'user_id': user['id'] if user else None,
+        'full_name': user['full_name'] if user else None,
+        'date': date.isoformat() if date else None,
+        'shift_type': shift_type.value if shift_type else None,
+        'message': message
+    }
+
+
+def validate_roster(roster, flag, demand=None, shift_times=None, min_rest_hours=None, max_weekly_hours=None):
+    """
+    Kiem tra tat ca rang buoc cua 1 lop lich (vd DRAFT, FINAL | CONFIRMED)
+
+    Args:
+        roster: WeekRoster
+        flag: Co (hoac to hop co) cua lop can kiem tra
+        demand: So NV can moi ca (int hoac list 21); None = bo qua kiem tra thieu nguoi
+        shift_times: Map ShiftType -> (gio bat dau, gio ket thuc) (None = get_dynamic_shift_times())
+
+    Returns:
+        list: [{'type', 'severity', 'user_id', 'full_name', 'date', 'shift_type', 'message'}]
+    """
+    config = current_app.config
+    if min_rest_hours is None:
+        min_rest_hours = config.get('SCHEDULE_MIN_REST_HOURS', MIN_REST_HOURS)
+    if max_weekly_hours is None:
+        max_weekly_hours = config.get('SCHEDULE_MAX_WEEKLY_HOURS', MAX_WEEKLY_HOURS)
+    starts, ends = _shift_bounds(shift_times or get_dynamic_shift_times())
+
+    assigned = roster.mask(flag)  # [NV, ngay, ca]
+    week_start = roster.week_start
+    users = roster.users
+    violations = []
+
+    def day_date(day):
+        return week_start + timedelta(days=int(day))
+
+    # 1. Thieu nguoi
+    if demand is not None:
+        required = np.asarray(demand)
+        required = required.reshape(DAYS, SHIFTS) if required.ndim else np.full((DAYS, SHIFTS), required)
+        coverage = assigned.sum(axis=0)
+        for day, shift in np.argwhere(coverage < required):
+            violations.append(_violation(
+                'understaffed', 'warning',
+                f'{day_date(day)} - {SHIFT_ORDER[shift].value}: Chi co {coverage[day, shift]} nguoi '
+                f'(can {required[day, shift]})',
+                date=day_date(day), shift_type=SHIFT_ORDER[shift]
+            ))
+
+    # 2. Thoi gian nghi giua ca ngay d (ca i) va ngay d+1 (ca j)
+    gaps = (starts[None, :] + DAY_MINUTES) - ends[:, None]  # [ca i, ca j]
+    short = (gaps >= 0) & (gaps < min_rest_hours * 60)
+    for i, j in np.argwhere(short):
+        for user, day in np.argwhere(assigned[:, :-1, i] & assigned[:, 1:, j]):
+            violations.append(_violation(
+                'rest_time', 'error',
+                f'{users[user]["full_name"]}: chi nghi {gaps[i, j] / 60:g} gio giua ca '
+                f'{SHIFT_ORDER[i].value} {day_date(day)} va ca {SHIFT_ORDER[j].value} {day_date(day + 1)} '
+                f'(toi thieu {min_rest_hours:g} gio)',
+                user=users[user], date=day_date(day + 1), shift_type=SHIFT_ORDER[j]
+            ))
+
+    # 3. Tong gio lam trong tuan
+    hours = assigned.sum(axis=1) @ ((ends - starts) / 60)  # [NV]
+    for user in np.nonzero(hours > max_weekly_hours)[0]:
+        violations.append(_violation(
+            'max_hours', 'error',
+            f'{users[user]["full_name"]}: {hours[user]:g} gio/tuan (toi da {max_weekly_hours:g} gio)',
+            user=users[user]
+        ))
+
+    # 4. Trung lich: 2 ca trung gio trong ngay, hoac 2 dong ca cung 1 o
+    overlap = (starts[:, None] < ends[None, :]) & (starts[None, :] < ends[:, None])
+    for i, j in np.argwhere(np.triu(overlap, k=1)):
+        for user, day in np.argwhere(assigned[:, :, i] & assigned[:, :, j]):
+            violations.append(_violation(
+                'double_booking', 'error',
+                f'{users[user]["full_name"]}: ca {SHIFT_ORDER[i].value} va {SHIFT_ORDER[j].value} '
+                f'ngay {day_date(day)} trung gio',
+                user=users[user], date=day_date(day), shift_type=SHIFT_ORDER[j]
+            ))
+
+    stores, store_clash = roster.store_map(flag)
+    duplicated = np.zeros(assigned.shape, dtype=bool)
+    for layer, layer_flag in enumerate(LAYERS):
+        if flag & layer_flag:
+            duplicated |= roster.row_counts[layer] > 1
+    for user, day, shift in np.argwhere(duplicated & ~store_clash):
+        violations.append(_violation(
+            'double_booking', 'error',
+            f'{users[user]["full_name"]}: xep 2 lan ca {SHIFT_ORDER[shift].value} ngay {day_date(day)}',
+            user=users[user], date=day_date(day), shift_type=SHIFT_ORDER[shift]
+        ))
+
+    # 5. Trung lich giua cac cua hang: cung 1 o, hoac 2 ca lien ke khong kip di chuyen
+    for user, day, shift in np.argwhere(assigned & store_clash):
+        violations.append(_violation(
+            'double_booking', 'error',
+            f'{users[user]["full_name"]}: ca {SHIFT_ORDER[shift].value} ngay {day_date(day)} '
+            f'xep o 2 cua hang',
+            user=users[user], date=day_date(day), shift_type=SHIFT_ORDER[shift]
+        ))
+
+    transfer = config.get('SCHEDULE_STORE_TRANSFER_MINUTES', STORE_TRANSFER_MINUTES)
+    between = starts[None, :] - ends[:, None]  # [ca truoc i, ca sau j] cung ngay
+    tight = (between >= 0) & (between < transfer)
+    for i, j in np.argwhere(tight):
+        other_store = (stores[:, :, i] != 0) & (stores[:, :, j] != 0) & (stores[:, :, i] != stores[:, :, j])
+        for user, day in np.argwhere(assigned[:, :, i] & assigned[:, :, j] & other_store):
+            store_i = roster.store_codes.get(int(stores[user, day, i]), stores[user, day, i])
+            store_j = roster.store_codes.get(int(stores[user, day, j]), stores[user, day, j])
+            violations.append(_violation(
+                'double_booking', 'error',
+                f'{users[user]["full_name"]}: ca {SHIFT_ORDER[i].value} o {store_i} va ca '
+                f'{SHIFT_ORDER[j].value} o {store_j} ngay {day_date(day)} cach nhau {between[i, j]:g} phut '
+                f'(can it nhat {transfer:g} phut di chuyen)',
+                user=users[user], date=day_date(day), shift_type=SHIFT_ORDER[j]
+            ))
+
+    return violations
+
+
+def validate_week(week_start_date, flag, demand=None, shift_times=None):
+    """Doc lich tuan (1 query) va kiem tra rang buoc"""
+    return validate_roster(WeekRoster.load(week_start_date), flag, demand, shift_times)
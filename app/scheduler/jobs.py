@@ -8,6 +8,12 @@ Cac job tu dong:
 4. Xep lich tu dong (Chu Nhat, 8h)
 5. Xu ly cham cong hang ngay (19h)
 6. Tinh luong dau thang (Ngay 1, 8h)
+7. Tinh truoc dashboard NV (5h sang hang ngay)
+8. Du bao nhu cau nhan su cac tuan toi (4h30 sang hang ngay)
+9. Gop digest va gui thong bao trong hang doi (moi phut)
+10. Don lich su chay job cu (3h sang hang ngay)
+
+Chay nhieu process: moi job chi chay 1 lan tren ca cum, lich su luu trong bang job_runs.
 """
 
 from apscheduler.schedulers.background import BackgroundScheduler
@@ -21,7 +27,7 @@ def start_scheduler(app):
 
     # Job 1: Mo dang ky lich (Thu 6, 8h sang)
     scheduler.add_job(
-        func=lambda: run_with_context(app, open_schedule_registration),
+        func=lambda: run_with_context(app, open_schedule_registration, 'open_schedule_registration'),
         trigger='cron',
         day_of_week='fri',
         hour=8,
@@ -33,7 +39,7 @@ def start_scheduler(app):
 
     # Job 2: Nhac nho dang ky (Thu 7, 12h trua)
     scheduler.add_job(
-        func=lambda: run_with_context(app, remind_schedule_registration),
+        func=lambda: run_with_context(app, remind_schedule_registration, 'remind_schedule_registration'),
         trigger='cron',
         day_of_week='sat',
         hour=12,
@@ -45,7 +51,7 @@ def start_scheduler(app):
 
     # Job 3: Khoa dang ky (Thu 7, 18h)
     scheduler.add_job(
-        func=lambda: run_with_context(app, close_schedule_registration),
+        func=lambda: run_with_context(app, close_schedule_registration, 'close_schedule_registration'),
         trigger='cron',
         day_of_week='sat',
         hour=18,
@@ -57,7 +63,7 @@ def start_scheduler(app):
 
     # Job 4: Xep lich tu dong (Chu Nhat, 8h sang)
     scheduler.add_job(
-        func=lambda: run_with_context(app, auto_generate_weekly_schedule),
+        func=lambda: run_with_context(app, auto_generate_weekly_schedule, 'auto_generate_schedule'),
         trigger='cron',
         day_of_week='sun',
         hour=8,
@@ -69,7 +75,7 @@ def start_scheduler(app):
 
     # Job 5: Xu ly cham cong hang ngay (19h)
     scheduler.add_job(
-        func=lambda: run_with_context(app, process_daily_attendance_job),
+        func=lambda: run_with_context(app, process_daily_attendance_job, 'process_daily_attendance'),
         trigger='cron',
         hour=19,
         minute=0,
@@ -80,7 +86,7 @@ def start_scheduler(app):
 
     # Job 6: Tinh luong dau thang (Ngay 1, 8h sang)
     scheduler.add_job(
-        func=lambda: run_with_context(app, calculate_monthly_payrolls_job),
+        func=lambda: run_with_context(app, calculate_monthly_payrolls_job, 'calculate_monthly_payrolls'),
         trigger='cron',
         day=1,
         hour=8,
@@ -90,17 +96,101 @@ def start_scheduler(app):
         misfire_grace_time=3600
     )
 
+    # Job 7: Tinh truoc dashboard NV cho ngay moi (5h sang)
+    scheduler.add_job(
+        func=lambda: run_with_context(app, refresh_staff_dashboards_job, 'refresh_staff_dashboards'),
+        trigger='cron',
+        hour=5,
+        minute=0,
+        id='refresh_staff_dashboards',
+        replace_existing=True,
+        misfire_grace_time=3600
+    )
+
+    # Job 8: Du bao nhu cau nhan su tu luong khach (4h30 sang)
+    scheduler.add_job(
+        func=lambda: run_with_context(app, refresh_staffing_forecasts_job, 'refresh_staffing_forecasts'),
+        trigger='cron',
+        hour=4,
+        minute=30,
+        id='refresh_staffing_forecasts',
+        replace_existing=True,
+        misfire_grace_time=3600
+    )
+
+    # Job 9: Gui email / SMS / Zalo trong hang doi (moi phut)
+    # Chi ghi JobRun khi co thong bao duoc nhan (claim nguyen tu, chay lap an toan)
+    scheduler.add_job(
+        func=lambda: run_with_context(app, deliver_notifications_job, 'deliver_notifications',
+                                      record_empty=False),
+        trigger='interval',
+        minutes=1,
+        # Canh dau phut: moi process kich hoat cung moc lich
+        start_date=datetime.now().replace(second=0, microsecond=0),
+        id='deliver_notifications',
+        replace_existing=True,
+        max_instances=1,
+        coalesce=True
+    )
+
+    # Job 10: Don lich su chay job cu (3h sang)
+    scheduler.add_job(
+        func=lambda: run_with_context(app, prune_job_runs_job, 'prune_job_runs'),
+        trigger='cron',
+        hour=3,
+        minute=0,
+        id='prune_job_runs',
+        replace_existing=True,
+        misfire_grace_time=3600
+    )
+
     scheduler.start()
     app.logger.info('Background scheduler started')
 
 
-def run_with_context(app, func):
-    """Chay function trong Flask app context"""
+def run_with_context(app, func, job_id=None, record_empty=True):
+    """
+    Chay function trong Flask app context
+
+    Moi process (gunicorn worker) deu co scheduler: job chi chay o process lay duoc
+    khoa va moc lich chua co JobRun (app/scheduler/runner.py). Job tra ve so ban ghi
+    da xu ly; thoi gian, bo nho, traceback loi ghi vao JobRun (xem /logs/jobs).
+    record_empty=False: bo qua JobRun cua lan chay khong xu ly ban ghi nao.
+    """
+    from app.scheduler.runner import run_exclusive
+
+    job_id = job_id or func.__name__
     with app.app_context():
         try:
-            func()
+            run_exclusive(job_id, func, slot=_job_slot(job_id), record_empty=record_empty)
         except Exception as e:
-            app.logger.error(f'Scheduler job error: {str(e)}')
+            app.logger.exception(f'Scheduler job error ({job_id}): {str(e)}')
+
+
+def scheduled_fire_time(trigger, now, window):
+    """
+    Lan kich hoat theo lich gan nhat <= now (tim trong khoang `window` truoc now)
+
+    Tinh tu trigger nen moi process ra cung 1 gia tri, khong phu thuoc luc job thuc su
+    chay (process kich hoat luc 19:00:59 va 19:01:00 deu ra 19:00).
+    """
+    fire_time = trigger.get_next_fire_time(None, now - window)
+    latest = None
+    while fire_time is not None and fire_time <= now:
+        latest = fire_time
+        fire_time = trigger.get_next_fire_time(latest, latest + timedelta(microseconds=1))
+    return latest
+
+
+def _job_slot(job_id):
+    """Moc lich JobRun cua lan chay nay (gio dia phuong, khong tz); None = khong tim thay job"""
+    job = scheduler.get_job(job_id)
+    if job is None:
+        return None
+    now = datetime.now(job.trigger.timezone)
+    window = timedelta(seconds=max(job.misfire_grace_time or 0, 60))
+    fire_time = scheduled_fire_time(job.trigger, now, window)
+    return fire_time.replace(tzinfo=None, second=0, microsecond=0) if fire_time else None
 
 
 def open_schedule_registration():
@@ -113,17 +203,20 @@ def open_schedule_registration():
     # Lay tat ca nhan vien active
     users = User.query.filter_by(status='active', role=UserRole.STAFF).all()
 
-    # Gui email thong bao
-    send_schedule_registration_email(users)
+    # Xep email thong bao vao hang doi (Job 9 gui)
+    today = datetime.now().date()
+    next_monday = today + timedelta(days=7 - today.weekday())
+    queued = send_schedule_registration_email(users, next_monday)
 
-    print(f'[{datetime.now()}] Sent registration email to {len(users)} users')
+    print(f'[{datetime.now()}] Queued registration email to {queued} users')
+    return queued
 
 
 def remind_schedule_registration():
     """Gui nhac nho cho NV chua dang ky"""
     from app.models import User, WorkSchedule, UserRole, ScheduleStatus
     from app.notifications.email_sender import send_schedule_reminder_email
-    from app.notifications.sms_sender import send_schedule_reminder_sms
+    from app.notifications.sms_sender import queue_schedule_reminder_sms
 
     print(f'[{datetime.now()}] Checking schedule registration...')
 
@@ -149,13 +242,13 @@ def remind_schedule_registration():
         ~User.id.in_(registered_user_ids) if registered_user_ids else True
     ).all()
 
-    # Gui nhac nho
+    # Xep nhac nho (email + SMS) vao hang doi
     if not_registered:
-        send_schedule_reminder_email(not_registered)
-        for user in not_registered:
-            send_schedule_reminder_sms(user)
+        send_schedule_reminder_email(not_registered, next_monday)
+        queue_schedule_reminder_sms(not_registered, next_monday)
 
-    print(f'[{datetime.now()}] Sent reminder to {len(not_registered)} users')
+    print(f'[{datetime.now()}] Queued reminder to {len(not_registered)} users')
+    return len(not_registered)
 
 
 def close_schedule_registration():
@@ -182,11 +275,13 @@ def close_schedule_registration():
 
     db.session.commit()
     print(f'[{datetime.now()}] Locked {len(drafts)} draft schedules')
+    return len(drafts)
 
 
 def auto_generate_weekly_schedule():
-    """Chay thuat toan xep lich tu dong"""
-    from app.schedule.auto_scheduler import auto_generate_schedule
+    """Chay thuat toan xep lich tu dong (cac tuan toi, tung cua hang)"""
+    from flask import current_app
+    from app.schedule.batch import generate_schedules_batch, week_range
 
     print(f'[{datetime.now()}] Generating weekly schedule...')
 
@@ -197,30 +292,39 @@ def auto_generate_weekly_schedule():
         days_until_monday = 7
     next_monday = today + timedelta(days=days_until_monday)
 
+    weeks = current_app.config.get('AUTO_SCHEDULE_WEEKS_AHEAD', 1)
     try:
-        result = auto_generate_schedule(next_monday)
-        print(f'[{datetime.now()}] Schedule generated: {result}')
+        # Giai trong process: khong tao process pool tu thread cua scheduler
+        result = generate_schedules_batch(week_range(next_monday, weeks), workers=1)
+        for item in result['problems']:
+            print(f'[{datetime.now()}] Store {item["store_id"]} week {item["week_start"]}: '
+                  f'{item["total_shifts"]} shifts, solved in {item["solve_time"]}s')
+        print(f'[{datetime.now()}] Schedule generated: {result["total_shifts"]} shifts in {result["elapsed"]}s')
+        return result['total_shifts']
     except Exception as e:
         print(f'[{datetime.now()}] Error generating schedule: {str(e)}')
+        raise
 
 
 def process_daily_attendance_job():
-    """Xu ly cham cong va di muon hang ngay"""
-    from app.attendance.late_checker import process_daily_attendance
+    """Xu ly di muon tu moc da xu ly den hom nay (bu ca cac ngay bi lo)"""
+    from app.attendance.late_checker import process_pending_attendance
+    from app.dashboard.staff_snapshot import refresh_staff_snapshots
 
     print(f'[{datetime.now()}] Processing daily attendance...')
 
-    today = datetime.now().date()
-    result = process_daily_attendance(today)
+    result = process_pending_attendance()
+    if result['processed'] > 0:
+        refresh_staff_snapshots(result['user_ids'])
 
-    print(f'[{datetime.now()}] Processed {result["processed"]} late records')
+    print(f'[{datetime.now()}] Processed {result["processed"]} late records '
+          f'({result["start"]} -> {result["end"]}), watermark {result["watermark"]}')
+    return result['processed']
 
 
 def calculate_monthly_payrolls_job():
-    """Tinh luong cho tat ca NV"""
-    from app.payroll.calculator import calculate_all_payrolls
-    from app.notifications.email_sender import send_payslip_email
-    from app.models import User
+    """Tinh luong cho tat ca NV (theo lo, chay lai thi tiep tuc tu checkpoint)"""
+    from app.payroll.pipeline import run_payroll
 
     print(f'[{datetime.now()}] Calculating monthly payrolls...')
 
@@ -233,12 +337,60 @@ def calculate_monthly_payrolls_job():
         month = today.month - 1
         year = today.year
 
-    payrolls = calculate_all_payrolls(month, year)
+    # Tinh luong -> luu -> PDF -> xep email phieu luong, checkpoint tung NV
+    result = run_payroll(month, year)
+
+    print(f'[{datetime.now()}] Payroll run {result["run_id"]}: {result["queued"]}/{result["total"]} users done, '
+          f'{result["failed"]} pending/failed, {result["elapsed"]}s')
+    if result['status'] != 'done':
+        raise RuntimeError(f'Payroll run {result["run_id"]} chua xong: {result["failed"]} NV loi')
+    return result['processed']
+
+
+def refresh_staff_dashboards_job():
+    """Tinh truoc snapshot dashboard cho tat ca NV active"""
+    from app.dashboard.staff_snapshot import refresh_staff_snapshots
+
+    print(f'[{datetime.now()}] Refreshing staff dashboard snapshots...')
+
+    count = refresh_staff_snapshots()
+
+    print(f'[{datetime.now()}] Refreshed {count} staff dashboard snapshots')
+    return count
+
+
+def refresh_staffing_forecasts_job():
+    """Tinh truoc du bao so NV moi ca cho cac tuan sap xep lich"""
+    from flask import current_app
+    from app.schedule.batch import week_range
+    from app.schedule.forecast import refresh_forecasts
+
+    print(f'[{datetime.now()}] Refreshing staffing forecasts...')
+
+    today = datetime.now().date()
+    next_monday = today + timedelta(days=7 - today.weekday())
+    weeks = current_app.config.get('AUTO_SCHEDULE_WEEKS_AHEAD', 1)
+    count = refresh_forecasts(week_range(next_monday, weeks))
+
+    print(f'[{datetime.now()}] Refreshed {count} staffing forecasts')
+    return count
+
+
+def deliver_notifications_job():
+    """Gop digest het cua so, gui cac thong bao den han (email theo lo, SMS / Zalo song song)"""
+    from app.notifications.outbox import deliver_all
+
+    result = deliver_all()
+    if result['claimed']:
+        print(f'[{datetime.now()}] Notifications: {result["sent"]} sent, '
+              f'{result["retry"]} retry, {result["failed"]} failed')
+    return result['claimed']
+
 
-    # Gui email phieu luong
-    for payroll in payrolls:
-        user = User.query.get(payroll.user_id)
-        if user:
-            send_payslip_email(user, payroll)
+def prune_job_runs_job():
+    """Xoa lich su chay job qua JOB_RUN_RETENTION_DAYS ngay"""
+    from app.scheduler.runner import prune_runs
 
-    print(f'[{datetime.now()}] Calculated payroll for {len(payrolls)} users')
+    deleted = prune_runs()
+    print(f'[{datetime.now()}] Pruned {deleted} job runs')
+    return deleted
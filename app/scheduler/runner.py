@@ -0,0 +1,290 @@
+"""
+Chay background job dung 1 lan tren ca cum process
+
+create_app khoi dong scheduler o moi process (gunicorn N worker -> N scheduler).
+Moi lan job kich hoat:
+1. Lay khoa theo job_id (khong cho): PostgreSQL pg_try_advisory_lock, MySQL GET_LOCK,
+   CSDL khac (SQLite, 1 may) flock file trong JOB_LOCK_DIR. Khong lay duoc -> process
+   khac dang chay, bo qua
+2. Ghi JobRun (job_id, moc lich) - unique: moc lich la lan kich hoat theo trigger
+   (jobs._job_slot), khong phai luc job chay, nen process kich hoat tre sang phut sau
+   sau khi process dau da chay xong cung khong chay lai
+3. Chay job, ghi ket qua: success / failed, thoi gian, so ban ghi (job tra ve int),
+   bo nho dinh (tracemalloc, chi khi bat JOB_TRACK_MEMORY), traceback khi loi
+
+Job chay day (vd gui thong bao moi phut) dung record_empty=False: chi ghi JobRun
+khi job xu ly > 0 ban ghi hoac loi, lan chay rong chi dua vao khoa (1440 dong /
+ngay khong lan at /logs/jobs va job_stats).
+
+job_stats(): thong ke theo job va theo ngay (trang admin /logs/jobs) de thay job
+cham dan khi du lieu tang.
+"""
+
+import os
+import socket
+import threading
+import time
+import traceback
+import tracemalloc
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import text, update, delete, func, case
+from sqlalchemy.exc import IntegrityError
+from app.models import JobRun, db
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+def _lock_key(job_id):
+    """Khoa so nguyen on dinh giua cac process (hash() cua Python doi theo process)"""
+    return zlib.crc32(f'hr-job:{job_id}'.encode())
+
+
+@contextmanager
+def _db_lock(job_id, acquire_sql, release_sql, params):
+    conn = db.engine.connect()
+    try:
+        acquired = bool(conn.execute(text(acquire_sql), params).scalar())
+        conn.commit()
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                conn.execute(text(release_sql), params)
+                conn.commit()
+    finally:
+        conn.close()
+
+
+@contextmanager
+def _file_lock(job_id):
+    lock_dir = current_app.config.get('JOB_LOCK_DIR') or 'instance'
+    os.makedirs(lock_dir, exist_ok=True)
+    with open(os.path.join(lock_dir, f'job-{job_id}.lock'), 'a') as f:
+        if fcntl is None:
+            yield True
+            return
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def job_lock(job_id):
+    """
+    Khoa chay job (context manager, khong cho), tra ve True neu lay duoc
+
+    Khoa giu trong suot thoi gian chay job; process chet thi CSDL / OS tu nha khoa.
+    """
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        return _db_lock(job_id, 'SELECT pg_try_advisory_lock(:key)', 'SELECT pg_advisory_unlock(:key)',
+                        {'key': _lock_key(job_id)})
+    if dialect in ('mysql', 'mariadb'):
+        return _db_lock(job_id, 'SELECT GET_LOCK(:name, 0)', 'SELECT RELEASE_LOCK(:name)',
+                        {'name': f'hr-job:{job_id}'})
+    return _file_lock(job_id)
+
+
+def _start_run(job_id, slot, started_at=None):
+    """Ghi JobRun 'running'; None neu moc lich nay da co process khac chay"""
+    try:
+        run_id = db.session.execute(JobRun.__table__.insert().values(
+            job_id=job_id,
+            scheduled_for=slot,
+            status='running',
+            host=f'{socket.gethostname()}:{os.getpid()}',
+            started_at=started_at or datetime.utcnow()
+        )).inserted_primary_key[0]
+        db.session.commit()
+        return run_id
+    except IntegrityError:
+        db.session.rollback()
+        return None
+
+
+class _MemoryTracker:
+    """
+    Do bo nho dinh bang tracemalloc (dung chung giua cac job chay song song trong
+    process: bat khi job dau bat dau, tat khi job cuoi xong; dinh la cua ca process)
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.active = 0
+        self.owned = False
+
+    def start(self):
+        with self.lock:
+            if self.active == 0:
+                self.owned = not tracemalloc.is_tracing()
+                if self.owned:
+                    tracemalloc.start()
+                else:
+                    tracemalloc.reset_peak()
+            self.active += 1
+            return tracemalloc.get_traced_memory()[0]
+
+    def stop(self, baseline):
+        with self.lock:
+            peak = tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else 0
+            self.active -= 1
+            if self.active == 0 and self.owned:
+                tracemalloc.stop()
+        return max(peak - baseline, 0) // 1024
+
+
+_memory = _MemoryTracker()
+
+
+def _finish_run(run_id, status, started, rows=None, peak_kb=None, error=None):
+    db.session.execute(
+        update(JobRun).where(JobRun.id == run_id).values(
+            status=status,
+            finished_at=datetime.utcnow(),
+            duration_ms=int((time.perf_counter() - started) * 1000),
+            rows_processed=rows,
+            peak_memory_kb=peak_kb,
+            error=error
+        ),
+        execution_options={'synchronize_session': False}
+    )
+    db.session.commit()
+
+
+def run_exclusive(job_id, func, slot=None, record_empty=True):
+    """
+    Chay func neu process nay giu khoa va moc lich chua chay (trong app context)
+
+    Args:
+        job_id: ID job (trung voi id trong scheduler)
+        func: Ham job; tra ve int = so ban ghi da xu ly (ghi vao JobRun)
+        slot: Moc lich theo trigger (None = phut hien tai, vd chay tay)
+        record_empty: False = chi ghi JobRun sau khi chay, neu loi hoac xu ly > 0
+            ban ghi (job moi phut). Khong chan process tre chay lai cung moc:
+            job phai an toan khi chay lap (vd nhan ban ghi nguyen tu)
+
+    Returns:
+        bool: True neu process nay da chay job
+    """
+    slot = slot or datetime.now().replace(second=0, microsecond=0)
+    with job_lock(job_id) as acquired:
+        if not acquired:
+            return False
+        run_id = None
+        if record_empty:
+            run_id = _start_run(job_id, slot)
+            if run_id is None:
+                return False
+
+        track_memory = current_app.config.get('JOB_TRACK_MEMORY', False)
+        baseline = _memory.start() if track_memory else None
+        started_at = datetime.utcnow()
+        started = time.perf_counter()
+        try:
+            result = func()
+        except Exception:
+            error = traceback.format_exc()
+            peak_kb = _memory.stop(baseline) if track_memory else None
+            db.session.rollback()
+            run_id = run_id or _start_run(job_id, slot, started_at)
+            if run_id:
+                _finish_run(run_id, 'failed', started, peak_kb=peak_kb, error=error)
+            raise
+        peak_kb = _memory.stop(baseline) if track_memory else None
+        rows = result if isinstance(result, int) and not isinstance(result, bool) else None
+        if not record_empty:
+            if not rows:
+                return True
+            run_id = _start_run(job_id, slot, started_at)
+            if run_id is None:
+                return True
+        _finish_run(run_id, 'success', started, rows=rows, peak_kb=peak_kb)
+        return True
+
+
+def prune_runs(days=None):
+    """Xoa lich su chay job cu hon JOB_RUN_RETENTION_DAYS ngay"""
+    days = days or current_app.config.get('JOB_RUN_RETENTION_DAYS', 30)
+    deleted = db.session.execute(
+        delete(JobRun).where(JobRun.started_at < datetime.utcnow() - timedelta(days=days)),
+        execution_options={'synchronize_session': False}
+    ).rowcount
+    db.session.commit()
+    return deleted
+
+
+def recent_runs(job_id=None, limit=50):
+    """Lich su chay job gan nhat"""
+    query = JobRun.query
+    if job_id:
+        query = query.filter(JobRun.job_id == job_id)
+    return query.order_by(JobRun.started_at.desc(), JobRun.id.desc()).limit(limit).all()
+
+
+def job_stats(days=14):
+    """
+    Thong ke chay job trong `days` ngay gan nhat (GROUP BY trong CSDL)
+
+    Returns:
+        dict: {
+            'jobs': [{'job_id', 'runs', 'failed', 'avg_ms', 'max_ms', 'avg_rows',
+                      'max_memory_kb', 'last_run', 'last_status'}],
+            'daily': {job_id: [{'date', 'runs', 'failed', 'avg_ms', 'max_ms', 'rows', 'max_memory_kb'}]}
+        }
+    """
+    since = datetime.utcnow() - timedelta(days=days)
+    failed = func.sum(case((JobRun.status == 'failed', 1), else_=0))
+    columns = (
+        func.count(JobRun.id), failed, func.avg(JobRun.duration_ms), func.max(JobRun.duration_ms),
+        func.avg(JobRun.rows_processed), func.sum(JobRun.rows_processed), func.max(JobRun.peak_memory_kb)
+    )
+
+    jobs = []
+    for row in db.session.query(JobRun.job_id, *columns, func.max(JobRun.started_at))\
+            .filter(JobRun.started_at >= since).group_by(JobRun.job_id).order_by(JobRun.job_id):
+        job_id, runs, failures, avg_ms, max_ms, avg_rows, _, max_memory, last_run = row
+        jobs.append({
+            'job_id': job_id,
+            'runs': runs,
+            'failed': int(failures or 0),
+            'avg_ms': round(avg_ms) if avg_ms is not None else None,
+            'max_ms': max_ms,
+            'avg_rows': round(avg_rows, 1) if avg_rows is not None else None,
+            'max_memory_kb': max_memory,
+            'last_run': last_run
+        })
+
+    # Trang thai lan chay cuoi moi job
+    last_ids = db.session.query(func.max(JobRun.id)).filter(JobRun.started_at >= since)\
+        .group_by(JobRun.job_id).scalar_subquery()
+    last_status = dict(db.session.query(JobRun.job_id, JobRun.status).filter(JobRun.id.in_(last_ids)))
+    for job in jobs:
+        job['last_status'] = last_status.get(job['job_id'])
+
+    day = func.date(JobRun.started_at)
+    daily = {}
+    for row in db.session.query(JobRun.job_id, day, *columns).filter(JobRun.started_at >= since)\
+            .group_by(JobRun.job_id, day).order_by(JobRun.job_id, day):
+        job_id, run_date, runs, failures, avg_ms, max_ms, _, total_rows, max_memory = row
+        daily.setdefault(job_id, []).append({
+            'date': str(run_date),
+            'runs': runs,
+            'failed': int(failures or 0),
+            'avg_ms': round(avg_ms) if avg_ms is not None else None,
+            'max_ms': max_ms,
+            'rows': total_rows,
+            'max_memory_kb': max_memory
+        })
+
+    return {'jobs': jobs, 'daily': daily}
@@ -26,21 +26,101 @@ class Config:
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
     MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER')
 
-    # SMS (placeholder)
+    # Dia chi he thong (link trong email thong bao)
+    APP_URL = os.environ.get('APP_URL') or 'http://localhost:5000'
+
+    # SMS (placeholder): co SMS_API_URL thi POST JSON toi gateway, khong thi chi ghi log
+    # SMS_API_BATCH_SIZE: so SMS cung noi dung moi request. Mac dinh 1 ({'phone', 'message'});
+    # chi dat > 1 khi gateway dang dung nhan {'phones': [...], 'message'}
     SMS_API_KEY = os.environ.get('SMS_API_KEY')
+    SMS_API_URL = os.environ.get('SMS_API_URL')
+    SMS_API_BATCH_SIZE = int(os.environ.get('SMS_API_BATCH_SIZE') or 1)
 
     # Zalo OA (placeholder)
     ZALO_OA_ACCESS_TOKEN = os.environ.get('ZALO_OA_ACCESS_TOKEN')
+    ZALO_OA_API_URL = os.environ.get('ZALO_OA_API_URL') or 'https://openapi.zalo.me/v2.0/oa/message'
+
+    # Hang doi thong bao: so tin moi lan worker chay, so request HTTP dong thoi (SMS/Zalo),
+    # gioi han request/giay moi kenh (0 = khong gioi han), thu lai (giay cho tang gap doi)
+    NOTIFY_BATCH_SIZE = int(os.environ.get('NOTIFY_BATCH_SIZE') or 200)
+    NOTIFY_HTTP_CONCURRENCY = int(os.environ.get('NOTIFY_HTTP_CONCURRENCY') or 20)
+    NOTIFY_HTTP_TIMEOUT = float(os.environ.get('NOTIFY_HTTP_TIMEOUT') or 10)
+    NOTIFY_RATE_LIMITS = {
+        'email': float(os.environ.get('NOTIFY_RATE_EMAIL') or 10),
+        'sms': float(os.environ.get('NOTIFY_RATE_SMS') or 5),
+        'zalo': float(os.environ.get('NOTIFY_RATE_ZALO') or 10)
+    }
+    NOTIFY_MAX_ATTEMPTS = int(os.environ.get('NOTIFY_MAX_ATTEMPTS') or 5)
+    NOTIFY_RETRY_SECONDS = int(os.environ.get('NOTIFY_RETRY_SECONDS') or 60)
+    # Gop tin (digest): cac loai tin trong NOTIFY_DIGEST_KINDS duoc giu lai va gop thanh
+    # 1 tin / NV / kenh, gui luc NOTIFY_DIGEST_HOUR gio hang ngay (rong = gui ngay)
+    NOTIFY_DIGEST_KINDS = [kind.strip() for kind in
+                           (os.environ.get('NOTIFY_DIGEST_KINDS') or 'late').split(',') if kind.strip()]
+    NOTIFY_DIGEST_HOUR = int(os.environ.get('NOTIFY_DIGEST_HOUR') or 20)
+
+    # Background job: khoa chong chay trung giua cac process (gunicorn nhieu worker)
+    # PostgreSQL: pg_try_advisory_lock, MySQL: GET_LOCK, CSDL khac (SQLite): file lock trong JOB_LOCK_DIR
+    JOB_LOCK_DIR = os.environ.get('JOB_LOCK_DIR') or os.path.join(os.path.abspath(os.path.dirname(__file__)), 'instance')
+    JOB_RUN_RETENTION_DAYS = int(os.environ.get('JOB_RUN_RETENTION_DAYS') or 30)
+    # Do bo nho dinh moi lan chay job (tracemalloc theo doi ca interpreter, ke ca request dang
+    # chay song song, lam cham vai chuc %) - chi bat khi can dieu tra bo nho
+    JOB_TRACK_MEMORY = os.environ.get('JOB_TRACK_MEMORY', 'false').lower() in ['true', 'on', '1']
+
+    # ActivityLog ghi kieu write-behind: thread nen INSERT theo lo (tat khi TESTING -> ghi dong bo)
+    ACTIVITY_LOG_ASYNC = os.environ.get('ACTIVITY_LOG_ASYNC', 'true').lower() in ['true', 'on', '1']
+    ACTIVITY_LOG_BATCH_SIZE = int(os.environ.get('ACTIVITY_LOG_BATCH_SIZE') or 200)
+    ACTIVITY_LOG_FLUSH_MS = int(os.environ.get('ACTIVITY_LOG_FLUSH_MS') or 500)
+    # Loi CSDL tam thoi (database is locked, mat ket noi): so lan thu lai truoc khi bo lo
+    ACTIVITY_LOG_RETRIES = int(os.environ.get('ACTIVITY_LOG_RETRIES') or 3)
+    ACTIVITY_LOG_QUEUE_SIZE = int(os.environ.get('ACTIVITY_LOG_QUEUE_SIZE') or 10000)
+
+    # Tinh luong cuoi thang theo lo: so NV moi lo, so lo chay song song, thu muc luu phieu luong PDF
+    # Chay song song can PostgreSQL / MySQL; tren SQLite luon chay tuan tu (workers=1)
+    PAYROLL_CHUNK_SIZE = int(os.environ.get('PAYROLL_CHUNK_SIZE') or 50)
+    PAYROLL_WORKERS = int(os.environ.get('PAYROLL_WORKERS') or 4)
+    PAYSLIP_FOLDER = os.environ.get('PAYSLIP_FOLDER') or 'exports/payslips'
 
     # Schedule config
     SCHEDULE_OPEN_DAY = 'friday'
     SCHEDULE_REMINDER_TIME = '12:00'
     SCHEDULE_DEADLINE = 'saturday_18:00'
     AUTO_SCHEDULE_TIME = 'sunday_08:00'
+    # Bo giai xep lich: auto (OR-tools neu co), flow, ortools, greedy
+    AUTO_SCHEDULE_SOLVER = os.environ.get('AUTO_SCHEDULE_SOLVER') or 'auto'
+    AUTO_SCHEDULE_MAX_SHIFTS = int(os.environ.get('AUTO_SCHEDULE_MAX_SHIFTS') or 18)
+    # Xep lich hang loat: so tuan xep truoc, so process giai song song (0 = so CPU)
+    AUTO_SCHEDULE_WEEKS_AHEAD = int(os.environ.get('AUTO_SCHEDULE_WEEKS_AHEAD') or 1)
+    AUTO_SCHEDULE_WORKERS = int(os.environ.get('AUTO_SCHEDULE_WORKERS') or 0)
+    # So NV moi ca mac dinh khi xep hang loat (du bao luong khach chua tach theo cua hang)
+    AUTO_SCHEDULE_STAFF_PER_SHIFT = int(os.environ.get('AUTO_SCHEDULE_STAFF_PER_SHIFT') or 2)
+    # Du bao nhan su tu luong khach: so tuan lich su, cua so truot, he so du phong,
+    # so bill 1 NV xu ly/gio, gioi han so NV moi ca
+    FORECAST_HISTORY_WEEKS = int(os.environ.get('FORECAST_HISTORY_WEEKS') or 8)
+    FORECAST_ROLLING_WINDOW = int(os.environ.get('FORECAST_ROLLING_WINDOW') or 4)
+    FORECAST_SERVICE_Z = float(os.environ.get('FORECAST_SERVICE_Z') or 1.0)
+    FORECAST_BILLS_PER_STAFF = int(os.environ.get('FORECAST_BILLS_PER_STAFF') or 20)
+    FORECAST_MIN_STAFF = int(os.environ.get('FORECAST_MIN_STAFF') or 1)
+    FORECAST_MAX_STAFF = int(os.environ.get('FORECAST_MAX_STAFF') or 10)
+    # Rang buoc lich (kiem tra khi day lich va bo giai xep lich deu tuan theo):
+    # so gio nghi toi thieu giua 2 ngay, so gio toi da/tuan
+    SCHEDULE_MIN_REST_HOURS = float(os.environ.get('SCHEDULE_MIN_REST_HOURS') or 10)
+    SCHEDULE_MAX_WEEKLY_HOURS = float(os.environ.get('SCHEDULE_MAX_WEEKLY_HOURS') or 48)
+    # Thoi gian di chuyen toi thieu (phut) giua 2 ca trong ngay o 2 cua hang khac nhau
+    SCHEDULE_STORE_TRANSFER_MINUTES = int(os.environ.get('SCHEDULE_STORE_TRANSFER_MINUTES') or 60)
+    # Import iPOS: gio co so bill >= percentile nay trong ngay la gio dong
+    TRAFFIC_PEAK_PERCENTILE = float(os.environ.get('TRAFFIC_PEAK_PERCENTILE') or 75)
+
+    # Dashboard: TTL cache va chu ky heartbeat SSE (giay)
+    DASHBOARD_CACHE_TTL = int(os.environ.get('DASHBOARD_CACHE_TTL') or 60)
+    DASHBOARD_SSE_HEARTBEAT = int(os.environ.get('DASHBOARD_SSE_HEARTBEAT') or 15)
+    # Dong stream SSE sau N giay (trinh duyet tu ket noi lai) de tra thread cho worker
+    DASHBOARD_SSE_MAX_SECONDS = int(os.environ.get('DASHBOARD_SSE_MAX_SECONDS') or 300)
 
     # Attendance config
     LATE_GRACE_PERIOD = 5  # phut
     EARLY_BIRD_THRESHOLD = '06:55'
+    # Xu ly di muon: lan dau chay (chua co moc) xu ly bu bao nhieu ngay gan nhat
+    ATTENDANCE_CATCHUP_DAYS = int(os.environ.get('ATTENDANCE_CATCHUP_DAYS') or 7)
 
     # Penalties (VND)
     FIRST_LATE_PENALTY = 0
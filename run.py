@@ -1,5 +1,6 @@
+import click
 from app import create_app, db
-from app.models import User, WorkSchedule, ScheduleShift, AttendanceRecord, Violation, Reward, Payroll, SystemConfig, Holiday, CustomerTraffic
+from app.models import User, WorkSchedule, ScheduleShift, AttendanceRecord, Violation, Reward, Payroll, SystemConfig, Holiday, CustomerTraffic, Store
 
 app = create_app()
 
@@ -17,7 +18,8 @@ def make_shell_context():
         'Payroll': Payroll,
         'SystemConfig': SystemConfig,
         'Holiday': Holiday,
-        'CustomerTraffic': CustomerTraffic
+        'CustomerTraffic': CustomerTraffic,
+        'Store': Store
     }
 
 
@@ -105,5 +107,81 @@ def seed_data():
     print('  - Staff: staff1-5 / staff123')
 
 
+@app.cli.command('generate-schedules')
+@click.option('--start', 'start_date', default=None, help='Tuan bat dau (YYYY-MM-DD, mac dinh tuan sau)')
+@click.option('--weeks', default=1, show_default=True, help='So tuan can xep')
+@click.option('--store', 'store_ids', multiple=True, type=int, help='Id cua hang (lap lai de chon nhieu)')
+@click.option('--staff-per-shift', default=None, type=int, help='So NV moi ca (mac dinh AUTO_SCHEDULE_STAFF_PER_SHIFT)')
+@click.option('--forecast', is_flag=True, help='Theo du bao luong khach (chia theo ti le NV tung cua hang)')
+@click.option('--workers', default=None, type=int, help='So process giai song song')
+@click.option('--backend', default=None, type=click.Choice(['auto', 'flow', 'ortools', 'greedy']))
+def generate_schedules(start_date, weeks, store_ids, staff_per_shift, forecast, workers, backend):
+    """Xep lich nhap hang loat cho nhieu tuan / nhieu cua hang"""
+    from datetime import datetime, timedelta
+    from app.schedule.batch import generate_schedules_batch, week_range
+
+    if start_date:
+        start = datetime.strptime(start_date, '%Y-%m-%d').date()
+    else:
+        today = datetime.now().date()
+        start = today - timedelta(days=today.weekday()) + timedelta(weeks=1)
+
+    result = generate_schedules_batch(
+        week_range(start, weeks),
+        store_ids=list(store_ids) or None,
+        staff_per_shift='forecast' if forecast else staff_per_shift,
+        workers=workers,
+        backend=backend
+    )
+
+    for item in result['problems']:
+        store = item['store_id'] if item['store_id'] is not None else '-'
+        print(f"Cua hang {store} | tuan {item['week_start']} | {item['staff']} NV | "
+              f"{item['total_shifts']} ca | {item['backend']} {item['solve_time']}s | "
+              f"{len(item['warnings'])} ca thieu nguoi")
+    print(f"Tong: {result['total_shifts']} ca nhap, {len(result['problems'])} bai toan, {result['elapsed']}s")
+
+
+@app.cli.command('import-traffic')
+@click.argument('file_path', type=click.Path(exists=True))
+@click.option('--year', default=None, type=int, help='Nam cho ngay khong co nam (mac dinh nam hien tai)')
+def import_traffic(file_path, year):
+    """Import du lieu luong khach iPOS (CSV / XLSX)"""
+    from app.schedule.traffic_import import import_traffic_file
+
+    result = import_traffic_file(file_path, year)
+    for error in result['errors']:
+        print(f'Canh bao: {error}')
+    if not result['success']:
+        raise click.ClickException('Khong import duoc du lieu iPOS')
+    print(f"Da import {result['rows']} dong -> {result['slots']} khung gio "
+          f"({result['start']} - {result['end']}), {result['peak_hours']} gio dong, {result['elapsed']}s")
+
+
+@app.cli.command('deliver-notifications')
+@click.option('--limit', default=None, type=int, help='So tin moi lo (mac dinh NOTIFY_BATCH_SIZE)')
+def deliver_notifications(limit):
+    """Gui cac thong bao den han trong hang doi"""
+    from app.notifications.outbox import deliver_all
+
+    result = deliver_all(limit)
+    if result['digests']:
+        print(f"Da gop {result['digests']} tin digest")
+    print(f"Da nhan {result['claimed']} tin: {result['sent']} da gui, "
+          f"{result['retry']} thu lai sau, {result['failed']} that bai")
+
+
+@app.cli.command('run-payroll')
+@click.option('--month', type=int, required=True)
+@click.option('--year', type=int, required=True)
+def run_payroll_command(month, year):
+    """Tinh luong cuoi thang theo lo (chay lai de tiep tuc tu checkpoint)"""
+    from app.payroll.pipeline import run_payroll
+
+    result = run_payroll(month, year)
+    print(f"Ky {month}/{year}: {result['queued']}/{result['total']} NV xong, "
+          f"{result['failed']} NV chua xong ({result['elapsed']}s)")
+
+
 if __name__ == '__main__':
     app.run(debug=True)
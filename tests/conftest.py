@@ -0,0 +1,62 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from config import Config
+from app import create_app
+from app.models import db as _db
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+    WTF_CSRF_ENABLED = False
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app(TestConfig)
+    app.config['JOB_LOCK_DIR'] = str(tmp_path)
+    with app.app_context():
+        _db.create_all()
+        yield app
+        _db.session.remove()
+        _db.drop_all()
+
+
+@pytest.fixture
+def db(app):
+    return _db
+
+
+class GatewayHandler(BaseHTTPRequestHandler):
+    """Gateway SMS / Zalo gia: ghi lai payload, so trong server.fail_phones tra HTTP 500"""
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.server.requests.append({'path': self.path, 'headers': dict(self.headers), 'payload': payload})
+        if payload.get('phone') in self.server.fail_phones:
+            self.send_response(500)
+            self.end_headers()
+            return
+        body = json.dumps({'error': 0, 'message': 'Success'}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def gateway():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), GatewayHandler)
+    server.requests = []
+    server.fail_phones = set()
+    server.url = f'http://127.0.0.1:{server.server_address[1]}'
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,54 @@
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+from app.audit import activity_log_sink
+from app.models import ActivityLog, User
+
+
+def test_log_many_goes_through_sink(app, db, monkeypatch):
+    batches = []
+    monkeypatch.setattr(activity_log_sink, '_write', batches.append)
+
+    count = ActivityLog.log_many(1, 'update', 'schedule', [(10, 'Day lich'), (11, 'Day lich')], ip_address='127.0.0.1')
+
+    assert count == 2
+    assert [[row['entity_id'] for row in batch] for batch in batches] == [[10, 11]]
+    assert not db.session.new and ActivityLog.query.count() == 0
+
+
+def test_log_many_writes_rows_in_sync_mode(app, db):
+    assert ActivityLog.log_many(1, 'update', 'schedule', []) == 0
+    ActivityLog.log_many(1, 'update', 'schedule', [(10, 'A'), (11, 'B')])
+
+    assert [(log.entity_id, log.description) for log in ActivityLog.query.order_by(ActivityLog.id)] == \
+        [(10, 'A'), (11, 'B')]
+
+
+def test_write_retries_transient_errors(app, db, monkeypatch):
+    monkeypatch.setattr('app.audit.RETRY_DELAY', 0)
+    failures = []
+
+    def locked_once(conn, cursor, statement, params, context, executemany):
+        if statement.startswith('INSERT INTO activity_logs') and not failures:
+            failures.append(statement)
+            raise OperationalError(statement, params, Exception('database is locked'))
+
+    event.listen(db.engine, 'before_cursor_execute', locked_once)
+    try:
+        ActivityLog.log_many(1, 'update', 'schedule', [(10, 'A')])
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', locked_once)
+
+    assert len(failures) == 1
+    assert [log.entity_id for log in ActivityLog.query] == [10]
+
+
+def test_sync_write_waits_for_callers_transaction(app, db):
+    User.query.all()
+    assert db.session().in_transaction()
+
+    ActivityLog.log_many(1, 'update', 'schedule', [(10, 'A')])
+    assert db.session.info['activity_log_rows']
+
+    db.session.rollback()
+    assert 'activity_log_rows' not in db.session.info
+    assert [log.entity_id for log in ActivityLog.query] == [10]
@@ -0,0 +1,46 @@
+from datetime import datetime, time, timedelta
+from app.attendance import late_checker
+from app.attendance.late_checker import get_failed_records, get_watermark, process_pending_attendance, set_watermark
+from app.models import AttendanceRecord, ShiftType, User, UserRole, Violation
+
+TODAY = datetime.now().date()
+
+
+def add_late(db, username, day, minutes):
+    user = User(username=username, full_name=username, role=UserRole.STAFF, password_hash='x')
+    db.session.add(user)
+    db.session.flush()
+    record = AttendanceRecord(user_id=user.id, date=day, shift_type=ShiftType.MORNING,
+                              scheduled_start=time(7), scheduled_end=time(12), late_minutes=minutes, is_late=True)
+    db.session.add(record)
+    db.session.commit()
+    return record
+
+
+def test_failed_record_does_not_pin_watermark(app, db, monkeypatch):
+    set_watermark(TODAY - timedelta(days=4))
+    db.session.commit()
+    bad = add_late(db, 'bad', TODAY - timedelta(days=3), 99)
+    add_late(db, 'ok', TODAY - timedelta(days=2), 10)
+
+    calculate_penalty = late_checker.calculate_penalty
+
+    def broken(late_count, late_minutes):
+        if late_minutes == 99:
+            raise ValueError('bad row')
+        return calculate_penalty(late_count, late_minutes)
+
+    monkeypatch.setattr(late_checker, 'calculate_penalty', broken)
+    result = process_pending_attendance()
+
+    assert result['failed_ids'] == [bad.id] and result['processed'] == 1
+    assert get_watermark() == TODAY - timedelta(days=1)
+    assert get_failed_records() == [bad.id]
+
+    # Ban ghi loi duoc thu lai du nam truoc moc
+    monkeypatch.setattr(late_checker, 'calculate_penalty', calculate_penalty)
+    result = process_pending_attendance()
+
+    assert result['processed'] == 1 and not result['errors']
+    assert get_failed_records() == []
+    assert Violation.query.count() == 2
@@ -0,0 +1,54 @@
+import pytest
+from app.notifications.gateway import dispatch, send_one
+
+
+@pytest.fixture
+def sms_app(app, gateway):
+    app.config.update(SMS_API_URL=f'{gateway.url}/sms', SMS_API_KEY='sms-key',
+                      ZALO_OA_API_URL=f'{gateway.url}/zalo', ZALO_OA_ACCESS_TOKEN='zalo-token')
+    return app
+
+
+def sms_batch(count, body='Lich tuan moi'):
+    return [{'id': i, 'recipient': f'09{i:08d}', 'body': body} for i in range(count)]
+
+
+def test_sms_defaults_to_one_number_per_request(sms_app, gateway):
+    results = dispatch({'sms': sms_batch(3)})
+
+    assert results == {0: None, 1: None, 2: None}
+    payloads = sorted((request['payload'] for request in gateway.requests), key=lambda payload: payload['phone'])
+    assert payloads == [{'phone': f'09{i:08d}', 'message': 'Lich tuan moi'} for i in range(3)]
+
+
+def test_sms_batching_is_opt_in(sms_app, gateway):
+    sms_app.config['SMS_API_BATCH_SIZE'] = 100
+
+    results = dispatch({'sms': sms_batch(2000)})
+
+    assert len(results) == 2000 and set(results.values()) == {None}
+    assert len(gateway.requests) == 20
+    assert all(len(request['payload']['phones']) == 100 for request in gateway.requests)
+
+
+def test_sms_error_only_affects_its_own_number(sms_app, gateway):
+    gateway.fail_phones.add('0900000001')
+
+    results = dispatch({'sms': sms_batch(3)})
+
+    assert results == {0: None, 1: 'HTTP 500', 2: None}
+
+
+def test_send_one_always_sends_single_number(sms_app, gateway):
+    sms_app.config['SMS_API_BATCH_SIZE'] = 100
+
+    assert send_one('sms', '0900000009', 'Xin chao') is None
+    assert gateway.requests[-1]['payload'] == {'phone': '0900000009', 'message': 'Xin chao'}
+    assert gateway.requests[-1]['headers']['Authorization'] == 'Bearer sms-key'
+
+
+def test_zalo_without_token_is_not_sent(sms_app, gateway):
+    sms_app.config['ZALO_OA_ACCESS_TOKEN'] = None
+
+    assert send_one('zalo', 'zalo-user', 'Xin chao') == 'Chua cau hinh ZALO_OA_ACCESS_TOKEN'
+    assert gateway.requests == []
@@ -0,0 +1,191 @@
+import socketserver
+import threading
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import select, update
+from sqlalchemy.dialects import postgresql
+from app import mail
+from app.models import NotificationOutbox
+from app.notifications.outbox import enqueue_many, claim_batch, deliver_pending
+
+REFUSED = 'bounce@example.com'
+FAILING_PHONE = '0900000500'
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    """SMTP toi thieu (EHLO / MAIL / RCPT / DATA), luu thu nhan duoc"""
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), SMTPHandler)
+        self.messages = []
+        self.connections = 0
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply('220 sink ready')
+        recipients = []
+        while True:
+            line = self.rfile.readline().decode().rstrip('\r\n')
+            if not line:
+                return
+            command = line[:4].upper()
+            if command in ('EHLO', 'HELO'):
+                self.reply('250 sink')
+            elif command == 'MAIL':
+                recipients = []
+                self.reply('250 OK')
+            elif command == 'RCPT':
+                if REFUSED in line:
+                    self.reply('550 No such user')
+                else:
+                    recipients.append(line.split(':', 1)[1].strip(' <>'))
+                    self.reply('250 OK')
+            elif command == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                data = []
+                while True:
+                    chunk = self.rfile.readline().decode()
+                    if chunk.rstrip('\r\n') == '.':
+                        break
+                    data.append(chunk)
+                self.server.messages.append({'to': recipients, 'data': ''.join(data)})
+                self.reply('250 OK queued')
+            elif command == 'RSET':
+                recipients = []
+                self.reply('250 OK')
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('250 OK')
+
+
+@pytest.fixture
+def smtp():
+    server = SMTPSink()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def outbox_app(app, smtp, gateway):
+    gateway.fail_phones.add(FAILING_PHONE)
+    app.config.update(
+        MAIL_SERVER='127.0.0.1', MAIL_PORT=smtp.server_address[1], MAIL_USE_TLS=False,
+        MAIL_USERNAME=None, MAIL_PASSWORD=None, MAIL_SUPPRESS_SEND=False,
+        MAIL_DEFAULT_SENDER='hr@example.com',
+        SMS_API_URL=f'{gateway.url}/sms', SMS_API_KEY='sms-key',
+        ZALO_OA_API_URL=f'{gateway.url}/zalo', ZALO_OA_ACCESS_TOKEN='zalo-token',
+        NOTIFY_RATE_LIMITS={}, NOTIFY_MAX_ATTEMPTS=2, NOTIFY_DIGEST_KINDS=[]
+    )
+    mail.init_app(app)
+    return app
+
+
+def statuses(db):
+    return dict(db.session.execute(select(NotificationOutbox.idempotency_key, NotificationOutbox.status)).all())
+
+
+def test_enqueue_many_skips_duplicate_keys(app, db):
+    messages = [
+        {'channel': 'email', 'recipient': 'a@example.com', 'body': 'Hi', 'key': 'k1'},
+        {'channel': 'email', 'recipient': 'a@example.com', 'body': 'Hi', 'key': 'k1'},
+        {'channel': 'sms', 'recipient': None, 'body': 'Hi', 'key': 'k2'},
+    ]
+    assert enqueue_many(messages) == 1
+    db.session.commit()
+    assert enqueue_many(messages) == 0
+
+
+def test_deliver_pending_sends_through_smtp_and_http(outbox_app, db, smtp, gateway):
+    enqueue_many([
+        {'channel': 'email', 'recipient': 'a@example.com', 'subject': 'Luong', 'body': 'Phieu luong', 'key': 'e1'},
+        {'channel': 'email', 'recipient': 'b@example.com', 'subject': 'Luong', 'body': 'Phieu luong', 'key': 'e2'},
+        {'channel': 'sms', 'recipient': '0900000001', 'body': 'Di tre', 'key': 's1'},
+        {'channel': 'zalo', 'recipient': 'zalo-user', 'body': 'Lich moi', 'key': 'z1'},
+    ])
+    db.session.commit()
+
+    result = deliver_pending()
+
+    assert result['claimed'] == 4
+    assert result['sent'] == 4
+    # 2 thu qua cung 1 ket noi SMTP
+    assert smtp.connections == 1
+    assert sorted(message['to'][0] for message in smtp.messages) == ['a@example.com', 'b@example.com']
+    assert 'Subject: Luong' in smtp.messages[0]['data']
+
+    by_path = {request['path']: request for request in gateway.requests}
+    assert by_path['/sms']['payload'] == {'phone': '0900000001', 'message': 'Di tre'}
+    assert by_path['/sms']['headers']['Authorization'] == 'Bearer sms-key'
+    assert by_path['/zalo']['payload'] == {'recipient': {'user_id': 'zalo-user'}, 'message': {'text': 'Lich moi'}}
+    assert by_path['/zalo']['headers']['access_token'] == 'zalo-token'
+    assert set(statuses(db).values()) == {'sent'}
+
+
+def test_deliver_pending_retries_then_fails(outbox_app, db, smtp, gateway):
+    enqueue_many([
+        {'channel': 'email', 'recipient': REFUSED, 'subject': 'X', 'body': 'X', 'key': 'bounce'},
+        {'channel': 'email', 'recipient': 'ok@example.com', 'subject': 'X', 'body': 'X', 'key': 'ok'},
+        {'channel': 'sms', 'recipient': FAILING_PHONE, 'body': 'X', 'key': 'sms-500'},
+    ])
+    db.session.commit()
+
+    result = deliver_pending()
+    assert (result['sent'], result['retry'], result['failed']) == (1, 2, 0)
+    assert statuses(db) == {'bounce': 'pending', 'ok': 'sent', 'sms-500': 'pending'}
+    error = db.session.scalar(select(NotificationOutbox.last_error)
+                              .where(NotificationOutbox.idempotency_key == 'sms-500'))
+    assert error == 'HTTP 500'
+
+    # Chua den han thu lai -> khong nhan
+    assert deliver_pending()['claimed'] == 0
+
+    db.session.execute(update(NotificationOutbox).values(next_attempt_at=datetime.utcnow() - timedelta(seconds=1)))
+    db.session.commit()
+    result = deliver_pending()
+    assert (result['claimed'], result['failed']) == (2, 2)
+    assert statuses(db) == {'bounce': 'failed', 'ok': 'sent', 'sms-500': 'failed'}
+
+
+def test_claim_batch_does_not_hand_out_rows_twice(app, db):
+    enqueue_many([{'channel': 'sms', 'recipient': f'09{i:08d}', 'body': 'X', 'key': f'k{i}'} for i in range(5)])
+    db.session.commit()
+
+    first = claim_batch(3)
+    second = claim_batch(3)
+
+    assert len(first) == 3
+    assert len(second) == 2
+    assert not {item['id'] for item in first} & {item['id'] for item in second}
+    assert claim_batch(3) == []
+
+
+def test_claim_batch_locks_due_rows_on_postgresql(app, db, monkeypatch):
+    captured = []
+    monkeypatch.setattr(db.session, 'execute', lambda stmt, *args, **kwargs: captured.append(stmt) or _Empty())
+    monkeypatch.setattr(db.session, 'commit', lambda: None)
+    monkeypatch.setattr(db.engine.dialect, 'name', 'postgresql')
+
+    claim_batch(10)
+
+    sql = str(captured[0].compile(dialect=postgresql.dialect()))
+    assert 'FOR UPDATE SKIP LOCKED)' in sql
+    outer = sql.split('FOR UPDATE SKIP LOCKED)', 1)[1]
+    # Dong da bi worker khac nhan (khong con den han) bi loai o WHERE ngoai
+    assert 'notification_outbox.status IN' in outer
+    assert 'notification_outbox.next_attempt_at <=' in outer
+
+
+class _Empty:
+    def all(self):
+        return []
@@ -0,0 +1,50 @@
+import logging
+import pytest
+from jinja2 import UndefinedError
+from app.models import SystemConfig
+from app.notifications.templates import OVERRIDE_PREFIX, invalidate_templates, render, render_batch
+
+LATE = {'late_count': 2, 'late_minutes': 15, 'penalty': 50000}
+
+
+@pytest.fixture
+def override(app, db):
+    def set_override(channel, kind, part, source):
+        SystemConfig.set_value(f'{OVERRIDE_PREFIX}{channel}:{kind}:vi:{part}', source)
+        db.session.commit()
+        invalidate_templates()
+    yield set_override
+    invalidate_templates()
+
+
+def test_override_is_used(override):
+    override('sms', 'late', 'body', 'Muon {{ late_minutes }}p')
+
+    assert render('sms', 'late', **LATE)['body'] == 'Muon 15p'
+
+
+def test_override_with_unknown_variable_falls_back_to_default(override, caplog):
+    contexts = [LATE, dict(LATE, late_minutes=30)]
+    expected = render_batch('app', 'late', contexts)
+    override('app', 'late', 'body', 'Muon {{ late_minutes }}p, ca {{ shift_name }}')
+
+    with caplog.at_level(logging.ERROR):
+        results = render_batch('app', 'late', contexts)
+
+    assert results == expected
+    assert 'Ban di muon 30 phut' in results[1]['body']
+    # 1 dong log cho ca lo
+    errors = [record for record in caplog.records if 'loi khi render' in record.getMessage()]
+    assert len(errors) == 1
+    assert '2 tin' in errors[0].getMessage() and 'shift_name' in errors[0].getMessage()
+
+
+def test_override_that_does_not_compile_falls_back_to_default(override):
+    override('app', 'late', 'subject', 'Di muon {{ late_count ')
+
+    assert render('app', 'late', **LATE)['subject'] == 'Canh bao di muon lan 2'
+
+
+def test_missing_variable_in_default_template_still_raises(app):
+    with pytest.raises(UndefinedError):
+        render('sms', 'late', late_count=1)
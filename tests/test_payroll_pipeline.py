@@ -0,0 +1,23 @@
+from concurrent.futures import ThreadPoolExecutor
+from app.models import User, UserRole
+from app.payroll import pipeline
+
+
+def test_sqlite_runs_chunks_one_at_a_time(app, db, monkeypatch):
+    for i in range(3):
+        db.session.add(User(username=f's{i}', full_name=f's{i}', role=UserRole.STAFF,
+                            password_hash='x', status='active'))
+    db.session.commit()
+    pools = []
+
+    def executor(max_workers):
+        pools.append(max_workers)
+        return ThreadPoolExecutor(max_workers=max_workers)
+
+    monkeypatch.setattr(pipeline, 'ThreadPoolExecutor', executor)
+    monkeypatch.setattr(pipeline, '_run_chunk', lambda app, run_id, item_ids: None)
+
+    result = pipeline.run_payroll(10, 2026, chunk_size=1, workers=4)
+
+    assert result['processed'] == 3
+    assert pools == [1]
@@ -0,0 +1,59 @@
+from datetime import date
+from app.schedule.incremental import _solve_day
+from app.schedule.solver import SLOTS
+
+
+def make_state(requests, drafts, locked=(), blocked=(), demand=1):
+    return {
+        'week_start': date(2026, 10, 26),
+        'requests': requests,
+        'positions': {request['user_id']: pos for pos, request in enumerate(requests)},
+        'demand': [demand] * SLOTS,
+        'weights': [1] * SLOTS,
+        'max_shifts': 18,
+        'drafts': drafts,
+        'locked': set(locked),
+        'blocked': set(blocked)
+    }
+
+
+def test_locked_slot_keeps_users_other_slots_on_same_day():
+    # NV 1 dang xep ca sang thu 2, quan ly them tay ca chieu cung ngay
+    requests = [
+        {'user_id': 1, 'days': {0: ([0, 1], True)}},
+        {'user_id': 2, 'days': {0: ([0], False)}},
+    ]
+    state = make_state(requests, drafts={1: {0: 10, 1: 11}}, locked={(1, 1)})
+
+    added, removed, _ = _solve_day(state, 0)
+
+    assert (1, 0) not in removed
+    assert removed == []
+    assert (1, 1) not in added
+
+
+def test_fixed_user_slots_count_against_demand():
+    requests = [
+        {'user_id': 1, 'days': {0: ([0, 1], True)}},
+        {'user_id': 2, 'days': {0: ([0, 2], False)}},
+    ]
+    state = make_state(requests, drafts={1: {0: 10, 1: 11}}, locked={(1, 1)})
+
+    added, removed, _ = _solve_day(state, 0)
+
+    # Ca sang da du nguoi (NV 1) -> NV 2 chi vao ca toi
+    assert added == [(2, 2)]
+    assert removed == []
+
+
+def test_unlocked_day_is_rebalanced_with_minimal_changes():
+    requests = [
+        {'user_id': 1, 'days': {0: ([0], False)}},
+        {'user_id': 2, 'days': {0: ([1], False)}},
+    ]
+    state = make_state(requests, drafts={1: {0: 10}}, blocked={(2, 1)})
+
+    added, removed, _ = _solve_day(state, 0)
+
+    assert added == []
+    assert removed == []
@@ -0,0 +1,83 @@
+from datetime import date, datetime, timedelta
+import pytest
+from sqlalchemy import event
+from app.models import User, UserRole, WorkSchedule, ScheduleShift, ScheduleStatus, ShiftType
+from app.schedule.auto_scheduler import SHIFT_TIMES
+
+WEEK = date(2026, 10, 26)
+
+
+@pytest.fixture
+def admin_client(app, db):
+    admin = User(username='admin', full_name='Admin', role=UserRole.ADMIN)
+    admin.set_password('x')
+    db.session.add(admin)
+    db.session.commit()
+    client = app.test_client()
+    client.post('/auth/login', data={'username': 'admin', 'password': 'x'})
+    with client.session_transaction() as flask_session:
+        flask_session['auto_week_start'] = WEEK.isoformat()
+    return client
+
+
+def add_schedule(db, username, week, shifts, status=ScheduleStatus.SUBMITTED):
+    """shifts: [(ngay, ShiftType)] ca he thong da luu (chua xac nhan)"""
+    user = User.query.filter_by(username=username).first()
+    if user is None:
+        user = User(username=username, full_name=username, role=UserRole.STAFF, password_hash='x')
+        db.session.add(user)
+        db.session.flush()
+    schedule = WorkSchedule(user_id=user.id, week_start_date=week, week_end_date=week + timedelta(days=6),
+                            status=status, submitted_at=datetime.now())
+    db.session.add(schedule)
+    db.session.flush()
+    for day, shift_type in shifts:
+        start, end = SHIFT_TIMES[shift_type]
+        db.session.add(ScheduleShift(schedule_id=schedule.id, date=week + timedelta(days=day),
+                                     shift_type=shift_type, shift_start_time=start, shift_end_time=end,
+                                     shift_source='system', draft_status='final', is_confirmed=False))
+    db.session.commit()
+    return schedule
+
+
+def confirmed(db, schedule):
+    db.session.expire_all()
+    return [shift.is_confirmed for shift in ScheduleShift.query.filter_by(schedule_id=schedule.id)]
+
+
+def test_publish_confirms_week_with_week_scoped_statements(app, db, admin_client):
+    schedules = [add_schedule(db, f's{i}', WEEK, [(i % 7, ShiftType.MORNING)]) for i in range(30)]
+    other_week = add_schedule(db, 's0', WEEK + timedelta(days=7), [(0, ShiftType.MORNING)])
+
+    parameters = []
+
+    def count_parameters(conn, cursor, statement, params, context, executemany):
+        if statement.startswith('UPDATE'):
+            parameters.append(len(params))
+
+    event.listen(db.engine, 'before_cursor_execute', count_parameters)
+    try:
+        admin_client.post('/schedule/publish-to-staff')
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count_parameters)
+
+    assert all(confirmed(db, schedule) == [True] for schedule in schedules)
+    assert {s.status for s in WorkSchedule.query.filter_by(week_start_date=WEEK)} == {ScheduleStatus.APPROVED}
+    assert confirmed(db, other_week) == [False]
+    # Khong truyen danh sach id: so tham so khong tang theo so lich
+    assert parameters and max(parameters) < 10
+
+
+def test_publish_validates_shifts_it_is_about_to_confirm(app, db, admin_client):
+    # Ca toi thu 2 + ca sang thu 3 chi nghi 9 gio (< 10): chua xac nhan nen lop CONFIRMED dang sach
+    schedule = add_schedule(db, 's1', WEEK, [(0, ShiftType.EVENING), (1, ShiftType.MORNING)])
+
+    admin_client.post('/schedule/publish-to-staff')
+
+    assert confirmed(db, schedule) == [False, False]
+    assert db.session.get(WorkSchedule, schedule.id).status == ScheduleStatus.SUBMITTED
+
+    admin_client.post('/schedule/publish-to-staff', data={'force': '1'})
+
+    assert confirmed(db, schedule) == [True, True]
+    assert db.session.get(WorkSchedule, schedule.id).status == ScheduleStatus.APPROVED
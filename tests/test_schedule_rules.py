@@ -0,0 +1,162 @@
+from datetime import date, datetime, timedelta
+import pytest
+from app.models import Store, SystemConfig, User, UserRole, WorkSchedule, ScheduleShift, ScheduleStatus, ShiftType
+from app.schedule.auto_scheduler import SHIFT_TIMES, get_dynamic_shift_times
+from app.schedule.batch import generate_schedules_batch
+from app.schedule.roster import WeekRoster, DRAFT
+from app.schedule.solver import solve_schedule, SHIFTS, SLOTS
+from app.schedule.validator import solver_rules, validate_roster
+
+WEEK = date(2026, 10, 26)
+MORNING, AFTERNOON, EVENING = 0, 1, 2
+
+
+def every_shift(days=range(7)):
+    return {day: ([MORNING, AFTERNOON, EVENING], False) for day in days}
+
+
+@pytest.mark.parametrize('backend', ['flow', 'greedy'])
+def test_solver_keeps_rest_time_between_evening_and_next_morning(app, backend):
+    rules = solver_rules(SHIFT_TIMES)
+    # 1 NV dang ky ca toi thu 2 va ca sang thu 3: 22h -> 7h chi nghi 9 gio
+    requests = [{'user_id': 1, 'days': {0: ([EVENING], False), 1: ([MORNING], False)}}]
+
+    solution = solve_schedule(requests, [1] * SLOTS, backend=backend, rules=rules)
+
+    assert len(solution['assignments'][1]) == 1
+
+
+@pytest.mark.parametrize('backend', ['flow', 'greedy'])
+def test_solver_refills_dropped_shift_with_other_staff(app, backend):
+    rules = solver_rules(SHIFT_TIMES)
+    requests = [
+        {'user_id': 1, 'days': {0: ([EVENING], False), 1: ([MORNING], False)}},
+        {'user_id': 2, 'days': {1: ([MORNING], False)}},
+    ]
+    demand = [0] * SLOTS
+    demand[0 * SHIFTS + EVENING] = 1
+    demand[1 * SHIFTS + MORNING] = 1
+
+    solution = solve_schedule(requests, demand, backend=backend, rules=rules)
+
+    assert solution['unfilled'] == []
+    assert solution['assignments'] == {1: [(0, EVENING)], 2: [(1, MORNING)]}
+
+
+def test_solver_respects_weekly_hours(app):
+    app.config['SCHEDULE_MAX_WEEKLY_HOURS'] = 20
+    rules = solver_rules(SHIFT_TIMES)
+    requests = [{'user_id': 1, 'days': every_shift()}]
+
+    solution = solve_schedule(requests, [1] * SLOTS, max_shifts=18, backend='flow', rules=rules)
+
+    hours = sum(rules['shift_hours'][shift] for _, shift in solution['assignments'][1])
+    assert 0 < hours <= 20
+
+
+def test_solver_output_passes_validator(app, db):
+    rules = solver_rules(SHIFT_TIMES)
+    requests = [{'user_id': uid, 'days': every_shift()} for uid in range(1, 6)]
+
+    solution = solve_schedule(requests, [2] * SLOTS, max_shifts=18, backend='flow', rules=rules)
+
+    for user_id, slots in solution['assignments'].items():
+        worked = sorted(day * SHIFTS + shift for day, shift in slots)
+        hours = sum(rules['shift_hours'][s % SHIFTS] for s in worked)
+        assert hours <= rules['max_hours']
+        for a, b in zip(worked, worked[1:]):
+            assert not (b - a == 1 and a % SHIFTS == EVENING), (user_id, a, b)
+
+
+def add_shift(db, user, day, shift_type, store=None):
+    schedule = WorkSchedule.query.filter_by(user_id=user.id, week_start_date=WEEK).first()
+    if schedule is None:
+        schedule = WorkSchedule(user_id=user.id, week_start_date=WEEK, week_end_date=WEEK + timedelta(days=6),
+                                status=ScheduleStatus.SUBMITTED, submitted_at=datetime.now())
+        db.session.add(schedule)
+        db.session.flush()
+    start, end = SHIFT_TIMES[shift_type]
+    db.session.add(ScheduleShift(
+        schedule_id=schedule.id, date=WEEK + timedelta(days=day), shift_type=shift_type,
+        shift_start_time=start, shift_end_time=end, shift_source='system', draft_status='draft',
+        store_id=store.id if store else None
+    ))
+
+
+@pytest.fixture
+def stores(db):
+    a, b = Store(code='CH01', name='A'), Store(code='CH02', name='B')
+    db.session.add_all([a, b])
+    db.session.flush()
+    user = User(username='s1', full_name='Staff 1', role=UserRole.STAFF, store_id=a.id, password_hash='x')
+    db.session.add(user)
+    db.session.flush()
+    return a, b, user
+
+
+def cross_store(violations):
+    return [v for v in violations if v['type'] == 'double_booking']
+
+
+def test_validator_flags_back_to_back_shifts_at_two_stores(app, db, stores):
+    a, b, user = stores
+    add_shift(db, user, 0, ShiftType.MORNING)           # cua hang cua NV (CH01)
+    add_shift(db, user, 0, ShiftType.AFTERNOON, b)      # dieu dong sang CH02, 12h -> 12h
+    db.session.commit()
+
+    violations = cross_store(validate_roster(WeekRoster.load(WEEK), DRAFT))
+
+    assert len(violations) == 1
+    assert 'CH01' in violations[0]['message'] and 'CH02' in violations[0]['message']
+
+
+def test_validator_flags_same_shift_at_two_stores(app, db, stores):
+    a, b, user = stores
+    add_shift(db, user, 2, ShiftType.EVENING, a)
+    add_shift(db, user, 2, ShiftType.EVENING, b)
+    db.session.commit()
+
+    violations = cross_store(validate_roster(WeekRoster.load(WEEK), DRAFT))
+
+    assert [v['message'] for v in violations] == ['Staff 1: ca evening ngay 2026-10-28 xep o 2 cua hang']
+
+
+def test_validator_allows_back_to_back_shifts_at_one_store(app, db, stores):
+    a, b, user = stores
+    add_shift(db, user, 0, ShiftType.MORNING)
+    add_shift(db, user, 0, ShiftType.AFTERNOON, a)
+    db.session.commit()
+
+    assert cross_store(validate_roster(WeekRoster.load(WEEK), DRAFT)) == []
+
+
+def test_batch_drafts_use_configured_shift_times(app, db):
+    # Admin doi gio ca: moi ca 8 tieng, ca toi qua dem
+    for key, value in {'morning_start': '06:00', 'morning_end': '14:00', 'afternoon_start': '14:00',
+                       'afternoon_end': '22:00', 'evening_start': '22:00', 'evening_end': '06:00'}.items():
+        SystemConfig.set_value(f'shift_{key}', value)
+    shift_times = get_dynamic_shift_times()
+    assert shift_times[ShiftType.MORNING] != SHIFT_TIMES[ShiftType.MORNING]
+    for i in range(3):
+        user = User(username=f'u{i}', full_name=f'Staff {i}', role=UserRole.STAFF, password_hash='x')
+        db.session.add(user)
+        db.session.flush()
+        schedule = WorkSchedule(user_id=user.id, week_start_date=WEEK, week_end_date=WEEK + timedelta(days=6),
+                                status=ScheduleStatus.SUBMITTED, submitted_at=datetime.now())
+        db.session.add(schedule)
+        db.session.flush()
+        for day in range(7):
+            for shift_type in ShiftType:
+                start, end = shift_times[shift_type]
+                db.session.add(ScheduleShift(schedule_id=schedule.id, date=WEEK + timedelta(days=day),
+                                             shift_type=shift_type, shift_start_time=start, shift_end_time=end,
+                                             shift_source='employee'))
+    db.session.commit()
+
+    generate_schedules_batch([WEEK], staff_per_shift=1, workers=1)
+
+    drafts = ScheduleShift.query.filter_by(shift_source='system').all()
+    assert drafts
+    assert all((s.shift_start_time, s.shift_end_time) == shift_times[s.shift_type] for s in drafts)
+    violations = validate_roster(WeekRoster.load(WEEK), DRAFT, shift_times=shift_times)
+    assert [v for v in violations if v['type'] in ('rest_time', 'max_hours', 'double_booking')] == []
@@ -0,0 +1,72 @@
+from datetime import datetime, timedelta
+import pytest
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+from pytz import timezone
+from app.models import JobRun
+from app.scheduler.jobs import scheduled_fire_time
+from app.scheduler.runner import run_exclusive
+
+TZ = timezone('Asia/Ho_Chi_Minh')
+HOUR = timedelta(hours=1)
+
+
+def at(hour, minute, second=0):
+    return TZ.localize(datetime(2026, 10, 19, hour, minute, second))
+
+
+def test_late_firing_process_gets_the_same_cron_slot():
+    trigger = CronTrigger(hour=19, minute=0, timezone=TZ)
+
+    # Process A kich hoat luc 19:00:59, process B tre sang 19:01:00
+    assert scheduled_fire_time(trigger, at(19, 0, 59), HOUR) == at(19, 0)
+    assert scheduled_fire_time(trigger, at(19, 1, 0), HOUR) == at(19, 0)
+    assert scheduled_fire_time(trigger, at(19, 35), HOUR) == at(19, 0)
+
+
+def test_no_fire_time_inside_window():
+    trigger = CronTrigger(hour=19, minute=0, timezone=TZ)
+
+    assert scheduled_fire_time(trigger, at(18, 59), HOUR) is None
+
+
+def test_interval_slot_is_aligned_to_start_date():
+    trigger = IntervalTrigger(minutes=1, start_date=at(8, 0), timezone=TZ)
+
+    assert scheduled_fire_time(trigger, at(9, 15, 59), timedelta(minutes=1)) == at(9, 15)
+    assert scheduled_fire_time(trigger, at(9, 16, 0), timedelta(minutes=1)) == at(9, 16)
+
+
+def test_job_runs_once_per_slot(app, db):
+    calls = []
+    slot = datetime(2026, 10, 19, 19, 0)
+
+    assert run_exclusive('process_daily_attendance', lambda: calls.append(1) or 5, slot=slot) is True
+    assert run_exclusive('process_daily_attendance', lambda: calls.append(2), slot=slot) is False
+
+    assert calls == [1]
+    run = JobRun.query.one()
+    assert (run.status, run.rows_processed, run.scheduled_for) == ('success', 5, slot)
+
+
+def test_empty_runs_are_not_recorded_when_opted_out(app, db):
+    slot = datetime(2026, 10, 19, 19, 0)
+
+    assert run_exclusive('deliver_notifications', lambda: 0, slot=slot, record_empty=False) is True
+    assert JobRun.query.count() == 0
+
+    assert run_exclusive('deliver_notifications', lambda: 3, slot=slot + timedelta(minutes=1),
+                         record_empty=False) is True
+    run = JobRun.query.one()
+    assert (run.status, run.rows_processed) == ('success', 3)
+
+
+def test_failed_run_is_recorded_when_empty_runs_are_skipped(app, db):
+    def broken():
+        raise ValueError('smtp down')
+
+    with pytest.raises(ValueError):
+        run_exclusive('deliver_notifications', broken, slot=datetime(2026, 10, 19, 19, 0), record_empty=False)
+
+    run = JobRun.query.one()
+    assert run.status == 'failed' and 'smtp down' in run.error